@@ -0,0 +1,154 @@
+# USAGE
+# python benchmark.py --bench frame_norm
+# python benchmark.py --bench queue_consumer
+# python benchmark.py --bench frame_container
+# python benchmark.py --bench ssd_decoder
+# python benchmark.py --bench postprocess
+# python benchmark.py --bench tracker
+# python benchmark.py --bench stereo_depth
+# python benchmark.py --bench calibration_cache
+# python benchmark.py --bench multi_device
+# python benchmark.py --bench offload
+# python benchmark.py --bench shm_ring
+# python benchmark.py --bench mjpeg
+# python benchmark.py --bench drain
+# python benchmark.py --bench frame_view
+# python benchmark.py --bench streaming
+# python benchmark.py --bench simulated_device
+# python benchmark.py --bench sweep --duration 5 --output sweep.csv
+# python benchmark.py --bench sweep --device --grid '{"CAMERA_FPS": [20, 40]}'
+
+# import the necessary packages
+from dai_tools.benchmarks import benchmark_frame_norm, benchmark_queue_consumer
+from dai_tools.benchmarks import benchmark_frame_container, benchmark_ssd_decoder
+from dai_tools.benchmarks import benchmark_postprocess, benchmark_tracker
+from dai_tools.benchmarks import benchmark_stereo_depth
+from dai_tools.benchmarks import benchmark_calibration_cache
+from dai_tools.benchmarks import benchmark_multi_device, benchmark_offload
+from dai_tools.benchmarks import benchmark_shm_ring, benchmark_mjpeg
+from dai_tools.benchmarks import benchmark_drain, benchmark_frame_view
+from dai_tools.benchmarks import benchmark_streaming
+from dai_tools.benchmarks import benchmark_simulated_device
+from dai_tools.sweep import run_sweep
+import argparse
+import json
+
+# define the argparser and parse the command line arguments
+parser = argparse.ArgumentParser(description='OpenCV AI Kit host benchmarks')
+parser.add_argument(
+    '-b', '--bench', type=str, default='frame_norm',
+    help='Name of the host-side benchmark to run',
+)
+parser.add_argument(
+    '--grid', type=str, default=None,
+    help='sweep: JSON mapping of config.py names to the values to try',
+)
+parser.add_argument(
+    '--duration', type=float, default=5.0,
+    help='sweep: seconds run per configuration',
+)
+parser.add_argument(
+    '--device', action='store_true',
+    help='sweep: run every configuration on the attached OAK',
+)
+parser.add_argument(
+    '--recording', type=str, default=None,
+    help='sweep: replay the frames of this recording instead of noise',
+)
+parser.add_argument(
+    '--output', type=str, default=None,
+    help='sweep: write the result table to this .csv/.json file',
+)
+args = parser.parse_args()
+
+# if bench is frame_norm then compare the per-detection bounding box
+# denormalization against the batched one
+if args.bench == 'frame_norm':
+    benchmark_frame_norm()
+
+# if bench is queue_consumer then compare host CPU usage and latency of
+# the tryGet polling loop against the event-driven QueueConsumer
+elif args.bench == 'queue_consumer':
+    benchmark_queue_consumer()
+
+# if bench is frame_container then measure sequential, reverse and random
+# access to frames stored in a memory-mapped frame container
+elif args.bench == 'frame_container':
+    benchmark_frame_container()
+
+# if bench is ssd_decoder then measure the host decode cost of the raw
+# MobileNet-SSD output tensor
+elif args.bench == 'ssd_decoder':
+    benchmark_ssd_decoder()
+
+# if bench is postprocess then measure host-side per-class thresholds,
+# NMS and top-K over synthetic detection sets
+elif args.bench == 'postprocess':
+    benchmark_postprocess()
+
+# if bench is tracker then measure the per-frame tracker update cost for
+# increasing numbers of objects
+elif args.bench == 'tracker':
+    benchmark_tracker()
+
+# if bench is stereo_depth then measure host disparity throughput for
+# increasing numbers of worker threads
+elif args.bench == 'stereo_depth':
+    benchmark_stereo_depth()
+
+# if bench is calibration_cache then compare computing the undistortion
+# tables against loading them from the on-disk cache
+elif args.bench == 'calibration_cache':
+    benchmark_calibration_cache()
+
+# if bench is multi_device then measure the host throughput of the
+# multi-device fan-in with an increasing number of simulated cameras
+elif args.bench == 'multi_device':
+    benchmark_multi_device()
+
+# if bench is offload then compare heavy per-frame host work done inline
+# against offloaded to worker processes through shared memory
+elif args.bench == 'offload':
+    benchmark_offload()
+
+# if bench is shm_ring then compare handing frames to other processes
+# through pickling pipes against one shared-memory ring buffer
+elif args.bench == 'shm_ring':
+    benchmark_shm_ring()
+
+# if bench is mjpeg then measure the MJPEG server fanning frames out to
+# several viewers, one of which never reads
+elif args.bench == 'mjpeg':
+    benchmark_mjpeg()
+
+# if bench is drain then compare the age of the frames a slow host loop
+# shows when draining all pending frames or only the latest
+elif args.bench == 'drain':
+    benchmark_drain()
+
+# if bench is frame_view then compare converting planar frames with
+# getCvFrame against zero-copy FrameView planes and one shared conversion
+elif args.bench == 'frame_view':
+    benchmark_frame_view()
+
+# if bench is streaming then compare the host cost of callback loops
+# against the iter_messages generator and async iterator
+elif args.bench == 'streaming':
+    benchmark_streaming()
+
+# if bench is simulated_device then run every demo on a simulated device
+# and exit with an error if a host loop no longer keeps up with the camera
+elif args.bench == 'simulated_device':
+    if not benchmark_simulated_device():
+        raise SystemExit(1)
+
+# if bench is sweep then run the object detection host path for every
+# combination of the swept config.py settings, with host NMS and tracking
+# enabled so the host path has its full per-frame work
+elif args.bench == 'sweep':
+    run_sweep(
+        grid=json.loads(args.grid) if args.grid else None,
+        duration=args.duration, device=args.device,
+        recording=args.recording, outputPath=args.output,
+        hostNMS=True, track=True,
+    )
@@ -0,0 +1,849 @@
+# import the necessary packages
+from dai_tools import config
+from dai_tools.utils import frameNorm, frameNormBatch, detectionsToBBoxes
+from dai_tools.utils import annotateFrame
+from dai_tools.frame_source import ReplayFrameSource, save_frames
+from dai_tools.queue_consumer import QueueConsumer
+from dai_tools.frame_container import FrameContainer, FrameContainerWriter
+from dai_tools.ssd_decoder import decode_ssd_output, class_threshold_array
+from dai_tools.ssd_decoder import nn_layer_values
+from dai_tools.postprocess import filter_detections
+from dai_tools.tracker import SortTracker
+from dai_tools.stereo_depth import StripedStereoMatcher
+from dai_tools.calibration_cache import RectificationMapCache
+from dai_tools.multi_device import MultiDeviceManager
+from dai_tools.offload import ProcessOffload
+from dai_tools.shm_ring import SharedFrameRing
+from dai_tools.mjpeg_server import MjpegServer, _encode
+from dai_tools.frame_view import FrameView
+from dai_tools.streaming import iter_messages
+from dai_tools.sync import MessageSynchronizer
+from dai_tools.simulated_device import SimulatedDevice, SimulatedNNData
+from dai_tools.color_camera_preview import color_camera
+from dai_tools.color_camera_preview import create_color_camera_pipeline
+from dai_tools.left_right_mono_camera_preview import mono_cameras_preview
+from dai_tools.left_right_mono_camera_preview import \
+    create_mono_camera_pipeline
+from dai_tools.object_detection_mobilenet import object_detection_mobilenet
+from dai_tools.object_detection_mobilenet import create_detection_pipeline
+from types import SimpleNamespace
+import multiprocessing as mp
+import contextlib
+import asyncio
+import threading
+import socket
+import numpy as np
+import tempfile
+import cv2
+import time
+import io
+import os
+
+
+# build a list of fake detections shaped like the entries of an
+# ImgDetections message, with random labels, confidences and boxes
+def synthetic_detections(count, seed=0):
+    rng = np.random.default_rng(seed)
+    mins = rng.uniform(0.0, 0.8, size=(count, 2))
+    maxs = mins + rng.uniform(0.05, 0.3, size=(count, 2))
+    detections = []
+    for i in range(count):
+        detections.append(SimpleNamespace(
+            label=int(rng.integers(1, 21)),
+            confidence=float(rng.uniform(0.5, 1.0)),
+            xmin=float(mins[i, 0]), ymin=float(mins[i, 1]),
+            xmax=float(maxs[i, 0]), ymax=float(maxs[i, 1]),
+        ))
+    return detections
+
+
+# time `func` over `iterations` calls and return the mean time per call
+# in microseconds
+def time_per_call(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+# compare the per-detection frameNorm loop used by the original
+# displayFrame against the batched frameNormBatch path
+def benchmark_frame_norm(counts=(1, 10, 40, 100), iterations=2000):
+    frame = np.zeros((300, 300, 3), dtype=np.uint8)
+    print(f'{"detections":>10} {"frameNorm us":>14} {"batched us":>12} '
+          f'{"speedup":>8}')
+    for count in counts:
+        detections = synthetic_detections(count)
+
+        def loop():
+            for detection in detections:
+                frameNorm(frame, (
+                    detection.xmin, detection.ymin,
+                    detection.xmax, detection.ymax,
+                ))
+
+        def batched():
+            frameNormBatch(frame, detectionsToBBoxes(detections))
+
+        loopTime = time_per_call(loop, iterations)
+        batchedTime = time_per_call(batched, iterations)
+        print(f'{count:>10} {loopTime:>14.2f} {batchedTime:>12.2f} '
+              f'{loopTime / batchedTime:>7.1f}x')
+
+
+# write a synthetic recording of `streams` frame streams of `shape` at
+# `fps` lasting `duration` seconds into `directory`
+def synthetic_recording(directory, streams, fps, duration, shape=(120, 160)):
+    count = int(fps * duration)
+    timestamps = np.arange(count) / fps
+    frames = np.zeros((count,) + shape, dtype=np.uint8)
+    for stream in streams:
+        save_frames(directory, stream, frames, timestamps, range(count))
+
+
+# replay `streams` in real time through one of the host loop variants and
+# return (host CPU %, mean latency ms, p99 latency ms), latency being the
+# time from a message becoming available to its handler being called
+def _run_loop_variant(directory, streams, variant):
+    latencies = []
+    with ReplayFrameSource(directory, realtime=True) as source:
+        def handle(message):
+            due = source.startTime + message.timestamp - source.timeOrigin
+            latencies.append(time.monotonic() - due)
+            message.getCvFrame()
+
+        cpuStart, wallStart = time.process_time(), time.monotonic()
+        if variant == 'consumer':
+            consumer = QueueConsumer(
+                source, {stream: handle for stream in streams})
+            consumer.run()
+        else:
+            queues = [source.getOutputQueue(name=stream, maxSize=4,
+                                            blocking=False)
+                      for stream in streams]
+            while not source.isClosed():
+                for queue in queues:
+                    message = queue.tryGet()
+                    if message is not None:
+                        handle(message)
+                # cv2.waitKey(1) with an open window sleeps about 1 ms
+                if variant == 'poll+waitKey':
+                    time.sleep(0.001)
+        cpu = time.process_time() - cpuStart
+        wall = time.monotonic() - wallStart
+
+    latencies = np.array(latencies) * 1e3
+    return (cpu / wall * 100, latencies.mean(),
+            np.percentile(latencies, 99))
+
+
+# compare host CPU usage and dispatch latency of the tryGet polling loop
+# (with and without the ~1 ms cv2.waitKey pause) against QueueConsumer
+def benchmark_queue_consumer(fpsList=(30, 60), duration=3.0,
+                             streams=('left', 'right')):
+    print(f'{"fps":>4} {"loop":>14} {"CPU %":>7} {"mean ms":>8} '
+          f'{"p99 ms":>8}')
+    for fps in fpsList:
+        with tempfile.TemporaryDirectory() as directory:
+            synthetic_recording(directory, streams, fps, duration)
+            for variant in ('poll', 'poll+waitKey', 'consumer'):
+                cpu, mean, p99 = _run_loop_variant(
+                    directory, streams, variant)
+                print(f'{fps:>4} {variant:>14} {cpu:>7.1f} {mean:>8.2f} '
+                      f'{p99:>8.2f}')
+
+
+# write `count` frames of `shape` into a frame container, then fetch them
+# (copying each frame out of the mapping) in forward, reverse and random
+# order and report the frames per second of each access pattern
+def benchmark_frame_container(shape=(720, 1280), count=600):
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, size=shape, dtype=np.uint8)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'frames.dfc')
+        start = time.perf_counter()
+        with FrameContainerWriter(path, shape, np.uint8, count) as writer:
+            for i in range(count):
+                writer.write(frame, i / 40, i, synthetic_detections(
+                    i % 5, seed=i))
+        writeTime = time.perf_counter() - start
+        print(f'{"write":>8} {count / writeTime:>10.0f} frames/s')
+
+        container = FrameContainer(path)
+        orders = {
+            'forward': np.arange(count),
+            'reverse': np.arange(count)[::-1],
+            'random': rng.permutation(count),
+        }
+        for name, order in orders.items():
+            start = time.perf_counter()
+            for i in order:
+                np.array(container[i])
+                container.detections(i)
+            elapsed = time.perf_counter() - start
+            print(f'{name:>8} {count / elapsed:>10.0f} frames/s')
+
+
+# flat raw MobileNet-SSD output (1, 1, 100, 7) as returned by
+# NNData.getLayerFp16: `count` candidate boxes, then a -1 terminator row
+def synthetic_ssd_output(count, rows=100, seed=0):
+    rng = np.random.default_rng(seed)
+    raw = np.zeros((rows, 7), dtype=np.float32)
+    raw[:count, 1] = rng.integers(1, 21, size=count)
+    raw[:count, 2] = rng.uniform(0.0, 1.0, size=count)
+    raw[:count, 3:5] = rng.uniform(0.0, 0.7, size=(count, 2))
+    raw[:count, 5:7] = raw[:count, 3:5] + 0.2
+    if count < rows:
+        raw[count, 0] = -1
+    return raw.ravel().tolist()
+
+
+# decode the raw SSD output one row at a time, as a plain Python parser
+# would, for comparison with decode_ssd_output
+def _decode_ssd_loop(values, thresholds):
+    detections = []
+    for i in range(0, len(values), 7):
+        row = values[i:i + 7]
+        if row[0] < 0:
+            break
+        if row[2] >= thresholds[int(row[1])]:
+            detections.append(row)
+    return detections
+
+
+# per-frame host decode cost of the raw SSD tensor of an NNData message
+# laid out like the device's: Python loop and vectorized decode_ssd_output
+# over the getLayerFp16 list, against decode_ssd_output reading the layer
+# straight from the message buffer (as decode_nn_data does)
+def benchmark_ssd_decoder(counts=(5, 20, 50, 100), iterations=2000):
+    thresholds = class_threshold_array()
+    thresholdList = thresholds.tolist()
+    layer = config.SSD_OUTPUT_LAYER
+    print(f'{"boxes":>6} {"loop us":>9} {"list us":>9} {"buffer us":>10}')
+    for count in counts:
+        inNN = SimulatedNNData(
+            {layer: np.array(synthetic_ssd_output(count))}, 0.0, 0)
+        loopTime = time_per_call(
+            lambda: _decode_ssd_loop(inNN.getLayerFp16(layer),
+                                     thresholdList), iterations)
+        listTime = time_per_call(
+            lambda: decode_ssd_output(inNN.getLayerFp16(layer), thresholds),
+            iterations)
+        bufferTime = time_per_call(
+            lambda: decode_ssd_output(nn_layer_values(inNN, layer),
+                                      thresholds), iterations)
+        print(f'{count:>6} {loopTime:>9.2f} {listTime:>9.2f} '
+              f'{bufferTime:>10.2f}')
+
+
+# (N, 7) synthetic detection set: `count` boxes in clusters of about
+# `clusterSize` jittered copies, so NMS has duplicates to suppress
+def synthetic_detection_array(count, clusterSize=4, seed=0):
+    rng = np.random.default_rng(seed)
+    clusters = max(1, count // clusterSize)
+    centers = rng.uniform(0.1, 0.9, size=(clusters, 2))
+    sizes = rng.uniform(0.05, 0.2, size=(clusters, 2))
+    labels = rng.integers(1, 21, size=clusters)
+    which = rng.integers(0, clusters, size=count)
+    jitter = rng.normal(0.0, 0.01, size=(count, 2))
+    array = np.zeros((count, 7), dtype=np.float32)
+    array[:, 1] = labels[which]
+    array[:, 2] = rng.uniform(0.3, 1.0, size=count)
+    array[:, 3:5] = centers[which] - sizes[which] / 2 + jitter
+    array[:, 5:7] = centers[which] + sizes[which] / 2 + jitter
+    return array
+
+
+# host post-processing cost (per-class thresholds, class-wise NMS, top-K)
+# over synthetic detection sets of increasing size
+def benchmark_postprocess(counts=(10, 50, 100, 200), iterations=1000):
+    thresholds = class_threshold_array()
+    print(f'{"boxes":>6} {"kept":>5} {"filter us":>10}')
+    for count in counts:
+        detections = synthetic_detection_array(count)
+        kept = len(filter_detections(detections, thresholds))
+        elapsed = time_per_call(
+            lambda: filter_detections(detections, thresholds), iterations)
+        print(f'{count:>6} {kept:>5} {elapsed:>10.2f}')
+
+
+# per-frame tracker update cost with `count` objects drifting randomly,
+# over `frames` frames
+def benchmark_tracker(counts=(10, 50, 100, 300), frames=200):
+    print(f'{"objects":>8} {"tracks":>7} {"update ms":>10}')
+    for count in counts:
+        rng = np.random.default_rng(count)
+        positions = rng.uniform(0.0, 0.95, size=(count, 2))
+        labels = rng.integers(1, 21, size=count)
+        tracker = SortTracker()
+        elapsed = 0.0
+        for _ in range(frames):
+            positions += rng.normal(0.0, 0.001, size=(count, 2))
+            detections = np.zeros((count, 7), dtype=np.float32)
+            detections[:, 1] = labels
+            detections[:, 2] = 0.9
+            detections[:, 3:5] = positions
+            detections[:, 5:7] = positions + 0.03
+            start = time.perf_counter()
+            tracker.update(detections)
+            elapsed += time.perf_counter() - start
+        print(f'{count:>8} {len(tracker):>7} '
+              f'{elapsed / frames * 1e3:>10.3f}')
+
+
+# rectified synthetic stereo pair of `shape`: a random texture and the same
+# texture shifted left by a disparity growing from top to bottom
+def synthetic_stereo_pair(shape, maxDisparity=48, seed=0):
+    height, width = shape
+    rng = np.random.default_rng(seed)
+    texture = rng.integers(0, 255, size=(height, width + maxDisparity),
+                           dtype=np.uint8)
+    texture = cv2.GaussianBlur(texture, (3, 3), 0)
+    left = np.ascontiguousarray(texture[:, :width])
+    right = np.empty_like(left)
+    for y in range(height):
+        shift = maxDisparity * y // height
+        right[y] = texture[y, shift:shift + width]
+    return left, right
+
+
+# disparity throughput of the striped matcher for increasing worker counts
+# on 480p and 720p pairs. OpenCV's own thread pool is limited to one thread
+# meanwhile, so the scaling comes from the stripes alone
+def benchmark_stereo_depth(shapes=((480, 640), (720, 1280)),
+                           workersList=(1, 2, 4, 8), algorithms=('bm', 'sgbm'),
+                           frames=20):
+    print(f'host cores: {os.cpu_count()}')
+    print(f'{"algorithm":>9} {"resolution":>10} {"workers":>8} '
+          f'{"ms/frame":>9} {"fps":>7} {"speedup":>8}')
+    cvThreads = cv2.getNumThreads()
+    cv2.setNumThreads(1)
+    try:
+        for algorithm in algorithms:
+            for shape in shapes:
+                left, right = synthetic_stereo_pair(shape)
+                baseline = None
+                for workers in workersList:
+                    with StripedStereoMatcher(
+                            stripes=max(workersList), workers=workers,
+                            algorithm=algorithm) as matcher:
+                        matcher.compute(left, right)
+                        elapsed = time_per_call(
+                            lambda: matcher.compute(left, right), frames)
+                    baseline = baseline or elapsed
+                    print(f'{algorithm:>9} {shape[1]:>5}x{shape[0]:<4} '
+                          f'{workers:>8} {elapsed / 1e3:>9.1f} '
+                          f'{1e6 / elapsed:>7.1f} '
+                          f'{baseline / elapsed:>7.1f}x')
+    finally:
+        cv2.setNumThreads(cvThreads)
+
+
+
+# session startup cost of the undistortion tables of one camera: computed
+# with cv2.initUndistortRectifyMap (cold cache), or loaded from the
+# compressed or memory-mapped cache, each including the first remap of a
+# frame
+def benchmark_calibration_cache(sizes=((640, 400), (1280, 720),
+                                       (1920, 1080), (3840, 2160)),
+                                repeats=5):
+    print(f'{"resolution":>10} {"compute ms":>11} {"npz ms":>8} '
+          f'{"npy ms":>8} {"npz MB":>7} {"npy MB":>7}')
+    for width, height in sizes:
+        K = np.array([[width * 0.8, 0.0, width / 2],
+                      [0.0, width * 0.8, height / 2],
+                      [0.0, 0.0, 1.0]])
+        D = np.array([-0.12, 0.05, 0.001, -0.001, 0.0])
+        frame = np.zeros((height, width), dtype=np.uint8)
+
+        def startup(directory, storage):
+            cache = RectificationMapCache(directory, storage)
+            table = cache.get('bench', 'LEFT', (width, height),
+                              K, D, np.eye(3), K)
+            start = time.perf_counter()
+            table.remap(frame)
+            return (time.perf_counter() - start) * 1e3
+
+        times = {'compute': [], 'npz': [], 'npy': []}
+        sizesMB = {}
+        for _ in range(repeats):
+            with tempfile.TemporaryDirectory() as directory:
+                times['compute'].append(startup(directory, 'npy'))
+        for storage in ('npz', 'npy'):
+            with tempfile.TemporaryDirectory() as directory:
+                startup(directory, storage)
+                for _ in range(repeats):
+                    times[storage].append(startup(directory, storage))
+                sizesMB[storage] = sum(
+                    os.path.getsize(os.path.join(directory, name))
+                    for name in os.listdir(directory)) / 1e6
+        print(f'{width:>5}x{height:<4} {min(times["compute"]):>11.1f} '
+              f'{min(times["npz"]):>8.1f} {min(times["npy"]):>8.1f} '
+              f'{sizesMB["npz"]:>7.1f} {sizesMB["npy"]:>7.1f}')
+
+
+# host throughput of the multi-device fan-in for an increasing number of
+# simulated cameras, each replaying a 300x300 colour stream in real time.
+# The host loop converts and resizes every frame, as a preview would
+def benchmark_multi_device(deviceCounts=(1, 2, 4, 8), fps=30, duration=3.0):
+    print(f'{"devices":>8} {"host fps":>9} {"min dev fps":>12} '
+          f'{"dropped":>8} {"wait p99 ms":>12} {"CPU %":>7}')
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic_recording(directory, ('rgb',), fps, duration,
+                            shape=(300, 300, 3))
+        for count in deviceCounts:
+            sources = {f'sim{i}': ReplayFrameSource(directory)
+                       for i in range(count)}
+            manager = MultiDeviceManager(None, ('rgb',), sources)
+            handled = 0
+
+            def handle(mxId, stream, message):
+                nonlocal handled
+                handled += 1
+                cv2.resize(message.getCvFrame(), (150, 150))
+
+            cpuStart, wallStart = time.process_time(), time.monotonic()
+            with manager:
+                manager.run(handle)
+            wall = time.monotonic() - wallStart
+            cpu = time.process_time() - cpuStart
+
+            stats = manager.stats().values()
+            minFps = min(s['fps']['rgb']['fps'] for s in stats)
+            dropped = sum(s['dropped']['rgb'] for s in stats)
+            waitP99 = max(s['fanInWaitMs']['p99'] for s in stats)
+            print(f'{count:>8} {handled / wall:>9.1f} {minFps:>12.1f} '
+                  f'{dropped:>8} {waitP99:>12.2f} {cpu / wall * 100:>7.1f}')
+
+
+# stand-in for heavy per-frame host analytics: blur the frame in place and
+# draw its detections
+def _heavy_frame_work(frame, detections):
+    cv2.GaussianBlur(frame, (15, 15), 0, dst=frame)
+    annotateFrame(frame, detections)
+
+
+# frames per second through a host loop running _heavy_frame_work on 720p
+# colour frames inline, and offloaded to 1, 2 and 4 worker processes
+# through shared memory, with the per-worker utilization
+def benchmark_offload(workersList=(1, 2, 4), shape=(720, 1280, 3),
+                      frames=120):
+    rng = np.random.default_rng(0)
+    source = [rng.integers(0, 255, size=shape, dtype=np.uint8)
+              for _ in range(8)]
+    detections = synthetic_detections(20)
+    print(f'host cores: {os.cpu_count()}')
+    print(f'{"mode":>10} {"fps":>7} {"dropped":>8}  utilization')
+
+    start = time.perf_counter()
+    for i in range(frames):
+        frame = source[i % len(source)].copy()
+        _heavy_frame_work(frame, detections)
+    print(f'{"inline":>10} {frames / (time.perf_counter() - start):>7.1f} '
+          f'{0:>8}')
+
+    for workers in workersList:
+        with ProcessOffload(_heavy_frame_work, shape, workers=workers,
+                            slots=2 * workers) as offloader:
+            handled = 0
+
+            def count(frame, value):
+                nonlocal handled
+                handled += 1
+
+            start = time.perf_counter()
+            for i in range(frames):
+                # wait for a slot instead of dropping, to measure capacity
+                while not offloader.freeSlots:
+                    offloader.drain(count, wait=offloader.inFlight() > 0)
+                offloader.submit(source[i % len(source)], detections)
+                offloader.drain(count)
+            offloader.drain(count, wait=True)
+            elapsed = time.perf_counter() - start
+            utilization = ' '.join(f'{u:.2f}'
+                                   for u in offloader.utilization())
+            print(f'{f"{workers} proc":>10} {handled / elapsed:>7.1f} '
+                  f'{offloader.dropped:>8}  {utilization}')
+
+
+# consumer processes of benchmark_shm_ring: count the frames received and
+# their hand-off latency until the producer's end marker
+def _pipe_consumer(conn, results):
+    received, latency = 0, 0.0
+    while True:
+        item = conn.recv()
+        if item is None:
+            break
+        frame, sent = item
+        latency += time.monotonic() - sent
+        received += 1
+    results.put((received, 0, latency))
+
+
+def _ring_consumer(name, ready, results):
+    ring = SharedFrameRing(name)
+    ready.set()
+    received, latency = 0, 0.0
+    while True:
+        item = ring.read(timeout=1.0)
+        if item is None or item[2] < 0:
+            break
+        frame, _, _, sent = item
+        latency += time.monotonic() - sent
+        received += 1
+    results.put((received, ring.missed, latency))
+    ring.close()
+
+
+# hand `frames` frames of `shape` from one producer to 1..N consumer
+# processes, paced at `fps`, by pickling them through a pipe per consumer
+# or by writing them once into a shared-memory ring every consumer reads.
+# Reports the producer-side cost of the hand-off, and per consumer the
+# frames received, missed (ring overwritten before they were read) and the
+# mean hand-off latency
+def benchmark_shm_ring(shape=(720, 1280, 3), consumersList=(1, 2, 4),
+                       frames=300, fps=60):
+    rng = np.random.default_rng(0)
+    source = [rng.integers(0, 255, size=shape, dtype=np.uint8)
+              for _ in range(4)]
+    print(f'host cores: {os.cpu_count()}')
+    print(f'{"mode":>6} {"consumers":>9} {"handoffUs":>10} {"received":>9} '
+          f'{"missed":>7} {"latencyMs":>10}')
+
+    for mode in ('pipe', 'ring'):
+        for consumers in consumersList:
+            results = mp.Queue()
+            if mode == 'pipe':
+                pipes = [mp.Pipe(duplex=False) for _ in range(consumers)]
+                processes = [mp.Process(target=_pipe_consumer,
+                                        args=(reader, results))
+                             for reader, _ in pipes]
+
+                def handOff(frame, i):
+                    for _, writer in pipes:
+                        writer.send((frame, time.monotonic()))
+            else:
+                ring = SharedFrameRing('bench_ring', shape, np.uint8,
+                                       create=True)
+                readies = [mp.Event() for _ in range(consumers)]
+                processes = [mp.Process(target=_ring_consumer,
+                                        args=('bench_ring', ready, results))
+                             for ready in readies]
+
+                def handOff(frame, i):
+                    ring.write(frame, time.monotonic(), i)
+            for process in processes:
+                process.start()
+            if mode == 'ring':
+                for ready in readies:
+                    ready.wait()
+
+            spent = 0.0
+            start = time.monotonic()
+            for i in range(frames):
+                delay = start + i / fps - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                t = time.perf_counter()
+                handOff(source[i % len(source)], i)
+                spent += time.perf_counter() - t
+
+            if mode == 'pipe':
+                for _, writer in pipes:
+                    writer.send(None)
+            else:
+                ring.write(source[0], time.monotonic(), -1)
+            stats = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+            if mode == 'ring':
+                ring.close()
+
+            received = sum(r[0] for r in stats) / consumers
+            missed = sum(r[1] for r in stats) / consumers
+            latency = sum(r[2] for r in stats) / max(1, sum(
+                r[0] for r in stats))
+            print(f'{mode:>6} {consumers:>9} {spent / frames * 1e6:>10.1f} '
+                  f'{received:>9.1f} {missed:>7.1f} {latency * 1e3:>10.2f}')
+
+
+# MJPEG viewer of benchmark_mjpeg: count the parts received until `done`
+# is set. A `stalled` viewer sends its request and never reads
+def _mjpeg_viewer(port, path, done, counts, stalled=False):
+    with socket.socket() as sock:
+        if stalled:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.connect(('localhost', port))
+        sock.sendall(f'GET {path} HTTP/1.0\r\n\r\n'.encode())
+        if stalled:
+            done.wait()
+            return
+        sock.settimeout(0.2)
+        marker = b'--frame\r\n'
+        tail, parts = b'', 0
+        while not done.is_set():
+            try:
+                data = sock.recv(1 << 16)
+            except socket.timeout:
+                continue
+            if not data:
+                break
+            data = tail + data
+            parts += data.count(marker)
+            tail = data[-len(marker) + 1:]
+        counts.append(parts)
+
+
+# stream synthetic frames of `shape` published at `fps` to N viewers, plus
+# one viewer that never reads. Reports the cost of publish() on the
+# capture thread, the JPEG encodes per published frame (once per quality
+# level, whatever the number of viewers, against one per viewer when each
+# connection encodes for itself), the frame rate every reading viewer got
+# and what happened to the stalled one
+def benchmark_mjpeg(viewersList=(1, 4, 16), shape=(720, 1280, 3), fps=30,
+                    duration=3.0):
+    # gradient with some sensor-like noise and a moving box, so the JPEGs
+    # have a realistic size
+    rng = np.random.default_rng(0)
+    height, width = shape[:2]
+    gradient = rng.integers(0, 24, size=shape, dtype=np.uint8)
+    gradient[..., 0] += np.linspace(0, 220, width, dtype=np.uint8)
+    gradient[..., 1] += np.linspace(0, 220, height, dtype=np.uint8)[:, None]
+    frames = []
+    for i in range(30):
+        frame = gradient.copy()
+        x = i * (width - 200) // 30
+        cv2.rectangle(frame, (x, height // 3), (x + 200, height // 2),
+                      (0, 0, 255), -1)
+        frames.append(frame)
+    start = time.perf_counter()
+    sizes = [len(_encode(frame, 80)) for frame in frames]
+    encodeMs = (time.perf_counter() - start) / len(frames) * 1e3
+    print(f'host cores: {os.cpu_count()}, JPEG encode {encodeMs:.1f} ms, '
+          f'{np.mean(sizes) / 1024:.0f} KiB')
+    print(f'{"viewers":>8} {"publishUs":>10} {"encodes/frame":>14} '
+          f'{"perViewerEncodeMs":>18} {"viewerFps":>10} {"dropped":>8} '
+          f'{"disconnected":>13}')
+
+    for viewers in viewersList:
+        with MjpegServer(host='localhost', port=0, writeTimeout=1.0) as server:
+            server.publish('rgb', frames[0])
+            done = threading.Event()
+            counts = []
+            threads = [threading.Thread(
+                target=_mjpeg_viewer,
+                args=(server.port, '/rgb.mjpg', done, counts, i == viewers))
+                for i in range(viewers + 1)]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.2)
+
+            published, spent = 0, 0.0
+            start = time.monotonic()
+            while time.monotonic() - start < duration:
+                delay = start + published / fps - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                t = time.perf_counter()
+                server.publish('rgb', frames[published % len(frames)])
+                spent += time.perf_counter() - t
+                published += 1
+
+            time.sleep(0.2)
+            stats = server.stats()
+            done.set()
+            for thread in threads:
+                thread.join()
+        print(f'{viewers:>8} {spent / published * 1e6:>10.1f} '
+              f'{stats["encodes"] / published:>14.2f} '
+              f'{viewers * encodeMs:>18.1f} '
+              f'{sum(counts) / len(counts) / duration:>10.1f} '
+              f'{stats["dropped"]:>8} {stats["disconnected"]:>13}')
+
+
+# replay one 60 fps stream in real time into a host loop that spends
+# `workMs` per frame (getCvFrame plus display-like work), through a
+# non-blocking queue of 4, draining 'all' pending frames or only the
+# 'latest'. Reports the frames handled (and so converted), skipped by the
+# drain policy and overwritten in the queue, and the age of each frame
+# when the loop is done with it
+def benchmark_drain(workList=(10, 25, 50), fps=60, duration=3.0,
+                    shape=(480, 640)):
+    print(f'{"workMs":>7} {"drain":>7} {"handled":>8} {"skipped":>8} '
+          f'{"overwritten":>12} {"meanAgeMs":>10} {"p99AgeMs":>9}')
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic_recording(directory, ('rgb',), fps, duration, shape)
+        for workMs in workList:
+            for drain in ('all', 'latest'):
+                ages = []
+                with ReplayFrameSource(directory, realtime=True) as source:
+                    def handle(message):
+                        message.getCvFrame()
+                        time.sleep(workMs / 1e3)
+                        ages.append((source.clockNow()
+                                     - message.getTimestamp()
+                                     ).total_seconds())
+
+                    consumer = QueueConsumer(source, {'rgb': handle},
+                                             maxSize=4, blocking=False,
+                                             queueOptions={
+                                                 'rgb': {'drain': drain}})
+                    consumer.run()
+                    overwritten = source.queues['rgb'].dropped
+                ages = np.array(ages) * 1e3
+                print(f'{workMs:>7} {drain:>7} {len(ages):>8} '
+                      f'{consumer.skipped["rgb"]:>8} {overwritten:>12} '
+                      f'{ages.mean():>10.1f} {np.percentile(ages, 99):>9.1f}')
+
+
+# stand-in for a planar dai.ImgFrame as the ColorCamera sends it with
+# CAMERA_INTERLEAVED = False: RGB888p planes in one flat buffer
+class _PlanarImgFrame:
+    def __init__(self, planes):
+        self.data = planes.reshape(-1)
+        self.height, self.width = planes.shape[1:]
+
+    def getData(self):
+        return self.data
+
+    def getType(self):
+        return SimpleNamespace(name='RGB888p')
+
+    def getWidth(self):
+        return self.width
+
+    def getHeight(self):
+        return self.height
+
+    # what dai.ImgFrame.getCvFrame does for planar frames: merge the
+    # planes in BGR order into a new interleaved frame
+    def getCvFrame(self):
+        planes = self.data.reshape(3, self.height, self.width)
+        return cv2.merge([planes[2], planes[1], planes[0]])
+
+
+# per-frame host cost of getting at the pixels of planar frames, for the
+# consumers of the demos: a CHW consumer (ring sharing, NN feeding) taking
+# getCvFrame output back to RGB planes against the zero-copy FrameView
+# planes, and a frame that is both recorded and displayed, converted by
+# each getCvFrame call against once by the shared FrameView
+def benchmark_frame_view(shapes=((300, 300), (720, 1280), (1080, 1920)),
+                         iterations=200):
+    rng = np.random.default_rng(0)
+    print(f'{"size":>10} {"chw via getCvFrame":>19} {"chw view":>9} '
+          f'{"2x getCvFrame":>14} {"view bgr":>9}  (us)')
+    for shape in shapes:
+        message = _PlanarImgFrame(rng.integers(
+            0, 255, size=(3,) + shape, dtype=np.uint8))
+
+        def chwConverted():
+            frame = message.getCvFrame()
+            return np.ascontiguousarray(frame[..., ::-1].transpose(2, 0, 1))
+
+        def chwView():
+            return FrameView(message).rgb
+
+        def bgrTwice():
+            message.getCvFrame()
+            message.getCvFrame()
+
+        def bgrShared():
+            view = FrameView(message)
+            view.getCvFrame()
+            view.getCvFrame()
+
+        times = [time_per_call(f, iterations)
+                 for f in (chwConverted, chwView, bgrTwice, bgrShared)]
+        size = f'{shape[1]}x{shape[0]}'
+        print(f'{size:>10} {times[0]:>19.1f} {times[1]:>9.1f} '
+              f'{times[2]:>14.1f} {times[3]:>9.1f}')
+
+
+# host cost per synced left/right pair of the ways to write a host loop,
+# replaying a recording at maximum speed: QueueConsumer callbacks feeding
+# a MessageSynchronizer by hand, `for` over iter_messages and `async for`
+# over it
+def benchmark_streaming(frames=3000, streams=('left', 'right')):
+    def callbacks(source):
+        sync = MessageSynchronizer(streams)
+        pairs = 0
+
+        def handler(stream):
+            def handle(message):
+                nonlocal pairs
+                if sync.add(stream, message) is not None:
+                    pairs += 1
+            return handle
+
+        QueueConsumer(source, {s: handler(s) for s in streams}).run()
+        return pairs
+
+    def generator(source):
+        return sum(1 for _ in iter_messages(source, streams))
+
+    def asyncGenerator(source):
+        async def run():
+            pairs = 0
+            async for _ in iter_messages(source, streams):
+                pairs += 1
+            return pairs
+        return asyncio.run(run())
+
+    print(f'{"loop":>14} {"pairs":>6} {"us/pair":>8}')
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic_recording(directory, streams, 30, frames / 30)
+        for name, loop in (('callbacks', callbacks),
+                           ('iter_messages', generator),
+                           ('async for', asyncGenerator)):
+            with ReplayFrameSource(directory, realtime=False) as source:
+                start = time.perf_counter()
+                pairs = loop(source)
+                elapsed = time.perf_counter() - start
+            print(f'{name:>14} {pairs:>6} {elapsed / pairs * 1e6:>8.1f}')
+
+
+# throughput check of the demos' host loops without an OAK: every demo
+# runs headless for `duration` seconds on a SimulatedDevice fed the demo's
+# own pipeline, at the FPS the pipeline configures. For every stream it
+# reports the messages the device sent, the share the host read (the rest
+# was overwritten in the host queue) and the camera frames lost to
+# stalls, plus the host CPU used by the demo (the simulated device's own
+# thread excluded). A stream read below `minRead` is a throughput
+# regression: the result is False if any stream is, so CI can fail on it
+def benchmark_simulated_device(duration=3.0, minRead=0.95):
+    demos = (
+        ('color_camera', create_color_camera_pipeline, color_camera, {}),
+        ('mono_cameras', create_mono_camera_pipeline, mono_cameras_preview,
+         {}),
+        ('object_detection', create_detection_pipeline,
+         object_detection_mobilenet, {}),
+        ('host_decoding',
+         lambda: create_detection_pipeline(hostDecoding=True),
+         object_detection_mobilenet,
+         {'hostDecoding': True, 'hostNMS': True, 'track': True}),
+    )
+    print(f'{"demo":>16} {"stream":>10} {"sent":>6} {"read %":>7} '
+          f'{"dropped":>8} {"stalled":>8} {"cpu %":>6}')
+    passed = True
+    for name, createPipeline, demo, options in demos:
+        pipeline = createPipeline()
+        device = SimulatedDevice(pipeline)
+        cpuStart, wallStart = time.process_time(), time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            demo(pipeline, source=device, headless=True, duration=duration,
+                 **options)
+        stats = device.stats()
+        cpu = time.process_time() - cpuStart - stats['producerCpu']
+        cpu = 100 * cpu / (time.monotonic() - wallStart)
+        stalled = sum(c['stalled'] for c in stats['cameras'].values())
+        for stream, counts in stats['streams'].items():
+            # messages still queued when the demo stopped were not lost
+            read = counts['read'] / max(counts['sent'] - counts['queued'], 1)
+            ok = read >= minRead
+            passed = passed and ok
+            print(f'{name:>16} {stream:>10} {counts["sent"]:>6} '
+                  f'{100 * read:>7.1f} {counts["dropped"]:>8} '
+                  f'{stalled:>8} {cpu:>6.1f}' + ('' if ok else '  SLOW'))
+    print('ok' if passed else f'FAILED: a stream was read below '
+                              f'{100 * minRead:.0f}%')
+    return passed
@@ -0,0 +1,128 @@
+# import the necessary packages
+from dai_tools import config
+import numpy as np
+import hashlib
+import json
+import cv2
+import os
+
+
+# digest of the inputs of cv2.initUndistortRectifyMap, so a cached table
+# is recomputed when the device is recalibrated
+def _map_digest(K, D, R, P, size):
+    digest = hashlib.sha1()
+    for array in (K, D, R, P):
+        digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    digest.update(np.asarray(size, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+# undistort/rectify remap tables of one camera socket at one resolution.
+# The tables are fixed point (CV_16SC2 map plus CV_16UC1 interpolation
+# table) and only loaded or computed on the first remap(), so creating
+# one is free
+class RemapTable:
+    def __init__(self, cache, key, K, D, R, P, size):
+        self.cache = cache
+        self.key = key
+        self.args = (K, D, R, P, tuple(size))
+        self._maps = None
+
+    @property
+    def maps(self):
+        if self._maps is None:
+            self._maps = self.cache.load(self.key, *self.args)
+        return self._maps
+
+    def remap(self, frame, interpolation=cv2.INTER_LINEAR):
+        return cv2.remap(frame, *self.maps, interpolation)
+
+
+# on-disk cache of remap tables keyed by (device MxID, socket, resolution).
+# Tables are stored in `directory` either memory-mapped ('npy': one .npy
+# file per table, mapped read-only at load time so only the pages remap
+# touches are read) or compressed ('npz'). A small .json next to them
+# holds the digest of the calibration they were computed from. Loaded
+# tables are also kept in memory for the session
+class RectificationMapCache:
+    def __init__(self, directory=config.CALIBRATION_CACHE_DIR,
+                 storage=config.CALIBRATION_CACHE_FORMAT):
+        if storage not in ('npy', 'npz'):
+            raise ValueError(f'unknown calibration cache format {storage!r}')
+        self.directory = directory
+        self.storage = storage
+        self.tables = {}
+
+        # counters: tables read from disk and tables computed
+        self.hits = 0
+        self.misses = 0
+
+    def _stem(self, key):
+        mxId, socketName, (width, height) = key
+        return os.path.join(
+            self.directory, f'{mxId}_{socketName}_{width}x{height}')
+
+    # remap tables for (mxId, socket, size), from K, D, the rectification
+    # rotation R and the new projection (or camera) matrix P
+    def get(self, mxId, socket, size, K, D, R, P):
+        key = (mxId, getattr(socket, 'name', str(socket)), tuple(size))
+        return RemapTable(self, key, K, D, R, P, size)
+
+    # tables undistorting a single camera, e.g. the colour camera, from
+    # the dai.CalibrationHandler of the device
+    def undistortion(self, mxId, calibration, socket, size):
+        width, height = size
+        K = np.array(calibration.getCameraIntrinsics(socket, width, height))
+        D = np.array(calibration.getDistortionCoefficients(socket))
+        return self.get(mxId, socket, size, K, D, np.eye(3), K)
+
+    def load(self, key, K, D, R, P, size):
+        digest = _map_digest(K, D, R, P, size)
+        cached = self.tables.get(key)
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+
+        maps = self._read(key, digest)
+        if maps is None:
+            self.misses += 1
+            maps = cv2.initUndistortRectifyMap(
+                np.asarray(K, np.float64), np.asarray(D, np.float64),
+                np.asarray(R, np.float64), np.asarray(P, np.float64),
+                size, cv2.CV_16SC2)
+            self._write(key, digest, maps)
+        else:
+            self.hits += 1
+        self.tables[key] = (digest, maps)
+        return maps
+
+    def _read(self, key, digest):
+        stem = self._stem(key)
+        try:
+            with open(stem + '.json') as f:
+                meta = json.load(f)
+            if meta['digest'] != digest or meta['storage'] != self.storage:
+                return None
+            if self.storage == 'npy':
+                return (np.load(stem + '.map1.npy', mmap_mode='r'),
+                        np.load(stem + '.map2.npy', mmap_mode='r'))
+            with np.load(stem + '.npz') as data:
+                return data['map1'], data['map2']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write(self, key, digest, maps):
+        os.makedirs(self.directory, exist_ok=True)
+        stem = self._stem(key)
+        if self.storage == 'npy':
+            np.save(stem + '.map1.npy', maps[0])
+            np.save(stem + '.map2.npy', maps[1])
+        else:
+            np.savez_compressed(stem + '.npz', map1=maps[0], map2=maps[1])
+
+        # the metadata goes last, so an interrupted write is a miss
+        with open(stem + '.json', 'w') as f:
+            json.dump({'digest': digest, 'storage': self.storage}, f)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'loaded': len(self.tables)}
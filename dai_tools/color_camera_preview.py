@@ -1,56 +1,95 @@
 # import the necessary packages
-from dai_tools import config
-import depthai as dai
+from dai_tools.frame_source import DeviceFrameSource
+from dai_tools.streaming import iter_messages
+from dai_tools.run_control import StopCondition
+from dai_tools.fps import StreamMeters
+from dai_tools.recorder import create_recorders
+from dai_tools.shm_ring import create_ring_sinks
+from dai_tools.pipeline_builder import build_pipeline, graph_path
 import cv2
 
 def create_color_camera_pipeline():
-    # create pipeline
-    pipeline = dai.Pipeline()
+    # camera preview sent to the host as the rgb stream, as described in
+    # pipelines/color_camera.json
+    pipeline, _ = build_pipeline(graph_path('color_camera'))
+    return pipeline
 
-    # define source and output camera node
-    camRgb = pipeline.create(dai.node.ColorCamera)
 
-    # XLinkOut node for displaying frames
-    xoutRgb = pipeline.create(dai.node.XLinkOut)
+def color_camera(pipeline, source=None, headless=False, duration=None,
+                 maxFrames=None, recordDir=None, recordFormat='raw',
+                 shareName=None, queueOptions=None, server=None,
+                 shareLayout='bgr'):
+    # connect to device and start pipeline, unless another frame source
+    # (e.g. a ReplayFrameSource) is given. In headless mode nothing is
+    # displayed and the loop runs until `duration` seconds or `maxFrames`
+    # frames have passed, or Ctrl+C is pressed. With `recordDir` set, the
+    # rgb stream is also archived there ('raw' frames or 'video'). With
+    # `shareName` set, the rgb frames are also published into the
+    # shared-memory ring `<shareName>_rgb` (see shm_ring.py), as BGR frames
+    # or, with `shareLayout` 'planar', as the camera's planes. With a
+    # `server` (see mjpeg_server.py) the frames are also streamed as MJPEG.
+    # `queueOptions` overrides the rgb queue settings of config.py (e.g.
+    # from a pipeline graph, see pipeline_builder.py)
+    if source is None:
+        source = DeviceFrameSource(pipeline)
 
-    # set stream name as rgb
-    xoutRgb.setStreamName('rgb')
+    with source as device:
+        print('Connected cameras: ', device.getConnectedCameras())
+        # print out usb speed like low/high
+        print('Usb speed: ', device.getUsbSpeed().name)
 
-    # set camera properties like the preview window, interleaved
-    camRgb.setPreviewSize(config.COLOR_CAMERA_PREVIEW_SIZE)
-    camRgb.setInterleaved(config.CAMERA_INTERLEAVED)
-    camRgb.setColorOrder(dai.ColorCameraProperties.ColorOrder.RGB)
+        # sliding-window FPS of the rgb stream
+        meters = StreamMeters(('rgb',))
 
-    # link the camera preview to XLinkOut node input
-    camRgb.preview.link(xoutRgb.input)
+        # background recorders the frames are handed off to
+        recorders = {}
+        if recordDir is not None:
+            recorders = create_recorders(recordDir, ('rgb',), recordFormat)
+        sharers = {}
+        if shareName is not None:
+            sharers = create_ring_sinks(shareName, ('rgb',),
+                                        layout=shareLayout)
 
-    # return pipeline to the calling function
-    return pipeline
+        try:
+            with StopCondition(headless, duration, maxFrames) as stop:
+                # rgb frames from the output defined above, until the device
+                # closes, `q` key is pressed or the run limits are reached
+                frames = iter_messages(device, ('rgb',),
+                                       queueOptions=queueOptions, stop=stop)
+                for bundle in frames:
+                    # the recorders, the ring and the window all take the
+                    # frame from one view of the message, converted to BGR
+                    # at most once and only if one of them needs it
+                    inRgb = bundle.frame
+                    meters.tickMessage('rgb', inRgb)
+                    stop.tick()
+                    if recorders:
+                        recorders['rgb'].submit(inRgb)
+                    if sharers:
+                        sharers['rgb'].submit(inRgb)
 
+                    # convert the rgb frame data to OpenCV format and
+                    # display 'bgr' (opencv format) frame
+                    if not headless or server is not None:
+                        frame = inRgb.getCvFrame()
+                        if server is not None:
+                            server.publish('rgb', frame)
+                        if not headless:
+                            cv2.imshow('rgb', frame)
+        finally:
+            # flush the recordings to disk and release the rings, also when
+            # the loop failed
+            for recorder in recorders.values():
+                recorder.close()
+            for sharer in sharers.values():
+                sharer.close()
 
-def color_camera(pipeline):
-    # connect to device and start pipeline
-    with dai.Device(pipeline) as device:
-        print('Connected cameras: ', device.getConnectedCameras())
-        # print out usb speed like low/high
-        print('Usb speed: ', device.getUsbSpeed().name)
+        print('Processed: ', stop.summary())
+        print('FPS: ', meters.report())
+        if frames.consumer.drain['rgb'] == 'latest':
+            print('Skipped: ', frames.consumer.skipped)
 
-        # output queue will be used to get the rgb
-        # frames from the output defined above
-        qRgb = device.getOutputQueue(
-            name='rgb',
-            maxSize=config.COLOR_CAMERA_QUEUE_SIZE,
-            blocking=config.QUEUE_BLOCKING,
-        )
-
-        while True:
-            # blocking call, will wait until a new data has arrived
-            inRgb = qRgb.get()
-
-            # convert the rgb frame data to OpenCV format and
-            # display 'bgr' (opencv format) frame
-            cv2.imshow('rgb', inRgb.getCvFrame())
-
-            # break out from the while loop if `q` key is pressed
-            if cv2.waitKey(1) == ord('q'):
-                break
\ No newline at end of file
+        for stream, recorder in recorders.items():
+            print(f'Recorded {stream}: ', recorder.stats())
+        for stream, sharer in sharers.items():
+            print(f'Shared {stream}: ', sharer.stats())
\ No newline at end of file
@@ -1,3 +1,6 @@
+# import the necessary packages
+import os
+
 # set the color camera preview size and interleaved
 COLOR_CAMERA_PREVIEW_SIZE = 300, 300
 CAMERA_INTERLEAVED = False
@@ -6,6 +9,45 @@ CAMERA_FPS = 40
 # queue parameters for rgb and mono camera frames at host side
 COLOR_CAMERA_QUEUE_SIZE = 4
 QUEUE_BLOCKING = False
+# how the host loops drain a stream's pending messages: 'all' of them, or
+# only the 'latest', skipping stale ones (overridable per stream)
+QUEUE_DRAIN = 'all'
+# messages per device held in the shared queue the host loop reads from
+# when several devices run at once
+MULTI_DEVICE_QUEUE_SIZE = 16
+# worker processes frames are annotated on when the host work is
+# offloaded from the thread draining the device queues
+OFFLOAD_WORKERS = 2
+# seconds between worker liveness checks while waiting on an offloaded
+# result, and how long close() waits for a worker before terminating it
+OFFLOAD_POLL_INTERVAL = 0.1
+OFFLOAD_JOIN_TIMEOUT = 2.0
+# number of unmatched messages kept per stream when pairing rgb frames
+# with nn detections by sequence number
+SYNC_BUFFER_SIZE = 8
+
+# asynchronous recorder: messages waiting for the writer thread, and
+# frames preallocated per stream in raw recordings
+RECORDER_QUEUE_SIZE = 32
+RECORDER_MAX_FRAMES = 2400
+# frames kept in each shared-memory ring other processes read from
+SHM_RING_SLOTS = 8
+
+# MJPEG streaming server: address, default JPEG quality, frames queued per
+# viewer before its oldest one is dropped, and seconds a viewer may accept
+# nothing before it is disconnected
+MJPEG_HOST = '0.0.0.0'
+MJPEG_PORT = 8080
+MJPEG_QUALITY = 80
+MJPEG_CLIENT_QUEUE_SIZE = 2
+MJPEG_WRITE_TIMEOUT = 2.0
+
+# simulated device (see simulated_device.py): objects moving through the
+# synthetic scene, seconds the simulated network takes per frame, and
+# distinct synthetic frames each camera output cycles through
+SIMULATED_OBJECTS = 3
+SIMULATED_INFERENCE_TIME = 0.02
+SIMULATED_FRAME_PATTERNS = 16
 
 # object detection class labels
 CLASS_LABELS = ["background", "aeroplane", "bicycle", "bird", "boat",
@@ -14,12 +56,45 @@ CLASS_LABELS = ["background", "aeroplane", "bicycle", "bird", "boat",
                 "pottedplant", "sheep", "sofa", "train", "tvmonitor"]
 MOBILENET_DETECTION_MODEL_PATH = 'models/mobilenet-ssd_openvino_2021.' \
                                  '4_6shave.blob'
+# directory of the pipeline graphs the demos are built from (see
+# pipeline_builder.py)
+PIPELINE_GRAPH_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pipelines')
 
 # neural network hyperparameters
 NN_THRESHOLD = 0.5
+# per-class confidence thresholds applied on the host when decoding the
+# raw SSD output, e.g. {"person": 0.4, "bottle": 0.7}
+CLASS_THRESHOLDS = {}
+SSD_OUTPUT_LAYER = 'detection_out'
+# host-side non-maximum suppression: IoU above which a lower confidence
+# box of the same class is suppressed, and max detections kept per frame
+NMS_IOU_THRESHOLD = 0.45
+NMS_TOP_K = 50
 INFERENCE_THREADS = 2
 PRINT_NEURAL_NETWORK_METADATA = True
 
+# multi-object tracker: frames a track survives without a detection,
+# detections needed before a track is reported, and minimum IoU between
+# a track and a detection to match them
+TRACKER_MAX_AGE = 10
+TRACKER_MIN_HITS = 3
+TRACKER_IOU_THRESHOLD = 0.3
+
 # frame text color pattern
 TEXT_COLOR = (0, 255, 0)
-TEXT_COLOR2 = (255, 255, 255)
\ No newline at end of file
+TEXT_COLOR2 = (255, 255, 255)
+# host-side stereo depth from the left/right mono frames: matcher ('bm' or
+# 'sgbm'), disparity search range (multiple of 16) and block size, and the
+# horizontal stripes matched in parallel on a pool of worker threads
+STEREO_ALGORITHM = 'sgbm'
+STEREO_NUM_DISPARITIES = 64
+STEREO_BLOCK_SIZE = 5
+STEREO_STRIPES = 4
+STEREO_WORKERS = 4
+
+# on-disk cache of the undistortion/rectification remap tables, stored
+# memory-mapped ('npy') or compressed ('npz')
+CALIBRATION_CACHE_DIR = os.path.join(
+    os.path.expanduser('~'), '.cache', 'oakd-dev', 'calibration')
+CALIBRATION_CACHE_FORMAT = 'npy'
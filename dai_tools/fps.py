@@ -0,0 +1,131 @@
+# import the necessary packages
+from dai_tools.instrumentation import LatencyHistogram
+from abc import ABC, abstractmethod
+import time
+
+
+# real-time throughput meters fed with one tick() per message. tick() is
+# O(1) and only updates preallocated state. Both variants report the
+# current FPS plus the current, min and p99 inter-arrival times, so drops
+# show up immediately instead of being smoothed out by a lifetime average.
+# The host loops hand all the messages of one dequeue to their handlers
+# back to back, so the host clock at dispatch says little about when they
+# were produced: per-message meters tick with tickMessage(), on the
+# device timestamps
+class FPSMeter(ABC):
+    def __init__(self):
+        self.lastTick = None
+        self.last = 0.0
+        self.min = float('inf')
+        self.ticks = 0
+
+    def tick(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        self.ticks += 1
+        if self.lastTick is not None:
+            interval = now - self.lastTick
+            self.last = interval
+            if interval < self.min:
+                self.min = interval
+            self._update(interval)
+        self.lastTick = now
+
+    # tick at the device timestamp of `message` (anything with
+    # getTimestamp, e.g. a dai.ImgFrame)
+    def tickMessage(self, message):
+        self.tick(message.getTimestamp().total_seconds())
+
+    @abstractmethod
+    def _update(self, interval):
+        pass
+
+    # smoothed inter-arrival time in seconds
+    @abstractmethod
+    def interval(self):
+        pass
+
+    @abstractmethod
+    def p99(self):
+        pass
+
+    def fps(self):
+        interval = self.interval()
+        return 1.0 / interval if interval > 0 else 0.0
+
+    # summary with inter-arrival times in milliseconds
+    def report(self):
+        return {
+            'fps': self.fps(),
+            'currentMs': self.last * 1e3,
+            'minMs': self.min * 1e3 if self.ticks > 1 else 0.0,
+            'p99Ms': self.p99() * 1e3,
+        }
+
+
+# FPS over the last `window` inter-arrival times, kept in a ring buffer
+class WindowFPSMeter(FPSMeter):
+    def __init__(self, window=60):
+        super().__init__()
+        self.intervals = [0.0] * window
+        self.index = 0
+        self.filled = 0
+        self.total = 0.0
+
+    def _update(self, interval):
+        self.total += interval - self.intervals[self.index]
+        self.intervals[self.index] = interval
+        self.index = (self.index + 1) % len(self.intervals)
+        if self.filled < len(self.intervals):
+            self.filled += 1
+
+    def interval(self):
+        return self.total / self.filled if self.filled else 0.0
+
+    # p99 of the window, only sorted when a report is asked for
+    def p99(self):
+        if not self.filled:
+            return 0.0
+        window = sorted(self.intervals[:self.filled])
+        return window[int(0.99 * (self.filled - 1))]
+
+
+# FPS from an exponentially-weighted moving average of the inter-arrival
+# times; p99 comes from a fixed-size histogram of all of them
+class EWMAFPSMeter(FPSMeter):
+    def __init__(self, alpha=0.1):
+        super().__init__()
+        self.alpha = alpha
+        self.average = 0.0
+        self.histogram = LatencyHistogram()
+
+    def _update(self, interval):
+        if self.histogram.count == 0:
+            self.average = interval
+        else:
+            self.average += self.alpha * (interval - self.average)
+        self.histogram.record(interval)
+
+    def interval(self):
+        return self.average
+
+    def p99(self):
+        return self.histogram.quantile(0.99)
+
+
+# one meter per stream (e.g. 'rgb', 'left', 'right', 'nn')
+class StreamMeters:
+    def __init__(self, streams, meter=WindowFPSMeter):
+        self.meters = {stream: meter() for stream in streams}
+
+    def __getitem__(self, stream):
+        return self.meters[stream]
+
+    def tick(self, stream, now=None):
+        self.meters[stream].tick(now)
+
+    def tickMessage(self, stream, message):
+        self.meters[stream].tickMessage(message)
+
+    def report(self):
+        return {stream: m.report() for stream, m in self.meters.items()}
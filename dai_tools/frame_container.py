@@ -0,0 +1,190 @@
+# import the necessary packages
+import numpy as np
+import struct
+
+# on-disk container for sequences of fixed-shape frames (e.g. 300x300x3
+# previews or 1280x720 mono frames) with their device timestamps, sequence
+# numbers and detections. Layout, all little endian:
+#
+#   [header, 4 KiB] [index, capacity records] [frames, capacity slots]
+#   [detections, (M, 6) float32 table appended on close]
+#
+# The header holds the frame shape/dtype, capacity, frame count and the
+# section offsets. Each index record holds the byte offset of its frame,
+# its timestamp (seconds), sequence number and the slice of the detection
+# table (label, confidence, xmin, ymin, xmax, ymax) that belongs to it.
+# Sections are page aligned, so frames are read through numpy.memmap
+# without any decoding and any frame can be fetched by number
+MAGIC = b'DAIFRAME'
+VERSION = 1
+PAGE_SIZE = 4096
+MAX_DIMS = 4
+HEADER = struct.Struct(f'<8sII{MAX_DIMS}Q8sQQQQQQ')
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'),
+    ('timestamp', '<f8'),
+    ('sequenceNum', '<i8'),
+    ('detectionStart', '<u8'),
+    ('detectionCount', '<u4'),
+    ('reserved', '<u4'),
+])
+DETECTION_FIELDS = 6
+
+
+def _align(size):
+    return -(-size // PAGE_SIZE) * PAGE_SIZE
+
+
+# section offsets and sizes for `capacity` frames of `frameBytes` bytes
+def _layout(capacity, frameBytes):
+    indexOffset = PAGE_SIZE
+    dataOffset = indexOffset + _align(capacity * INDEX_DTYPE.itemsize)
+    detectionOffset = dataOffset + _align(capacity * frameBytes)
+    return indexOffset, dataOffset, detectionOffset
+
+
+# writes a container preallocated for `capacity` frames of `shape` and
+# `dtype`. An empty `shape` with dtype None makes a detections-only
+# container (e.g. for the `nn` stream)
+class FrameContainerWriter:
+    def __init__(self, path, shape, dtype, capacity):
+        self.path = path
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype if dtype is not None else np.uint8)
+        self.capacity = capacity
+        self.frameBytes = (int(np.prod(self.shape)) * self.dtype.itemsize
+                           if self.shape else 0)
+        self.indexOffset, self.dataOffset, self.detectionOffset = _layout(
+            capacity, self.frameBytes)
+        self.count = 0
+        self.detections = []
+        self.detectionCount = 0
+
+        # preallocate the file (sparse where the filesystem allows it)
+        with open(path, 'wb') as f:
+            f.truncate(self.detectionOffset)
+            self._writeHeader(f)
+        self.index = np.memmap(path, dtype=INDEX_DTYPE, mode='r+',
+                               offset=self.indexOffset, shape=(capacity,))
+        self.frames = None
+        if self.frameBytes:
+            self.frames = np.memmap(
+                path, dtype=self.dtype, mode='r+', offset=self.dataOffset,
+                shape=(capacity,) + self.shape)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # append one frame (None for detections-only containers); `detections`
+    # is an (K, 6) array-like or a list of objects with label, confidence,
+    # xmin, ymin, xmax and ymax. Returns False once the capacity is reached
+    def write(self, frame, timestamp, sequenceNum, detections=()):
+        if self.count >= self.capacity:
+            return False
+        i = self.count
+        if self.frames is not None:
+            self.frames[i] = frame
+        rows = _detection_rows(detections)
+        self.index[i] = (
+            self.dataOffset + i * self.frameBytes, timestamp, sequenceNum,
+            self.detectionCount, len(rows), 0,
+        )
+        if len(rows):
+            self.detections.append(rows)
+            self.detectionCount += len(rows)
+        self.count += 1
+        return True
+
+    def close(self):
+        if self.index is None:
+            return
+        if self.frames is not None:
+            self.frames.flush()
+        self.index.flush()
+        self.frames = self.index = None
+
+        with open(self.path, 'r+b') as f:
+            f.seek(self.detectionOffset)
+            for rows in self.detections:
+                f.write(rows.tobytes())
+            f.seek(0)
+            self._writeHeader(f)
+
+    # the frame count in the header is only updated on close
+    def _writeHeader(self, f):
+        shape = self.shape + (0,) * (MAX_DIMS - len(self.shape))
+        f.write(HEADER.pack(
+            MAGIC, VERSION, len(self.shape), *shape,
+            self.dtype.str.encode(), self.capacity, self.count,
+            self.indexOffset, self.dataOffset, self.detectionOffset,
+            self.detectionCount,
+        ))
+
+
+def _detection_rows(detections):
+    if isinstance(detections, np.ndarray):
+        return detections.astype(np.float32).reshape(-1, DETECTION_FIELDS)
+    return np.array(
+        [(d.label, d.confidence, d.xmin, d.ymin, d.xmax, d.ymax)
+         for d in detections], dtype=np.float32,
+    ).reshape(-1, DETECTION_FIELDS)
+
+
+# read-only view of a container. `frames`, `timestamps` and `sequenceNums`
+# are memory-mapped arrays of length len(container), so container[i],
+# container[-1], container[::-1] or container[[5, 2, 9]] fetch frames by
+# number (including reverse scrubbing) straight from the page cache
+class FrameContainer:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            fields = HEADER.unpack(f.read(HEADER.size))
+        magic, version, ndim = fields[:3]
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{path}' is not a frame container")
+        (dtype, capacity, self.count, indexOffset, dataOffset,
+         detectionOffset, detectionCount) = fields[3 + MAX_DIMS:]
+        self.shape = tuple(fields[3:3 + ndim])
+        self.dtype = np.dtype(dtype.rstrip(b'\0').decode())
+
+        self.index = np.memmap(path, dtype=INDEX_DTYPE, mode='r',
+                               offset=indexOffset, shape=(capacity,)
+                               )[:self.count]
+        self.frames = None
+        if self.shape and self.count:
+            self.frames = np.memmap(
+                path, dtype=self.dtype, mode='r', offset=dataOffset,
+                shape=(self.count,) + self.shape)
+        self.detectionTable = np.zeros((0, DETECTION_FIELDS), np.float32)
+        if detectionCount:
+            self.detectionTable = np.memmap(
+                path, dtype=np.float32, mode='r', offset=detectionOffset,
+                shape=(detectionCount, DETECTION_FIELDS))
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return self.frames[i]
+
+    @property
+    def timestamps(self):
+        return self.index['timestamp']
+
+    @property
+    def sequenceNums(self):
+        return self.index['sequenceNum']
+
+    # (K, 6) detections of frame `i`
+    def detections(self, i):
+        start = int(self.index['detectionStart'][i])
+        return self.detectionTable[
+            start:start + int(self.index['detectionCount'][i])]
+
+    # per-frame offsets into the detection table, as used by replay
+    def detectionOffsets(self):
+        ends = self.index['detectionStart'] + self.index['detectionCount']
+        return np.concatenate(([0], ends)).astype(np.int64)
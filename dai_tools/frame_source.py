@@ -0,0 +1,408 @@
+# import the necessary packages
+from dai_tools.frame_container import FrameContainer
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+import numpy as np
+import datetime
+import time
+import os
+
+
+# a FrameSource is what the host loops read their messages from. It mirrors
+# the small subset of the dai.Device API the demos use (context manager,
+# getOutputQueue, isClosed) so a loop written against a device runs
+# unchanged against a recording
+class FrameSource(ABC):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @abstractmethod
+    def getOutputQueue(self, name, maxSize=16, blocking=True):
+        pass
+
+    @abstractmethod
+    def isClosed(self):
+        pass
+
+    def close(self):
+        pass
+
+    # current time on the clock message timestamps are expressed in, as a
+    # timedelta, so `clockNow() - msg.getTimestamp()` is the time elapsed
+    # since the device stamped the message
+    @abstractmethod
+    def clockNow(self):
+        pass
+
+
+# device backend: starts the pipeline on the attached OAK and hands out its
+# XLink output queues. Anything else (getConnectedCameras, getUsbSpeed,
+# getDeviceInfo, ...) is forwarded to the underlying dai.Device. depthai is
+# only imported here, so the replay backend (and the benchmarks built on
+# it) run on machines without it
+class DeviceFrameSource(FrameSource):
+    def __init__(self, pipeline, *args, **kwargs):
+        import depthai as dai
+        self.clock = dai.Clock
+        self.device = dai.Device(pipeline, *args, **kwargs)
+
+    def getOutputQueue(self, name, maxSize=16, blocking=True):
+        return self.device.getOutputQueue(
+            name=name, maxSize=maxSize, blocking=blocking,
+        )
+
+    def isClosed(self):
+        return self.device.isClosed()
+
+    def close(self):
+        self.device.close()
+
+    def clockNow(self):
+        return self.clock.now()
+
+    def __getattr__(self, attr):
+        return getattr(self.__dict__['device'], attr)
+
+
+# replayed counterpart of dai.ImgFrame
+class ReplayImgFrame:
+    def __init__(self, frame, timestamp, sequenceNum):
+        self.frame = frame
+        self.timestamp = timestamp
+        self.sequenceNum = sequenceNum
+
+    def getCvFrame(self):
+        # like the device conversion, hand out a fresh array every time so
+        # annotating it never modifies the recording
+        return self.frame.copy()
+
+    def getFrame(self):
+        return self.frame
+
+    # raw pixel buffer and its type, for FrameView (see frame_view.py):
+    # recordings hold getCvFrame output, interleaved BGR or grayscale
+    def getData(self):
+        return self.frame.reshape(-1)
+
+    def getType(self):
+        return SimpleNamespace(
+            name='BGR888i' if self.frame.ndim == 3 else 'GRAY8')
+
+    def getWidth(self):
+        return self.frame.shape[1]
+
+    def getHeight(self):
+        return self.frame.shape[0]
+
+    def getSequenceNum(self):
+        return self.sequenceNum
+
+    def getTimestamp(self):
+        return datetime.timedelta(seconds=self.timestamp)
+
+
+# replayed counterpart of dai.ImgDetections, its `detections` entries have
+# the same label, confidence, xmin, ymin, xmax and ymax attributes
+class ReplayImgDetections:
+    def __init__(self, detections, timestamp, sequenceNum):
+        self.detections = [
+            SimpleNamespace(
+                label=int(row[0]), confidence=float(row[1]),
+                xmin=float(row[2]), ymin=float(row[3]),
+                xmax=float(row[4]), ymax=float(row[5]),
+            ) for row in detections
+        ]
+        self.timestamp = timestamp
+        self.sequenceNum = sequenceNum
+
+    def getSequenceNum(self):
+        return self.sequenceNum
+
+    def getTimestamp(self):
+        return datetime.timedelta(seconds=self.timestamp)
+
+
+# one recorded stream served through the dai.DataOutputQueue interface
+# (get, tryGet, tryGetAll, has). With `realtime` set a message only becomes
+# available once its recorded timestamp has elapsed on the host clock and,
+# for non-blocking queues, messages the host did not pick up in time are
+# overwritten like on the device (counted in `dropped`). Otherwise messages
+# are served back to back at maximum speed, still interleaved across
+# streams in timestamp order: polling (has, tryGet, tryGetAll) never runs
+# a stream ahead of the oldest pending message of the other streams, while
+# get always returns the next message
+class ReplayQueue:
+    def __init__(self, name, recording, source, maxSize, blocking):
+        self.name = name
+        self.recording = recording
+        self.source = source
+        self.maxSize = maxSize
+        self.blocking = blocking
+        self.index = 0
+        self.dropped = 0
+
+    def getName(self):
+        return self.name
+
+    def isExhausted(self):
+        return self.index >= len(self.recording['timestamps'])
+
+    def nextTimestamp(self):
+        return float(self.recording['timestamps'][self.index])
+
+    # number of messages whose timestamp has already been reached
+    def _due(self):
+        timestamps = self.recording['timestamps']
+        if self.source.realtime:
+            now = time.monotonic() - self.source.startTime
+            now += self.source.timeOrigin
+        else:
+            now = self.source.frontier()
+        return int(np.searchsorted(timestamps, now, side='right'))
+
+    def _available(self):
+        due = self._due()
+        if (self.source.realtime and not self.blocking
+                and due - self.index > self.maxSize):
+            self.dropped += due - self.index - self.maxSize
+            self.index = due - self.maxSize
+        return due - self.index
+
+    def _message(self, i):
+        recording = self.recording
+        timestamp = float(recording['timestamps'][i])
+        sequenceNum = int(recording['sequenceNums'][i])
+        if 'frames' in recording:
+            return ReplayImgFrame(recording['frames'][i], timestamp,
+                                  sequenceNum)
+        offsets = recording['offsets']
+        return ReplayImgDetections(
+            recording['detections'][offsets[i]:offsets[i + 1]],
+            timestamp, sequenceNum,
+        )
+
+    # host seconds (on the source clock) until the next message becomes
+    # available, 0 if one is available now and None once exhausted. At
+    # maximum speed a pending message that is not available yet waits for
+    # the other streams, which no amount of sleeping changes (inf)
+    def timeToNext(self):
+        if self._available() > 0:
+            return 0.0
+        if self.isExhausted():
+            return None
+        if not self.source.realtime:
+            return float('inf')
+        nextTime = (self.recording['timestamps'][self.index]
+                    - self.source.timeOrigin)
+        return max(0.0, nextTime - (time.monotonic() - self.source.startTime))
+
+    def has(self):
+        return self._available() > 0
+
+    def tryGet(self):
+        if self._available() == 0:
+            return None
+        self.index += 1
+        return self._message(self.index - 1)
+
+    def tryGetAll(self):
+        available = self._available()
+        messages = [self._message(i) for i in
+                    range(self.index, self.index + available)]
+        self.index += available
+        return messages
+
+    def get(self):
+        while True:
+            if self.isExhausted():
+                raise RuntimeError(f"Replay of stream '{self.name}' ended")
+            if not self.source.realtime:
+                self.index += 1
+                return self._message(self.index - 1)
+            message = self.tryGet()
+            if message is not None:
+                return message
+            time.sleep(self.timeToNext() or 0.0)
+
+
+# replay backend: feeds streams previously saved with save_frames /
+# save_detections from `directory`, either at their original pace
+# (realtime=True) or as fast as the host loop consumes them
+class ReplayFrameSource(FrameSource):
+    def __init__(self, directory, realtime=True):
+        self.directory = directory
+        self.realtime = realtime
+        self.queues = {}
+        self.recordings = {}
+        for fileName in sorted(os.listdir(directory)):
+            stream, ext = os.path.splitext(fileName)
+            path = os.path.join(directory, fileName)
+            if ext == '.npz':
+                with np.load(path) as data:
+                    self.recordings[stream] = dict(data)
+            elif ext == '.dfc':
+                self.recordings[stream] = _container_recording(path)
+
+        # every stream is replayed against the same origin so their
+        # relative timing is preserved
+        self.timeOrigin = min(
+            (float(r['timestamps'][0]) for r in self.recordings.values()
+             if len(r['timestamps'])), default=0.0)
+        self.startTime = time.monotonic()
+
+    # the replay clock starts when the host loop enters the source
+    def __enter__(self):
+        self.startTime = time.monotonic()
+        return self
+
+    def getOutputQueueNames(self):
+        return list(self.recordings)
+
+    # streams missing from the recording (e.g. 'nnNetwork') are served as
+    # streams that never produce a message
+    def getOutputQueue(self, name, maxSize=16, blocking=True):
+        if name not in self.recordings:
+            self.recordings[name] = {
+                'timestamps': np.empty(0), 'sequenceNums': np.empty(0),
+            }
+        if name not in self.queues:
+            self.queues[name] = ReplayQueue(
+                name, self.recordings[name], self, maxSize, blocking)
+        return self.queues[name]
+
+    # counterpart of dai.Device.getQueueEvent: sleep until one of the
+    # named queues has a message and return its name, or return an empty
+    # string once `timeout` (a timedelta or seconds) elapses
+    def getQueueEvent(self, queueNames, timeout=None):
+        if isinstance(timeout, datetime.timedelta):
+            timeout = timeout.total_seconds()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        queues = [self.getOutputQueue(name) for name in queueNames]
+        while True:
+            waits = [(q.timeToNext(), q.name) for q in queues]
+            waits = [w for w in waits if w[0] is not None]
+            if not waits:
+                return ''
+            wait, name = min(waits)
+            if wait == 0.0:
+                return name
+            if wait == float('inf'):
+                return ''
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0.0:
+                    return ''
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    # at maximum speed, timestamp of the oldest message still pending in any
+    # of the opened streams: everything up to it is available
+    def frontier(self):
+        return min((q.nextTimestamp() for q in self.queues.values()
+                    if not q.isExhausted()), default=float('inf'))
+
+    # replay clock: recorded time of the message due now. Only meaningful
+    # in real time, at maximum speed messages are never due in time
+    def clockNow(self):
+        return datetime.timedelta(seconds=self.timeOrigin
+                                  + time.monotonic() - self.startTime)
+
+    def isClosed(self):
+        return bool(self.queues) and all(
+            q.isExhausted() for q in self.queues.values())
+
+    # stand-ins for the device information the demos print on startup
+    def getConnectedCameras(self):
+        return []
+
+    def getUsbSpeed(self):
+        return SimpleNamespace(name='REPLAY')
+
+    def getDeviceInfo(self):
+        return SimpleNamespace(getMxId=lambda: 'replay')
+
+
+# recording backed by a memory-mapped frame container: frames are served
+# straight from the mapping, containers without frames as detections
+def _container_recording(path):
+    container = FrameContainer(path)
+    recording = {
+        'timestamps': np.asarray(container.timestamps),
+        'sequenceNums': np.asarray(container.sequenceNums),
+    }
+    if container.frames is not None:
+        recording['frames'] = container.frames
+    else:
+        recording['detections'] = container.detectionTable
+        recording['offsets'] = container.detectionOffsets()
+    return recording
+
+
+# save a recorded frame stream as `<directory>/<stream>.npz`: all frames
+# share one shape, timestamps are device timestamps in seconds
+def save_frames(directory, stream, frames, timestamps, sequenceNums):
+    os.makedirs(directory, exist_ok=True)
+    np.savez(
+        os.path.join(directory, f'{stream}.npz'),
+        frames=np.stack(frames),
+        timestamps=np.asarray(timestamps, dtype=np.float64),
+        sequenceNums=np.asarray(sequenceNums, dtype=np.int64),
+    )
+
+
+# save a recorded detection stream: `detections` holds, per message, the
+# list of its detections (objects with label, confidence, xmin, ymin, xmax,
+# ymax). They are flattened into one (M, 6) array plus per-message offsets
+def save_detections(directory, stream, detections, timestamps,
+                    sequenceNums):
+    os.makedirs(directory, exist_ok=True)
+    rows = [
+        (d.label, d.confidence, d.xmin, d.ymin, d.xmax, d.ymax)
+        for message in detections for d in message
+    ]
+    counts = [len(message) for message in detections]
+    np.savez(
+        os.path.join(directory, f'{stream}.npz'),
+        detections=np.array(rows, dtype=np.float32).reshape(-1, 6),
+        offsets=np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+        timestamps=np.asarray(timestamps, dtype=np.float64),
+        sequenceNums=np.asarray(sequenceNums, dtype=np.int64),
+    )
+
+
+# grab `count` messages from each of `streams` of a running source and
+# save them as a recording ReplayFrameSource can play back. All streams
+# are drained together so their timestamps stay aligned. Streams whose
+# messages carry `detections` are saved with save_detections, the rest
+# with save_frames (from the converted OpenCV frames)
+def record_streams(source, directory, streams, count):
+    queues = {
+        stream: source.getOutputQueue(name=stream, maxSize=count,
+                                      blocking=False)
+        for stream in streams
+    }
+    messages = {stream: [] for stream in streams}
+    while any(len(m) < count for m in messages.values()):
+        received = False
+        for stream, queue in queues.items():
+            for message in queue.tryGetAll():
+                if len(messages[stream]) < count:
+                    messages[stream].append(message)
+                    received = True
+        if not received:
+            time.sleep(0.001)
+
+    for stream, recorded in messages.items():
+        timestamps = [m.getTimestamp().total_seconds() for m in recorded]
+        sequenceNums = [m.getSequenceNum() for m in recorded]
+        if hasattr(recorded[0], 'detections'):
+            save_detections(directory, stream,
+                            [m.detections for m in recorded],
+                            timestamps, sequenceNums)
+        else:
+            save_frames(directory, stream,
+                        [m.getCvFrame() for m in recorded],
+                        timestamps, sequenceNums)
@@ -0,0 +1,83 @@
+# import the necessary packages
+import cv2
+
+# dai.ImgFrame types by layout: planar frames hold three full-size
+# channel planes one after the other (what the ColorCamera sends with
+# CAMERA_INTERLEAVED = False), interleaved frames hold HWC pixels
+PLANAR_TYPES = {'RGB888p': 'RGB', 'BGR888p': 'BGR'}
+INTERLEAVED_TYPES = {'RGB888i': 'RGB', 'BGR888i': 'BGR'}
+GRAY_TYPES = {'GRAY8', 'RAW8'}
+
+
+# zero-copy access to the pixels of an image message. getCvFrame converts
+# every planar frame to interleaved BGR (a full copy plus a channel swap)
+# even when the consumer would rather have the planes: recording,
+# analytics or feeding a network all work on CHW data. A FrameView wraps
+# the message's own buffer instead:
+#
+#   view.planar   channel planes (3, H, W) in the order of `channelOrder`,
+#                 or (H, W) for grayscale; a view, never a copy
+#   view.rgb      the (3, H, W) planes in RGB order, still a view
+#   view.bgr()    interleaved BGR (H, W, 3) frame as getCvFrame returns it,
+#                 converted on first use and then cached, so drawing on it
+#                 and displaying it share one copy
+#
+# Interleaved frames (CAMERA_INTERLEAVED = True, or replayed recordings,
+# which hold getCvFrame output) get the same interface, their planes
+# being strided views of the HWC pixels. The views alias the message
+# buffer: they are only valid while the message is, and must not be
+# written to
+class FrameView:
+    def __init__(self, message):
+        self.message = message
+        self._bgr = None
+        self._hwc = None
+        width, height = message.getWidth(), message.getHeight()
+        typeName = message.getType().name
+        data = message.getData()
+        if typeName in PLANAR_TYPES:
+            self.channelOrder = PLANAR_TYPES[typeName]
+            self.planar = data.reshape(3, height, width)
+        elif typeName in INTERLEAVED_TYPES:
+            self.channelOrder = INTERLEAVED_TYPES[typeName]
+            self._hwc = data.reshape(height, width, 3)
+            self.planar = self._hwc.transpose(2, 0, 1)
+        elif typeName in GRAY_TYPES:
+            self.channelOrder = 'GRAY'
+            self.planar = data.reshape(height, width)
+        else:
+            raise ValueError(f'no zero-copy view of {typeName} frames')
+
+    @property
+    def shape(self):
+        return self.planar.shape
+
+    @property
+    def rgb(self):
+        if self.channelOrder == 'BGR':
+            return self.planar[::-1]
+        return self.planar
+
+    # interleaved BGR copy, made once. cv2.merge of the planes in BGR order
+    # does the planar to interleaved copy and the channel swap in one pass,
+    # several times faster than a NumPy transpose copy
+    def bgr(self):
+        if self._bgr is None:
+            if self.channelOrder == 'GRAY':
+                self._bgr = self.planar.copy()
+            elif self._hwc is not None:
+                self._bgr = (self._hwc.copy() if self.channelOrder == 'BGR'
+                             else cv2.cvtColor(self._hwc, cv2.COLOR_RGB2BGR))
+            else:
+                self._bgr = cv2.merge(list(self.planar[::-1]
+                                           if self.channelOrder == 'RGB'
+                                           else self.planar))
+        return self._bgr
+
+    # same interface as the message, so a view can stand in for it (e.g.
+    # in the sync buffers or a recorder)
+    def getCvFrame(self):
+        return self.bgr()
+
+    def __getattr__(self, attr):
+        return getattr(self.__dict__['message'], attr)
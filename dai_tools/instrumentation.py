@@ -0,0 +1,129 @@
+# import the necessary packages
+from contextlib import contextmanager
+import bisect
+import signal
+import json
+import math
+import time
+
+
+# fixed-size latency histogram: `bucketCount` log-spaced buckets between
+# `low` and `high` seconds (plus an overflow bucket). Recording a value is
+# a bisect and an increment, so the memory used never grows with the
+# number of samples
+class LatencyHistogram:
+    def __init__(self, low=1e-5, high=10.0, bucketCount=48):
+        ratio = (high / low) ** (1.0 / (bucketCount - 1))
+        self.bounds = [low * ratio ** i for i in range(bucketCount)]
+        self.counts = [0] * (bucketCount + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    # upper bound of the bucket holding the q-th quantile (0..1), capped
+    # by the largest recorded value
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                if i < len(self.bounds):
+                    return min(self.bounds[i], self.max)
+                return self.max
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'p50': self.quantile(0.50),
+            'p90': self.quantile(0.90),
+            'p99': self.quantile(0.99),
+        }
+
+
+# per-stage latency recorder for the host loops. Each named stage (e.g.
+# `deviceToHost`, `dequeue`, `getCvFrame`, `annotate`, `display`) gets a
+# LatencyHistogram, and the whole set can be exported as JSON or as
+# Prometheus text exposition format at shutdown or on demand
+class Instrumentation:
+    def __init__(self, prefix='dai_host'):
+        self.prefix = prefix
+        self.stages = {}
+
+    def record(self, stage, seconds):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = LatencyHistogram()
+        histogram.record(seconds)
+
+    # time the body of a `with` block as one sample of `stage`
+    @contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    # record the device-to-host latency of a message: time elapsed on the
+    # source clock since the message got its device timestamp
+    def recordMessage(self, stage, message, now):
+        self.record(
+            stage, (now - message.getTimestamp()).total_seconds())
+
+    def to_json(self):
+        return json.dumps(
+            {stage: h.summary() for stage, h in self.stages.items()},
+            indent=2,
+        )
+
+    def to_prometheus(self):
+        name = f'{self.prefix}_stage_latency_seconds'
+        lines = [
+            f'# HELP {name} Host loop per-stage latency in seconds.',
+            f'# TYPE {name} histogram',
+        ]
+        for stage, h in self.stages.items():
+            cumulative = 0
+            for bound, count in zip(h.bounds, h.counts):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{{stage="{stage}",le="{bound:.6g}"}} '
+                    f'{cumulative}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} '
+                         f'{h.count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {h.total:.9g}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+        return '\n'.join(lines) + '\n'
+
+    # write the metrics to `path`: Prometheus text for .prom/.txt files,
+    # JSON otherwise
+    def dump(self, path):
+        if path.endswith(('.prom', '.txt')):
+            text = self.to_prometheus()
+        else:
+            text = self.to_json()
+        with open(path, 'w') as f:
+            f.write(text)
+
+    # dump the metrics to `path` whenever the process receives SIGUSR1
+    # (e.g. `kill -USR1 <pid>`), where the platform supports it
+    def dumpOnSignal(self, path):
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda *args: self.dump(path))
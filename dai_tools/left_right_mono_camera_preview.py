@@ -1,77 +1,149 @@
 # import the necessary packages
 from dai_tools import config
-import depthai as dai
+from dai_tools.frame_source import DeviceFrameSource
+from dai_tools.queue_consumer import QueueConsumer
+from dai_tools.run_control import StopCondition
+from dai_tools.fps import StreamMeters
+from dai_tools.recorder import create_recorders
+from dai_tools.shm_ring import create_ring_sinks
+from dai_tools.sync import MessageSynchronizer
+from dai_tools.stereo_depth import StereoDepth, colorizeDisparity
+from dai_tools.calibration_cache import RectificationMapCache
+from dai_tools.pipeline_builder import build_pipeline, graph_path
 import cv2
 
 def create_mono_camera_pipeline():
-    # create pipeline
-    pipeline = dai.Pipeline()
+    # left and right 720p mono cameras sent to the host as the left and
+    # right streams, as described in pipelines/mono_cameras.json
+    pipeline, _ = build_pipeline(graph_path('mono_cameras'))
+    return pipeline
 
-    # define sources and outputs: creating left and right camera nodes
-    monoLeft = pipeline.create(dai.node.MonoCamera)
-    monoRight = pipeline.create(dai.node.MonoCamera)
 
-    # XLinkOut nodes for displaying frames from left and right camera
-    xoutLeft = pipeline.create(dai.node.XLinkOut)
-    xoutRight = pipeline.create(dai.node.XLinkOut)
+def mono_cameras_preview(pipeline, source=None, headless=False,
+                         duration=None, maxFrames=None, recordDir=None,
+                         recordFormat='raw', shareName=None, depth=False,
+                         depthWorkers=config.STEREO_WORKERS,
+                         queueOptions=None, server=None, shareLayout='bgr'):
+    # connect to device and start pipeline, unless another frame source
+    # (e.g. a ReplayFrameSource) is given. In headless mode nothing is
+    # displayed and the loop runs until `duration` seconds or `maxFrames`
+    # frames have passed, or Ctrl+C is pressed. With `recordDir` set, the
+    # left and right streams are also archived there ('raw' frames or
+    # 'video'), and with `shareName` published into the shared-memory rings
+    # `<shareName>_left` and `<shareName>_right` (with `shareLayout`
+    # 'planar', straight from the message buffers). With `depth`, left and
+    # right frames with the same sequence number are also matched on the
+    # host into a disparity map, split in stripes over `depthWorkers`
+    # threads. `queueOptions` overrides the queue settings of config.py per
+    # stream. With a `server` (see mjpeg_server.py) the frames are also
+    # streamed as MJPEG
+    if source is None:
+        source = DeviceFrameSource(pipeline)
 
-    # set XLinkOut stream name as left and right for later using in
-    # OutputQueue
-    xoutLeft.setStreamName('left')
-    xoutRight.setStreamName('right')
+    with source as device:
+        stop = StopCondition(headless, duration, maxFrames)
 
-    # set mono camera properties like which camera socket to use,
-    # camera resolution
-    monoLeft.setBoardSocket(dai.CameraBoardSocket.LEFT)
-    monoLeft.setResolution(
-        dai.MonoCameraProperties.SensorResolution.THE_720_P)
-    monoRight.setBoardSocket(dai.CameraBoardSocket.RIGHT)
-    monoRight.setResolution(
-        dai.MonoCameraProperties.SensorResolution.THE_720_P,
-    )
+        # sliding-window FPS of the left and right streams
+        meters = StreamMeters(('left', 'right', 'disparity'))
 
-    # link the left and right camera output to XLinkOut node input
-    monoRight.out.link(xoutRight.input)
-    monoLeft.out.link(xoutLeft.input)
+        # background recorders the frames are handed off to
+        recorders = {}
+        if recordDir is not None:
+            recorders = create_recorders(
+                recordDir, ('left', 'right'), recordFormat)
+        sharers = {}
+        if shareName is not None:
+            sharers = create_ring_sinks(shareName, ('left', 'right'),
+                                        layout=shareLayout)
 
-    # return pipeline to the calling function
-    return pipeline
+        # host stereo stage, created from the first pair since the frame
+        # size is needed to read the calibration. Its rectification tables
+        # are cached on disk per device, socket and resolution
+        synchronizer = MessageSynchronizer(('left', 'right'))
+        stereo = None
+
+        def computeDepth(stream, message):
+            nonlocal stereo
+            synced = synchronizer.add(stream, message)
+            if synced is None:
+                return
+            left = synced['left'].getFrame()
+            right = synced['right'].getFrame()
+            if stereo is None:
+                stereo = StereoDepth.from_device(
+                    device, (left.shape[1], left.shape[0]),
+                    cache=RectificationMapCache(), workers=depthWorkers)
+            disparity = stereo.disparity(left, right)
+            meters.tickMessage('disparity', synced['left'])
+            if not headless or server is not None:
+                colored = colorizeDisparity(disparity)
+                if server is not None:
+                    server.publish('disparity', colored)
+                if not headless:
+                    cv2.imshow('disparity', colored)
 
+        # convert the left/right camera frame data to OpenCV format and
+        # display grayscale (opencv format) frames
+        def show(stream, message):
+            if headless and server is None:
+                return
+            frame = message.getCvFrame()
+            if server is not None:
+                server.publish(stream, frame)
+            if not headless:
+                cv2.imshow(stream, frame)
 
-def mono_cameras_preview(pipeline):
-    # connect to device and start pipeline
-    with dai.Device(pipeline) as device:
-        # output queues will be used to get the grayscale
-        # frames from the outputs defined above
-        qLeft = device.getOutputQueue(
-            name='left',
-            maxSize=config.COLOR_CAMERA_QUEUE_SIZE,
-            blocking=config.QUEUE_BLOCKING,
-        )
-        qRight = device.getOutputQueue(
-            name='right',
-            maxSize=config.COLOR_CAMERA_QUEUE_SIZE,
-            blocking=config.QUEUE_BLOCKING,
-        )
+        def showLeft(inLeft):
+            meters.tickMessage('left', inLeft)
+            stop.tick()
+            if recorders:
+                recorders['left'].submit(inLeft)
+            if sharers:
+                sharers['left'].submit(inLeft)
+            if depth:
+                computeDepth('left', inLeft)
+            show('left', inLeft)
 
-        while True:
-            # instead of get (blocking), we use tryGet (non-blocking)
-            # which will return the available data or None otherwise
-            inLeft = qLeft.tryGet()
-            inRight = qRight.tryGet()
+        def showRight(inRight):
+            meters.tickMessage('right', inRight)
+            stop.tick()
+            if recorders:
+                recorders['right'].submit(inRight)
+            if sharers:
+                sharers['right'].submit(inRight)
+            if depth:
+                computeDepth('right', inRight)
+            show('right', inRight)
 
-            # check if data is available from left camera node
-            if inLeft is not None:
-                # convert the left camera frame data to OpenCV format and
-                # display grayscale (opencv format) frame
-                cv2.imshow('left', inLeft.getCvFrame())
+        # instead of polling both queues with tryGet, the consumer blocks
+        # until one of the left or right output queues has data and calls
+        # the matching handler
+        consumer = QueueConsumer(device, {
+            'left': showLeft,
+            'right': showRight,
+        }, queueOptions=queueOptions)
 
-            # check if data is available from right camera node
-            if inRight is not None:
-                # convert the right camera frame data to OpenCV format and
-                # display grayscale (opencv format) frame
-                cv2.imshow('right', inRight.getCvFrame())
+        # break out from the loop if `q` key is pressed or the run limits
+        # are reached. The recordings are flushed to disk and the rings
+        # released also when the loop failed
+        try:
+            with stop:
+                consumer.run(stop=stop)
+        finally:
+            if stereo is not None:
+                stereo.close()
+            for recorder in recorders.values():
+                recorder.close()
+            for sharer in sharers.values():
+                sharer.close()
 
-            # break out from the while loop if `q` key is pressed
-            if cv2.waitKey(1) == ord('q'):
-                break
\ No newline at end of file
+        print('Processed: ', stop.summary())
+        print('FPS: ', meters.report())
+        if any(drain == 'latest' for drain in consumer.drain.values()):
+            print('Skipped: ', consumer.skipped)
+        if stereo is not None:
+            print('Stereo pairs: ', synchronizer.stats())
+        for stream, recorder in recorders.items():
+            print(f'Recorded {stream}: ', recorder.stats())
+        for stream, sharer in sharers.items():
+            print(f'Shared {stream}: ', sharer.stats())
@@ -0,0 +1,321 @@
+# import the necessary packages
+from dai_tools import config
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+import threading
+import asyncio
+import html
+import cv2
+
+# HTTP server streaming the frames of the demos as MJPEG, so the cameras
+# can be watched from a browser instead of a local cv2.imshow window:
+#
+#   /                      index page showing every stream
+#   /<stream>.mjpg         multipart/x-mixed-replace stream
+#   /<stream>.jpg          current frame
+#
+# `?quality=N` selects the JPEG quality (default MJPEG_QUALITY). The host
+# loop calls publish(), which only stores a reference to the frame: the
+# asyncio loop runs on its own thread and JPEG encoding on an executor
+# thread, so viewers never slow capture down. Each frame is encoded once
+# per quality level that has viewers and the same bytes are fanned out to
+# all of them. When frames are published faster than they are encoded,
+# only the newest is encoded. Every viewer has a small queue of pending
+# frames: a viewer that falls behind loses its oldest pending frame (the
+# drop is counted), and one whose socket accepts nothing for
+# MJPEG_WRITE_TIMEOUT seconds is disconnected
+BOUNDARY = b'frame'
+STREAM_HEADER = (b'HTTP/1.0 200 OK\r\n'
+                 b'Content-Type: multipart/x-mixed-replace; boundary=' +
+                 BOUNDARY + b'\r\n'
+                 b'Cache-Control: no-cache\r\n'
+                 b'Connection: close\r\n\r\n')
+
+
+def _response(status, contentType, body):
+    return (f'HTTP/1.0 {status}\r\nContent-Type: {contentType}\r\n'
+            f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'
+            ).encode() + body
+
+
+# multipart chunk carrying one JPEG of the stream
+def _part(jpeg):
+    return (b'--' + BOUNDARY + b'\r\nContent-Type: image/jpeg\r\n'
+            b'Content-Length: ' + str(len(jpeg)).encode() + b'\r\n\r\n' +
+            jpeg + b'\r\n')
+
+
+# JPEG bytes of `frame`, or None if it cannot be encoded (e.g. an empty
+# or malformed frame was published)
+def _encode(frame, quality):
+    try:
+        ok, jpeg = cv2.imencode('.jpg', frame,
+                                [cv2.IMWRITE_JPEG_QUALITY, quality])
+    except cv2.error:
+        return None
+    return jpeg.tobytes() if ok else None
+
+
+# one connected /<stream>.mjpg viewer and its pending parts
+class MjpegClient:
+    def __init__(self, writer, stream, quality, queueSize):
+        self.writer = writer
+        self.stream = stream
+        self.quality = quality
+        self.parts = asyncio.Queue(maxsize=queueSize)
+        self.sent = 0
+        self.dropped = 0
+
+    # queue `part`, dropping the oldest pending one if the viewer is
+    # behind
+    def push(self, part):
+        if self.parts.full():
+            self.parts.get_nowait()
+            self.dropped += 1
+        self.parts.put_nowait(part)
+
+    # end the stream: wake the handler with None, and abort the connection
+    # in case it is blocked writing to a viewer that stopped reading
+    def close(self):
+        while not self.parts.empty():
+            self.parts.get_nowait()
+        self.parts.put_nowait(None)
+        self.writer.transport.abort()
+
+
+class MjpegServer:
+    def __init__(self, host=config.MJPEG_HOST, port=config.MJPEG_PORT,
+                 quality=config.MJPEG_QUALITY, streams=None,
+                 clientQueueSize=config.MJPEG_CLIENT_QUEUE_SIZE,
+                 writeTimeout=config.MJPEG_WRITE_TIMEOUT):
+        # `streams` restricts the stream names served, any published
+        # stream is served when it is None
+        self.host = host
+        self.port = port
+        self.quality = quality
+        self.streams = None if streams is None else set(streams)
+        self.clientQueueSize = clientQueueSize
+        self.writeTimeout = writeTimeout
+
+        # newest frame per stream, handed over from the host loop thread
+        self.lock = threading.Lock()
+        self.latest = {}
+        self.published = {}
+
+        # asyncio side, only touched on the server thread
+        self.loop = None
+        self.server = None
+        self.ready = threading.Event()
+        self.thread = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.wakeups = {}
+        self.encoders = {}
+        self.clients = set()
+
+        # counters for stats()
+        self.encoded = {}
+        self.encodes = 0
+        self.dropped = 0
+        self.disconnected = 0
+        self.served = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # start serving on a background thread; returns once the port is bound
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='mjpeg-server',
+                                       daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.server is None:
+            raise RuntimeError(f'could not serve on {self.host}:{self.port}')
+        # the bound port, when 0 was asked for
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.server = self.loop.run_until_complete(asyncio.start_server(
+                self._handle, self.host, self.port))
+        except OSError:
+            self.ready.set()
+            return
+        self.ready.set()
+        self.loop.run_forever()
+
+        # let the connection handlers return on their own (cancelling them
+        # is reported as an error by asyncio's stream protocol) and stop the
+        # encoders
+        self.server.close()
+        for client in list(self.clients):
+            client.close()
+        for task in self.encoders.values():
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(
+            *asyncio.all_tasks(self.loop), return_exceptions=True))
+        self.loop.close()
+
+    def close(self):
+        if self.thread is None:
+            return
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.thread = None
+        self.executor.shutdown()
+
+    # called from the host loop: make `frame` the newest frame of
+    # `stream`. The frame is encoded later, on another thread, so it must
+    # not be modified after it is published
+    def publish(self, stream, frame):
+        with self.lock:
+            self.latest[stream] = frame
+            self.published[stream] = self.published.get(stream, 0) + 1
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self._wake, stream)
+
+    def _wake(self, stream):
+        self._wakeup(stream).set()
+        if stream not in self.encoders:
+            self.encoders[stream] = self.loop.create_task(
+                self._encode_stream(stream))
+
+    def _wakeup(self, stream):
+        if stream not in self.wakeups:
+            self.wakeups[stream] = asyncio.Event()
+        return self.wakeups[stream]
+
+    # encoder task of one stream: encode the newest frame once per quality
+    # level its viewers asked for and fan the bytes out
+    async def _encode_stream(self, stream):
+        wakeup = self._wakeup(stream)
+        while True:
+            await wakeup.wait()
+            wakeup.clear()
+            viewers = [c for c in self.clients if c.stream == stream]
+            if not viewers:
+                continue
+            with self.lock:
+                frame = self.latest[stream]
+            self.encoded[stream] = self.encoded.get(stream, 0) + 1
+            for quality in {c.quality for c in viewers}:
+                jpeg = await self.loop.run_in_executor(
+                    self.executor, _encode, frame, quality)
+                self.encodes += 1
+                if jpeg is None:
+                    continue
+                part = _part(jpeg)
+                for client in viewers:
+                    if client.quality == quality:
+                        client.push(part)
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            # skip the request headers
+            while (await reader.readline()).strip():
+                pass
+            method, target, _ = request.decode('latin-1').split(' ', 2)
+        except (ValueError, ConnectionError):
+            writer.close()
+            return
+
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        try:
+            quality = min(100, max(1, int(query['quality'][0])))
+        except (KeyError, ValueError):
+            quality = self.quality
+        name, _, extension = url.path.lstrip('/').rpartition('.')
+
+        try:
+            if method != 'GET':
+                writer.write(_response('405 Method Not Allowed',
+                                       'text/plain', b'GET only\n'))
+            elif url.path == '/':
+                writer.write(_response('200 OK', 'text/html',
+                                       self._index().encode()))
+            elif not self._serves(name) or extension not in ('mjpg', 'jpg'):
+                writer.write(_response('404 Not Found', 'text/plain',
+                                       b'no such stream\n'))
+            elif extension == 'jpg':
+                await self._snapshot(writer, name, quality)
+            else:
+                await self._stream(writer, name, quality)
+            await writer.drain()
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
+
+    def _serves(self, stream):
+        if self.streams is not None:
+            return stream in self.streams
+        with self.lock:
+            return stream in self.latest
+
+    def _index(self):
+        with self.lock:
+            streams = sorted(self.streams or self.latest)
+        images = ''.join(
+            f'<h3>{html.escape(s)}</h3><img src="/{html.escape(s)}.mjpg">'
+            for s in streams)
+        return f'<html><body>{images}</body></html>'
+
+    async def _snapshot(self, writer, stream, quality):
+        with self.lock:
+            frame = self.latest.get(stream)
+        if frame is None:
+            writer.write(_response('503 Service Unavailable', 'text/plain',
+                                   b'no frame yet\n'))
+            return
+        jpeg = await self.loop.run_in_executor(
+            self.executor, _encode, frame, quality)
+        self.encodes += 1
+        if jpeg is None:
+            writer.write(_response('500 Internal Server Error', 'text/plain',
+                                   b'frame could not be encoded\n'))
+            return
+        writer.write(_response('200 OK', 'image/jpeg', jpeg))
+
+    async def _stream(self, writer, stream, quality):
+        client = MjpegClient(writer, stream, quality, self.clientQueueSize)
+        self.clients.add(client)
+        self.served += 1
+        try:
+            writer.write(STREAM_HEADER)
+            while True:
+                part = await client.parts.get()
+                if part is None:
+                    break
+                writer.write(part)
+                # a viewer that accepts nothing for a while is dropped, its
+                # frames would only pile up in the socket buffer
+                try:
+                    await asyncio.wait_for(writer.drain(), self.writeTimeout)
+                except asyncio.TimeoutError:
+                    self.disconnected += 1
+                    raise
+                client.sent += 1
+        finally:
+            self.clients.discard(client)
+            self.dropped += client.dropped
+
+    def stats(self):
+        with self.lock:
+            published = dict(self.published)
+        return {
+            'published': published,
+            'encoded': dict(self.encoded),
+            'encodes': self.encodes,
+            'viewers': len(self.clients),
+            'served': self.served,
+            'dropped': self.dropped + sum(c.dropped for c in self.clients),
+            'disconnected': self.disconnected,
+        }
@@ -0,0 +1,200 @@
+# import the necessary packages
+from dai_tools import config
+from dai_tools.frame_source import DeviceFrameSource
+from dai_tools.queue_consumer import queue_settings, drain_queue
+from dai_tools.run_control import StopCondition
+from dai_tools.instrumentation import LatencyHistogram
+from dai_tools.fps import StreamMeters
+import threading
+import datetime
+import queue
+import time
+import cv2
+
+
+# drains the output queues of one device on its own thread and forwards
+# every message, tagged with the device MxID and the stream name, into the
+# shared fan-in queue. The worker never blocks on the shared queue: when
+# it is full the message is dropped and counted, so one slow host loop
+# iteration cannot back up the XLink queues of every camera
+class DeviceWorker(threading.Thread):
+    def __init__(self, mxId, openSource, streams, output, queueOptions=None,
+                 timeout=0.1, stopEvent=None):
+        super().__init__(name=f'device-{mxId}', daemon=True)
+        # `openSource` is called on the worker thread and returns the
+        # FrameSource of the device, so several devices boot in parallel.
+        # `queueOptions` overrides the queue settings of config.py per
+        # stream, like for QueueConsumer. Workers sharing a `stopEvent`
+        # stop together: a worker that fails sets it
+        self.mxId = mxId
+        self.openSource = openSource
+        self.streams = tuple(streams)
+        self.output = output
+        self.queueOptions = queueOptions or {}
+        self.timeout = datetime.timedelta(seconds=timeout)
+        self.stopEvent = stopEvent or threading.Event()
+        self.error = None
+
+        # per-device metrics: received FPS per stream, messages dropped
+        # because the shared queue was full or skipped by the 'latest'
+        # drain policy, and the time messages wait in the shared queue
+        # before the host loop picks them up
+        self.meters = StreamMeters(self.streams)
+        self.dropped = {stream: 0 for stream in self.streams}
+        self.skipped = {stream: 0 for stream in self.streams}
+        self.waits = LatencyHistogram()
+
+    def run(self):
+        try:
+            with self.openSource() as device:
+                queues, drains = {}, {}
+                for name in self.streams:
+                    settings, drains[name] = queue_settings(
+                        self.queueOptions.get(name))
+                    queues[name] = device.getOutputQueue(name=name,
+                                                         **settings)
+                names = list(self.streams)
+                while not (self.stopEvent.is_set() or device.isClosed()):
+                    name = device.getQueueEvent(names, self.timeout)
+                    if not name:
+                        continue
+                    messages, skipped = drain_queue(queues[name],
+                                                    drains[name])
+                    self.skipped[name] += skipped
+                    for message in messages:
+                        self.meters.tickMessage(name, message)
+                        try:
+                            self.output.put_nowait(
+                                (self.mxId, name, message, time.monotonic()))
+                        except queue.Full:
+                            self.dropped[name] += 1
+        except Exception as error:
+            self.error = error
+            self.stopEvent.set()
+
+    def stop(self):
+        self.stopEvent.set()
+
+    def stats(self):
+        waits = self.waits.summary()
+        return {
+            'fps': self.meters.report(),
+            'dropped': dict(self.dropped),
+            'skipped': dict(self.skipped),
+            'fanInWaitMs': {key: waits[key] * 1e3
+                            for key in ('mean', 'p99', 'max')},
+            'error': repr(self.error) if self.error is not None else None,
+        }
+
+
+# runs the same pipeline on several OAK devices and merges their output
+# queues into one host loop. By default every device found by
+# dai.Device.getAllAvailableDevices() gets its own pipeline (built by
+# `createPipeline`) and worker thread; `sources` can instead map device
+# names to FrameSources (e.g. ReplayFrameSources simulating cameras).
+# Messages reach the host loop through one bounded queue holding
+# `maxSize` messages per device
+class MultiDeviceManager:
+    def __init__(self, createPipeline, streams, sources=None,
+                 maxSize=config.MULTI_DEVICE_QUEUE_SIZE,
+                 queueOptions=None):
+        self.streams = tuple(streams)
+        if sources is None:
+            import depthai as dai
+            openers = {
+                info.getMxId(): self._device_opener(createPipeline, info)
+                for info in dai.Device.getAllAvailableDevices()
+            }
+        else:
+            openers = {
+                name: (lambda source=source: source)
+                for name, source in sources.items()
+            }
+        if not openers:
+            raise RuntimeError('no OAK device found')
+
+        # set by stop/close, or by the first worker that fails so the
+        # others wind down and run() raises its error right away
+        self.stopEvent = threading.Event()
+        self.output = queue.Queue(maxsize=maxSize * len(openers))
+        self.workers = {
+            mxId: DeviceWorker(mxId, opener, self.streams, self.output,
+                               queueOptions, stopEvent=self.stopEvent)
+            for mxId, opener in openers.items()
+        }
+
+    @staticmethod
+    def _device_opener(createPipeline, info):
+        return lambda: DeviceFrameSource(createPipeline(), info)
+
+    def __enter__(self):
+        for worker in self.workers.values():
+            worker.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for worker in self.workers.values():
+            worker.stop()
+        for worker in self.workers.values():
+            worker.join()
+
+    def isClosed(self):
+        return (self.output.empty()
+                and not any(w.is_alive() for w in self.workers.values()))
+
+    # next (mxId, stream, message) from any device, or None if nothing
+    # arrives within `timeout` seconds
+    def get(self, timeout=0.1):
+        try:
+            mxId, stream, message, queued = self.output.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.workers[mxId].waits.record(time.monotonic() - queued)
+        return mxId, stream, message
+
+    # call `handler(mxId, stream, message)` for every message until
+    # `stop()` returns True or every device is closed. A worker that
+    # fails (e.g. a device that could not boot) stops the others and its
+    # error is raised here as soon as it happens
+    def run(self, handler, stop=lambda: False):
+        while not (self.isClosed() or self.stopEvent.is_set()):
+            item = self.get()
+            if item is not None:
+                handler(*item)
+            if stop():
+                break
+        for worker in self.workers.values():
+            if worker.error is not None:
+                raise worker.error
+
+    def stats(self):
+        return {mxId: w.stats() for mxId, w in self.workers.items()}
+
+
+def multi_device_preview(createPipeline, streams, sources=None,
+                         headless=False, duration=None, maxFrames=None,
+                         queueOptions=None):
+    # run the pipeline built by `createPipeline` (e.g.
+    # create_color_camera_pipeline) on every attached device, or on the
+    # given `sources`, and show each stream of each device in its own
+    # window named '<MxID> <stream>'. In headless mode nothing is displayed
+    # and the loop runs until `duration` seconds or `maxFrames` frames have
+    # passed, or Ctrl+C is pressed
+    manager = MultiDeviceManager(createPipeline, streams, sources,
+                                 queueOptions=queueOptions)
+    print('Devices: ', list(manager.workers))
+
+    def show(mxId, stream, message):
+        stop.tick()
+        if not headless:
+            cv2.imshow(f'{mxId} {stream}', message.getCvFrame())
+
+    with manager, StopCondition(headless, duration, maxFrames) as stop:
+        manager.run(show, stop=stop)
+
+    print('Processed: ', stop.summary())
+    for mxId, stats in manager.stats().items():
+        print(f'{mxId}: ', stats)
@@ -1,138 +1,280 @@
 # import the necessary packages
 from dai_tools import config
+from dai_tools.frame_source import DeviceFrameSource, ReplayFrameSource
+from dai_tools.queue_consumer import QueueConsumer
+from dai_tools.sync import MessageSynchronizer
+from dai_tools.run_control import StopCondition
 from dai_tools.utils import print_neural_network_layer_names
-from dai_tools.utils import displayFrame
-import depthai as dai
-import time
+from dai_tools.utils import annotateFrame, annotateTrackIds
+from dai_tools.instrumentation import Instrumentation
+from dai_tools.fps import StreamMeters
+from dai_tools.ssd_decoder import class_threshold_array, decode_nn_data
+from dai_tools.ssd_decoder import DecodedDetections, detections_to_array
+from dai_tools.offload import ProcessOffload
+from dai_tools.frame_view import FrameView
+from dai_tools.postprocess import filter_message
+from dai_tools.tracker import SortTracker, track_message
+from dai_tools.pipeline_builder import build_pipeline, graph_path, load_graph
+import copy
 import cv2
 
-def create_detection_pipeline():
-    # create pipeline
-    pipeline = dai.Pipeline()
+# copy of an object detection `graph` (see pipeline_builder.py) decoding
+# on the host: every MobileNetDetectionNetwork becomes a generic
+# NeuralNetwork node, without its confidenceThreshold, whose raw SSD
+# output tensor is decoded and thresholded on the host (see
+# ssd_decoder.py). The raw output already carries the metadata, so the
+# streams of the network's outNetwork output are dropped
+def host_decoding_graph(graph):
+    graph = copy.deepcopy(graph)
+    for name, node in graph.get('nodes', {}).items():
+        if node.get('type') != 'MobileNetDetectionNetwork':
+            continue
+        node['type'] = 'NeuralNetwork'
+        node.get('properties', {}).pop('confidenceThreshold', None)
+        graph['streams'] = {
+            stream: spec for stream, spec in graph.get('streams', {}).items()
+            if spec.get('from') != f'{name}.outNetwork'
+        }
+    return graph
 
-    # define camera node
-    camRgb = pipeline.create(dai.node.ColorCamera)
 
-    # define the MobileNetDetectionNetwork node
-    nn = pipeline.create(dai.node.MobileNetDetectionNetwork)
+def create_detection_pipeline(hostDecoding=False):
+    # camera preview and MobileNet detections sent to the host as the rgb,
+    # nn and nnNetwork streams, as described in
+    # pipelines/object_detection.json. With `hostDecoding` nn carries the
+    # raw SSD output tensor instead and there is no nnNetwork stream (see
+    # host_decoding_graph)
+    graph = load_graph(graph_path('object_detection'))
+    if hostDecoding:
+        graph = host_decoding_graph(graph)
+    pipeline, _ = build_pipeline(graph)
+    return pipeline
 
-    # define three XLinkOut nodes for RGB frames, Neural network detections
-    # and Neural network metadata for sending to host
-    xoutRgb = pipeline.create(dai.node.XLinkOut)
-    nnOut = pipeline.create(dai.node.XLinkOut)
-    nnNetworkOut = pipeline.create(dai.node.XLinkOut)
 
-    # set the XLinkOut node names
-    xoutRgb.setStreamName('rgb')
-    nnOut.setStreamName('nn')
-    nnNetworkOut.setStreamName('nnNetwork')
+# annotation done in an offload worker process, on the shared-memory copy
+# of the frame: FPS text, the (N, 7) detections and, when tracking, the
+# (K, 7) tracks with their IDs
+def annotate_offloaded(frame, detections, tracks, nnFps):
+    cv2.putText(
+        frame, 'NN fps: {:.2f}'.format(nnFps), (2, frame.shape[0] - 4),
+        cv2.FONT_HERSHEY_TRIPLEX, 0.4, config.TEXT_COLOR2,
+    )
+    annotateFrame(frame, DecodedDetections(None, detections).detections)
+    if tracks is not None:
+        annotateTrackIds(frame, tracks)
 
-    # set camera properties like the preview window, interleaved and
-    # camera FPS
-    camRgb.setPreviewSize(config.COLOR_CAMERA_PREVIEW_SIZE)
-    camRgb.setInterleaved(config.CAMERA_INTERLEAVED)
-    camRgb.setFps(config.CAMERA_FPS)
 
-    # define neural network hyperparameters like confidence threshold,
-    # number of inference threads. The NN will make predictions
-    # based on the source frames
-    nn.setConfidenceThreshold(config.NN_THRESHOLD)
-    nn.setNumInferenceThreads(config.INFERENCE_THREADS)
+def object_detection_mobilenet(pipeline, source=None, headless=False,
+                               duration=None, maxFrames=None,
+                               metricsPath=None, hostDecoding=False,
+                               hostNMS=False, track=False,
+                               queueOptions=None, offload=False,
+                               server=None, annotate=False):
+    # connect to device and start pipeline, unless another frame source
+    # (e.g. a ReplayFrameSource) is given. In headless mode no frame is
+    # converted, annotated or displayed and the loop runs until `duration`
+    # seconds or `maxFrames` frames have passed, or Ctrl+C is pressed.
+    # Per-stage latency histograms are written to `metricsPath` (JSON, or
+    # Prometheus text for .prom/.txt) at shutdown and on SIGUSR1. With
+    # `hostDecoding` the 'nn' stream carries the raw NNData of a pipeline
+    # built with create_detection_pipeline(hostDecoding=True), decoded and
+    # thresholded per class on the host. With `hostNMS` the detections also
+    # go through per-class thresholds, class-wise NMS and a top-K cap on the
+    # host (see postprocess.py). With `track` the detections are followed
+    # across frames by a SORT-style tracker and drawn with their track IDs.
+    # `queueOptions` overrides the queue settings of config.py per stream.
+    # With `offload` the frames are annotated on a pool of worker processes
+    # (see offload.py) instead of on the thread draining the queues. With
+    # a `server` (see mjpeg_server.py) the annotated frames are also
+    # streamed as MJPEG, and annotated even in headless mode. With
+    # `annotate` a headless run still converts and annotates every frame
+    # without showing it, so it costs the host what a displayed run does
+    # (e.g. for the parameter sweeps of sweep.py)
+    if hostDecoding and isinstance(source, ReplayFrameSource):
+        raise ValueError('host decoding needs the raw NNData of a device, '
+                         'recordings only hold decoded detections')
+    if source is None:
+        source = DeviceFrameSource(pipeline)
 
-    # set mobilenet detection model blob path
-    nn.setBlobPath(config.MOBILENET_DETECTION_MODEL_PATH)
-    nn.input.setBlocking(False)
+    with source as device:
+        # sliding-window FPS of the camera frames and the detections
+        meters = StreamMeters(('rgb', 'nn'))
 
-    # link the camera preview to XLinkOut node input
-    camRgb.preview.link(xoutRgb.input)
+        # color pattern for displaying FPS
+        color2 = config.TEXT_COLOR2  
 
-    # camera frames linked to NN input node
-    camRgb.preview.link(nn.input)
+        # boolean variable for printing NN layer names on console
+        printOutputLayersOnce = config.PRINT_NEURAL_NETWORK_METADATA
 
-    # NN out (image detections) linked to XLinkOut node
-    nn.out.link(nnOut.input)
+        # pair every camera frame with the detections computed on it (same
+        # sequence number) so bounding boxes never lag or lead the image
+        sync = MessageSynchronizer(('rgb', 'nn'))
+        stop = StopCondition(headless, duration, maxFrames)
 
-    # NN unparsed inference results  (metadata) linked to XLinkOut node
-    nn.outNetwork.link(nnNetworkOut.input)
+        # per-stage latency histograms
+        metrics = Instrumentation()
+        if metricsPath is not None:
+            metrics.dumpOnSignal(metricsPath)
 
-    # return pipeline to the calling function
-    return pipeline
+        # per-class confidence thresholds for host decoding and NMS
+        thresholds = class_threshold_array()
 
+        # track identities across frames
+        tracker = SortTracker()
 
-def object_detection_mobilenet(pipeline):
-    # connect to device and start pipeline
-    with dai.Device(pipeline) as device:
-        # output queues will be used to get the rgb frames
-        # and nn data from the outputs defined above
-        qRgb = device.getOutputQueue(
-            name='rgb',
-            maxSize=config.COLOR_CAMERA_QUEUE_SIZE,
-            blocking=config.QUEUE_BLOCKING,
-        )
-        qDet = device.getOutputQueue(
-            name='nn',
-            maxSize=config.COLOR_CAMERA_QUEUE_SIZE,
-            blocking=config.QUEUE_BLOCKING,
-        )
-        qNN = device.getOutputQueue(
-            name='nnNetwork',
-            maxSize=config.COLOR_CAMERA_QUEUE_SIZE,
-            blocking=config.QUEUE_BLOCKING,
-        )
-
-        # initialize frame, detections list, and startTime for
-        # computing FPS
-        frame = None
-        detections = []
-        startTime = time.monotonic()
-        counter = 0
+        # annotation worker processes, started on the first frame since
+        # the frame shape is needed to size their shared-memory slots
+        offloader = None
 
-        # color pattern for displaying FPS
-        color2 = config.TEXT_COLOR2  
+        # sequence numbers of the camera frames that reached the host, gaps
+        # are frames dropped on the way
+        rgbSeen = {'count': 0, 'first': None, 'last': None}
 
-        # boolean variable for printing NN layer names on console
-        printOutputLayersOnce = config.PRINT_NEURAL_NETWORK_METADATA
+        # a frame and its detections are both available
+        def onSynced(synced):
+            stop.tick()
+            metrics.record('pairing', sync.lastLatency)
+            if not headless or annotate or server is not None:
+                showSynced(synced)
 
-        while True:
-            # instead of get (blocking), we use tryGet (non-blocking)
-            # which will return the available data or None otherwise
-            # grab the camera frames, image detections, and NN 
-            # metadata
-            inRgb = qRgb.tryGet()
-            inDet = qDet.tryGet()
-            inNN = qNN.tryGet()
+            # time from the device capturing the frame to the host being
+            # done with it
+            metrics.recordMessage('endToEnd', synced['rgb'], device.clockNow())
 
-            # check if we frame is available from the camera
-            if inRgb is not None:
-                # convert the camera frame to OpenCV format
-                frame = inRgb.getCvFrame()
+        def showSynced(synced):
+            nonlocal offloader
+            # convert the camera frame to OpenCV format
+            with metrics.measure('getCvFrame'):
+                frame = synced['rgb'].getCvFrame()
 
+            # hand the frame and its detections to the workers, and show
+            # the frames they finished, in order
+            if offload:
+                if offloader is None:
+                    offloader = ProcessOffload(annotate_offloaded, frame.shape)
+                with metrics.measure('offload'):
+                    offloader.submit(
+                        frame, detections_to_array(synced['nn'].detections),
+                        synced['nn'].array if track else None,
+                        meters['nn'].fps(),
+                    )
+                    offloader.drain(showAnnotated)
+                return
+
+            with metrics.measure('annotate'):
                 # annotate the frame with FPS information
                 cv2.putText(
-                    frame, 'NN fps: {:.2f}'.
-                    format(counter / (time.monotonic() - startTime)),
+                    frame, 'NN fps: {:.2f}'.format(meters['nn'].fps()),
                     (2, frame.shape[0] - 4),
                     cv2.FONT_HERSHEY_TRIPLEX, 0.4, color2,
                 )
 
-            # check if detections are available
-            if inDet is not None:
-                # fetch detections & increment the counter for FPS computation
-                detections = inDet.detections
-                counter += 1
+                # draw the matching bounding boxes (and track IDs) on it
+                annotateFrame(frame, synced['nn'].detections)
+                if track:
+                    annotateTrackIds(frame, synced['nn'].array)
+            showAnnotated(frame)
+
+        # show and stream the frame. An offloaded frame is a view of a
+        # shared-memory slot reused after this call, so the server gets a
+        # copy
+        def showAnnotated(frame, value=None):
+            with metrics.measure('display'):
+                if server is not None:
+                    server.publish('object_detection',
+                                   frame.copy() if offload else frame)
+                if not headless:
+                    cv2.imshow('object_detection', frame)
+
+        # a frame or detections are available, record how long ago the
+        # device produced them
+        def onRgb(inRgb):
+            # zero-copy view of the planar frame, only converted to BGR
+            # when it is drawn on (getCvFrame in showSynced)
+            inRgb = FrameView(inRgb)
+            meters.tickMessage('rgb', inRgb)
+            metrics.recordMessage('deviceToHostRgb', inRgb, device.clockNow())
+            seq = inRgb.getSequenceNum()
+            rgbSeen['count'] += 1
+            if rgbSeen['first'] is None:
+                rgbSeen['first'] = seq
+            rgbSeen['last'] = seq
+            synced = sync.add('rgb', inRgb)
+            if synced is not None:
+                onSynced(synced)
 
-            # check if the flag is set and NN metadata is available
-            if printOutputLayersOnce and inNN is not None:
-                # call the `neural network layer names method and pass
-                # inNN queue object which would help extract layer names
+        def onDet(inDet):
+            meters.tickMessage('nn', inDet)
+            metrics.recordMessage('deviceToHostNN', inDet, device.clockNow())
+            if hostDecoding:
+                onNN(inDet)
+                with metrics.measure('decode'):
+                    inDet = decode_nn_data(inDet, thresholds)
+            if hostNMS:
+                with metrics.measure('nms'):
+                    inDet = filter_message(inDet, thresholds)
+            if track:
+                with metrics.measure('track'):
+                    inDet = track_message(tracker, inDet)
+            synced = sync.add('nn', inDet)
+            if synced is not None:
+                onSynced(synced)
+
+        # NN metadata is available
+        def onNN(inNN):
+            # if the flag is set, call the `neural network layer names
+            # method and pass inNN queue object which would help extract
+            # layer names
+            nonlocal printOutputLayersOnce
+            if printOutputLayersOnce:
                 print_neural_network_layer_names(inNN)
                 printOutputLayersOnce = False
 
-            # if the frame is available, draw bounding boxes on it
-            # and show the frame
-            if frame is not None:
-                displayFrame('object_detection', frame, detections)
+        # the consumer blocks until the camera frames, image detections
+        # or NN metadata output queue has data and calls its handler (the
+        # raw NN output already carries the metadata with host decoding)
+        handlers = {'rgb': onRgb, 'nn': onDet}
+        if not hostDecoding:
+            handlers['nnNetwork'] = onNN
+        consumer = QueueConsumer(device, handlers, instrumentation=metrics,
+                                 queueOptions=queueOptions)
+
+        # break out from the loop if `q` key is pressed or the run limits
+        # are reached, then show the frames still with the workers. The
+        # workers are stopped and their shared memory freed even when the
+        # loop or a handler raised
+        try:
+            with stop:
+                consumer.run(stop=stop)
+            if offloader is not None:
+                offloader.drain(showAnnotated, wait=True)
+        finally:
+            if offloader is not None:
+                offloader.close()
+
+        print('Processed: ', stop.summary())
+        print('FPS: ', meters.report())
+        if any(drain == 'latest' for drain in consumer.drain.values()):
+            print('Skipped: ', consumer.skipped)
+
+        # report how many frames were paired or dropped and how long
+        # pairing took, useful for tuning COLOR_CAMERA_QUEUE_SIZE
+        print('Sync stats: ', sync.stats())
+
+        if offloader is not None:
+            print('Offload: ', offloader.stats())
+
+        if metricsPath is not None:
+            metrics.dump(metricsPath)
 
-            # break out from the while loop if `q` key is pressed
-            if cv2.waitKey(1) == ord('q'):
-                break
\ No newline at end of file
+        # run summary, e.g. for the parameter sweeps of sweep.py
+        return {
+            'frames': stop.frames,
+            'elapsed': stop.elapsed(),
+            'rgbReceived': rgbSeen['count'],
+            'rgbCaptured': (rgbSeen['last'] - rgbSeen['first'] + 1
+                            if rgbSeen['count'] else 0),
+            'sync': sync.stats(),
+            'skipped': dict(consumer.skipped),
+            'metrics': metrics,
+        }
@@ -0,0 +1,186 @@
+# import the necessary packages
+from dai_tools import config
+from multiprocessing import shared_memory
+import multiprocessing as mp
+import numpy as np
+import queue
+import time
+
+
+# worker process loop: attach to the shared frame slots once, then run
+# `func(frame, *args)` on a zero-copy view of each submitted slot. `func`
+# may modify the frame in place (e.g. draw on it); its return value is
+# sent back with the time the worker was busy
+def _offload_worker(workerId, slotNames, shape, dtype, func, tasks, results):
+    slots = [shared_memory.SharedMemory(name=name) for name in slotNames]
+    frames = [np.ndarray(shape, dtype=dtype, buffer=slot.buf)
+              for slot in slots]
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            index, slot, args = task
+            start = time.perf_counter()
+            try:
+                value, error = func(frames[slot], *args), None
+            except Exception as exc:
+                value, error = None, exc
+            results.put((index, slot, value, error, workerId,
+                         time.perf_counter() - start))
+    finally:
+        del frames
+        for slot in slots:
+            slot.close()
+
+
+# host-side stage running `func` over frames of a fixed `shape`/`dtype` on
+# a pool of `workers` processes. Frames are copied once into one of
+# `slots` preallocated shared-memory buffers and the workers operate on
+# NumPy views of those buffers, so no frame is ever pickled. Results come
+# back in submission order: drain() hands each one to a callback together
+# with a view of its (possibly modified) slot, then recycles the slot.
+# When every slot is in flight submit() drops the frame (counted) instead
+# of stalling the loop that drains the device queues
+class ProcessOffload:
+    def __init__(self, func, shape, dtype=np.uint8,
+                 workers=config.OFFLOAD_WORKERS, slots=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        slotCount = slots or 2 * workers
+        frameBytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.slots = [shared_memory.SharedMemory(create=True, size=frameBytes)
+                      for _ in range(slotCount)]
+        self.frames = [np.ndarray(self.shape, dtype=self.dtype,
+                                  buffer=slot.buf) for slot in self.slots]
+        self.freeSlots = list(range(slotCount))
+
+        self.tasks = mp.Queue()
+        self.results = mp.Queue()
+        names = [slot.name for slot in self.slots]
+        self.processes = [
+            mp.Process(target=_offload_worker, daemon=True, args=(
+                i, names, self.shape, self.dtype, func, self.tasks,
+                self.results))
+            for i in range(workers)
+        ]
+        for process in self.processes:
+            process.start()
+
+        # submission counter, next index to hand out in order, and the
+        # results that arrived ahead of it
+        self.submitted = 0
+        self.nextIndex = 0
+        self.pending = {}
+        self.dropped = 0
+
+        # per-worker busy time and tasks, for utilization()
+        self.startTime = time.monotonic()
+        self.busy = [0.0] * workers
+        self.tasksDone = [0] * workers
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # copy `frame` into a free slot and queue `func(slot, *args)`. Returns
+    # the submission index, or None if no slot was free and the frame was
+    # dropped
+    def submit(self, frame, *args):
+        if not self.freeSlots:
+            self.dropped += 1
+            return None
+        slot = self.freeSlots.pop()
+        np.copyto(self.frames[slot], frame)
+        index = self.submitted
+        self.submitted += 1
+        self.tasks.put((index, slot, args))
+        return index
+
+    def inFlight(self):
+        return self.submitted - self.nextIndex
+
+    # move one result from the workers into `pending`, waiting for it
+    # when `block` is set; False if there was none. A blocking wait polls
+    # the workers and raises RuntimeError once one of them has died, since
+    # the task it held will never come back
+    def _collect(self, block):
+        while True:
+            try:
+                index, slot, value, error, workerId, busy = self.results.get(
+                    block=block, timeout=config.OFFLOAD_POLL_INTERVAL)
+                break
+            except queue.Empty:
+                if not block:
+                    return False
+            dead = [process for process in self.processes
+                    if not process.is_alive()]
+            if dead:
+                raise RuntimeError('offload worker {} exited with code {}'
+                                   .format(dead[0].name, dead[0].exitcode))
+        self.pending[index] = (slot, value, error)
+        self.busy[workerId] += busy
+        self.tasksDone[workerId] += 1
+        return True
+
+    # call `handler(frame, value)` for every finished task, in submission
+    # order, and return how many were handled. `frame` is a view of the
+    # slot and is only valid during the call. With `wait` it blocks until
+    # every submitted task is handled
+    def drain(self, handler, wait=False):
+        handled = 0
+        while self.nextIndex < self.submitted:
+            while self._collect(False):
+                pass
+            if self.nextIndex not in self.pending:
+                if not wait:
+                    break
+                self._collect(True)
+                continue
+            slot, value, error = self.pending.pop(self.nextIndex)
+            self.nextIndex += 1
+            try:
+                if error is not None:
+                    raise error
+                handler(self.frames[slot], value)
+            finally:
+                self.freeSlots.append(slot)
+            handled += 1
+        return handled
+
+    # fraction of the wall time each worker spent running `func`
+    def utilization(self):
+        elapsed = time.monotonic() - self.startTime
+        return [busy / elapsed if elapsed else 0.0 for busy in self.busy]
+
+    def stats(self):
+        return {
+            'submitted': self.submitted,
+            'dropped': self.dropped,
+            'tasks': list(self.tasksDone),
+            'utilization': [round(u, 3) for u in self.utilization()],
+        }
+
+    # stop the workers, terminating any that do not exit within
+    # OFFLOAD_JOIN_TIMEOUT, and free the shared-memory slots. Safe to call
+    # more than once
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            for _ in self.processes:
+                self.tasks.put(None)
+            for process in self.processes:
+                process.join(config.OFFLOAD_JOIN_TIMEOUT)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+        finally:
+            del self.frames
+            for slot in self.slots:
+                slot.close()
+                slot.unlink()
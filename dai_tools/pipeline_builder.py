@@ -0,0 +1,280 @@
+# import the necessary packages
+from dai_tools import config
+from dai_tools.queue_consumer import DRAIN_POLICIES
+import copy
+import json
+import os
+
+# depthai is only needed to validate and build a graph, loading and
+# overriding descriptions (e.g. for the sweeps over recordings) works
+# without it
+try:
+    import depthai as dai
+except ImportError:
+    dai = None
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+# declarative description of a pipeline, which the create_*_pipeline
+# functions of the demos build from pipelines/. A graph description (JSON,
+# or YAML when PyYAML is installed) lists the nodes with their properties,
+# the links between them and the streams sent to the host:
+#
+#   {
+#     "openVINOVersion": "VERSION_2022_1",
+#     "nodes": {
+#       "camRgb": {"type": "ColorCamera",
+#                  "properties": {"previewSize": "$COLOR_CAMERA_PREVIEW_SIZE",
+#                                 "colorOrder": "RGB", "fps": 30}},
+#       "nn": {"type": "MobileNetDetectionNetwork",
+#              "properties": {"blobPath": "$MOBILENET_DETECTION_MODEL_PATH"},
+#              "inputs": {"input": {"blocking": false}}}
+#     },
+#     "links": [["camRgb.preview", "nn.input"]],
+#     "streams": {"rgb": {"from": "camRgb.preview", "queueSize": 4,
+#                         "blocking": false}}
+#   }
+#
+# Every property `name` is applied with the node's `setName` method. Enum
+# properties (colorOrder, resolution, boardSocket) take the enum member
+# name, and a string "$NAME" is replaced by the constant NAME of
+# dai_tools/config.py. Each stream gets an XLinkOut node with that stream
+# name, and its queueSize/blocking are the host output queue settings.
+# A stream's optional "drain" ("all" or "latest") is its drain policy in
+# the host loops (see queue_consumer.py)
+GRAPH_KEYS = {'openVINOVersion', 'nodes', 'links', 'streams'}
+NODE_KEYS = {'type', 'properties', 'inputs'}
+INPUT_KEYS = {'blocking', 'queueSize'}
+STREAM_KEYS = {'from', 'queueSize', 'blocking', 'drain'}
+
+# (node type, property) -> path of the enum in the depthai module
+ENUM_PROPERTIES = {
+    ('ColorCamera', 'colorOrder'): 'ColorCameraProperties.ColorOrder',
+    ('ColorCamera', 'resolution'): 'ColorCameraProperties.SensorResolution',
+    ('ColorCamera', 'boardSocket'): 'CameraBoardSocket',
+    ('MonoCamera', 'resolution'): 'MonoCameraProperties.SensorResolution',
+    ('MonoCamera', 'boardSocket'): 'CameraBoardSocket',
+}
+
+
+# raised with every problem found in a graph description, before anything
+# is created on the pipeline
+class PipelineGraphError(ValueError):
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__('invalid pipeline graph:\n  ' +
+                         '\n  '.join(self.errors))
+
+
+def _require_depthai():
+    if dai is None:
+        raise ImportError('depthai is needed to validate and build '
+                          'pipeline graphs, `pip install depthai`')
+
+
+# path of the graph `name` (e.g. 'object_detection') in PIPELINE_GRAPH_DIR
+def graph_path(name):
+    return os.path.join(config.PIPELINE_GRAPH_DIR, name + '.json')
+
+
+def load_graph(path):
+    with open(path) as f:
+        if os.path.splitext(path)[1] in ('.yaml', '.yml'):
+            if yaml is None:
+                raise ImportError(
+                    'PyYAML is needed for YAML pipeline graphs, '
+                    'use JSON or `pip install pyyaml`')
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+# copy of `graph` with `overrides` applied. Each override is a
+# 'dotted.path=value' string into the description, e.g.
+# 'nodes.camRgb.properties.fps=30' or 'streams.rgb.queueSize=2'. Values
+# are parsed as JSON, anything that is not valid JSON is kept as a string
+def apply_overrides(graph, overrides):
+    graph = copy.deepcopy(graph)
+    for override in overrides:
+        path, sep, text = override.partition('=')
+        if not sep:
+            raise ValueError(f'override {override!r} is not path=value')
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            value = text
+        *parents, key = path.split('.')
+        target = graph
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[key] = value
+    return graph
+
+
+def _resolve_enum(path):
+    value = dai
+    for attr in path.split('.'):
+        value = getattr(value, attr)
+    return value
+
+
+# property value with "$NAME" config references and enum names resolved;
+# returns (value, error message or None)
+def _property_value(nodeType, name, value):
+    if isinstance(value, str) and value.startswith('$'):
+        if not hasattr(config, value[1:]):
+            return None, f'unknown config constant {value!r}'
+        value = getattr(config, value[1:])
+    if isinstance(value, list):
+        value = tuple(value)
+    enumPath = ENUM_PROPERTIES.get((nodeType, name))
+    if enumPath is not None:
+        enum = _resolve_enum(enumPath)
+        if not hasattr(enum, str(value)):
+            return None, f'{value!r} is not a {enumPath} member'
+        value = getattr(enum, value)
+    return value, None
+
+
+def _setter(name):
+    return 'set' + name[0].upper() + name[1:]
+
+
+# split 'node.port' and check the port exists on the node type
+def _check_endpoint(endpoint, nodes, errors, where):
+    nodeName, _, port = str(endpoint).partition('.')
+    node = nodes.get(nodeName)
+    if node is None or not port:
+        errors.append(f'{where}: {endpoint!r} is not an existing node.port')
+        return None
+    nodeClass = getattr(dai.node, str(node.get('type')), None)
+    if nodeClass is not None and not hasattr(nodeClass, port):
+        errors.append(f'{where}: {node["type"]} has no port {port!r}')
+        return None
+    return nodeName, port
+
+
+# list of every problem in `graph`, empty if it can be built
+def validate_graph(graph):
+    _require_depthai()
+    errors = []
+    if not isinstance(graph, dict):
+        return ['the graph description must be a mapping']
+    for key in set(graph) - GRAPH_KEYS:
+        errors.append(f'unknown top-level key {key!r}')
+    version = graph.get('openVINOVersion')
+    if version is not None and not hasattr(dai.OpenVINO.Version, version):
+        errors.append(f'unknown OpenVINO version {version!r}')
+
+    nodes = graph.get('nodes', {})
+    if not nodes:
+        errors.append('the graph has no nodes')
+    for name, node in nodes.items():
+        for key in set(node) - NODE_KEYS:
+            errors.append(f'node {name}: unknown key {key!r}')
+        nodeClass = getattr(dai.node, str(node.get('type')), None)
+        if nodeClass is None:
+            errors.append(f'node {name}: unknown type {node.get("type")!r}')
+            continue
+        for prop, value in node.get('properties', {}).items():
+            if not hasattr(nodeClass, _setter(prop)):
+                errors.append(f'node {name}: {node["type"]} has no '
+                              f'{_setter(prop)}')
+                continue
+            _, error = _property_value(node['type'], prop, value)
+            if error is not None:
+                errors.append(f'node {name}: {prop}: {error}')
+        for port, settings in node.get('inputs', {}).items():
+            if not hasattr(nodeClass, port):
+                errors.append(f'node {name}: {node["type"]} has no input '
+                              f'{port!r}')
+            for key in set(settings) - INPUT_KEYS:
+                errors.append(f'node {name}: input {port}: unknown key '
+                              f'{key!r}')
+
+    linkedInputs = set()
+    for i, link in enumerate(graph.get('links', [])):
+        if not isinstance(link, (list, tuple)) or len(link) != 2:
+            errors.append(f'link {i}: expected [output, input]')
+            continue
+        _check_endpoint(link[0], nodes, errors, f'link {i}')
+        target = _check_endpoint(link[1], nodes, errors, f'link {i}')
+        if target is not None:
+            if target in linkedInputs:
+                errors.append(f'link {i}: {link[1]} is already linked')
+            linkedInputs.add(target)
+
+    for name, stream in graph.get('streams', {}).items():
+        for key in set(stream) - STREAM_KEYS:
+            errors.append(f'stream {name}: unknown key {key!r}')
+        _check_endpoint(stream.get('from'), nodes, errors, f'stream {name}')
+        queueSize = stream.get('queueSize', 1)
+        if not isinstance(queueSize, int) or queueSize < 1:
+            errors.append(f'stream {name}: queueSize must be a positive int')
+        if not isinstance(stream.get('blocking', False), bool):
+            errors.append(f'stream {name}: blocking must be true or false')
+        if stream.get('drain', 'all') not in DRAIN_POLICIES:
+            errors.append(f'stream {name}: drain must be one of '
+                          f'{", ".join(DRAIN_POLICIES)}')
+    return errors
+
+
+# host output queue settings of every stream of `graph`, as the
+# `queueOptions` taken by QueueConsumer and the demos
+def graph_queue_options(graph):
+    return {
+        name: {
+            'maxSize': stream.get('queueSize', config.COLOR_CAMERA_QUEUE_SIZE),
+            'blocking': stream.get('blocking', config.QUEUE_BLOCKING),
+            'drain': stream.get('drain', config.QUEUE_DRAIN),
+        }
+        for name, stream in graph.get('streams', {}).items()
+    }
+
+
+# validate `graph` (a description, or the path of a .json/.yaml file) with
+# `overrides` applied and build its dai.Pipeline. Returns the pipeline and
+# the host queue options of its streams
+def build_pipeline(graph, overrides=()):
+    if isinstance(graph, str):
+        graph = load_graph(graph)
+    graph = apply_overrides(graph, overrides)
+    errors = validate_graph(graph)
+    if errors:
+        raise PipelineGraphError(errors)
+
+    pipeline = dai.Pipeline()
+    version = graph.get('openVINOVersion')
+    if version is not None:
+        pipeline.setOpenVINOVersion(getattr(dai.OpenVINO.Version, version))
+
+    nodes = {}
+    for name, spec in graph['nodes'].items():
+        node = pipeline.create(getattr(dai.node, spec['type']))
+        for prop, value in spec.get('properties', {}).items():
+            value, _ = _property_value(spec['type'], prop, value)
+            getattr(node, _setter(prop))(value)
+        for port, settings in spec.get('inputs', {}).items():
+            nodeInput = getattr(node, port)
+            if 'blocking' in settings:
+                nodeInput.setBlocking(settings['blocking'])
+            if 'queueSize' in settings:
+                nodeInput.setQueueSize(settings['queueSize'])
+        nodes[name] = node
+
+    def port(endpoint):
+        nodeName, _, portName = endpoint.partition('.')
+        return getattr(nodes[nodeName], portName)
+
+    for source, target in graph.get('links', []):
+        port(source).link(port(target))
+
+    for name, stream in graph.get('streams', {}).items():
+        xout = pipeline.create(dai.node.XLinkOut)
+        xout.setStreamName(name)
+        port(stream['from']).link(xout.input)
+
+    return pipeline, graph_queue_options(graph)
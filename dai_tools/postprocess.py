@@ -0,0 +1,73 @@
+# import the necessary packages
+from dai_tools import config
+from dai_tools.ssd_decoder import LABEL, CONFIDENCE, XMIN, YMAX
+from dai_tools.ssd_decoder import class_threshold_array, detections_to_array
+from dai_tools.ssd_decoder import DecodedDetections, threshold_mask
+import numpy as np
+
+
+# (N, M) IoU matrix between two sets of (xmin, ymin, xmax, ymax) boxes,
+# computed with broadcasting in one pass
+def iou_matrix(boxesA, boxesB):
+    boxesA = np.asarray(boxesA, dtype=np.float32)
+    boxesB = np.asarray(boxesB, dtype=np.float32)
+    ax0, ay0, ax1, ay1 = (boxesA[:, k, None] for k in range(4))
+    bx0, by0, bx1, by1 = boxesB.T
+    width = np.minimum(ax1, bx1) - np.maximum(ax0, bx0)
+    height = np.minimum(ay1, by1) - np.maximum(ay0, by0)
+    np.maximum(width, 0, out=width)
+    np.maximum(height, 0, out=height)
+    intersection = width * height
+    union = (ax1 - ax0) * (ay1 - ay0) + (bx1 - bx0) * (by1 - by0)
+    union -= intersection
+    np.maximum(union, 1e-9, out=union)
+    return np.divide(intersection, union, out=intersection)
+
+
+# greedy class-wise non-maximum suppression over an (N, 7) detection array
+# (see ssd_decoder.py). Boxes of different classes are shifted apart so
+# they never overlap, which runs all the classes in one batched pass: the
+# IoU matrix is computed once and each kept box suppresses the rest of its
+# row with a vector operation. Returns the indices kept, best first, at
+# most `topK` of them
+def batched_nms(detections, iouThreshold=config.NMS_IOU_THRESHOLD,
+                topK=config.NMS_TOP_K):
+    order = np.argsort(-detections[:, CONFIDENCE], kind='stable')
+    boxes = detections[order, XMIN:YMAX + 1]
+    boxes = boxes + (detections[order, LABEL] * 2.0)[:, None]
+    suppressed = iou_matrix(boxes, boxes) > iouThreshold
+
+    keep = np.ones(len(order), dtype=bool)
+    kept = []
+    for i in range(len(order)):
+        if not keep[i]:
+            continue
+        kept.append(i)
+        if len(kept) >= topK:
+            break
+        keep[i + 1:] &= ~suppressed[i, i + 1:]
+    return order[kept]
+
+
+# host-side post-processing of an (N, 7) detection array: per-class
+# confidence thresholds (config.CLASS_THRESHOLDS over NN_THRESHOLD),
+# class-wise NMS and a top-K cap. Returns the surviving rows, best first
+def filter_detections(detections, thresholds=None,
+                      iouThreshold=config.NMS_IOU_THRESHOLD,
+                      topK=config.NMS_TOP_K):
+    if thresholds is None:
+        thresholds = class_threshold_array()
+    detections = detections[threshold_mask(detections, thresholds)]
+    if len(detections) == 0:
+        return detections
+    return detections[batched_nms(detections, iouThreshold, topK)]
+
+
+# post-process the detections of a message, either device ImgDetections or
+# DecodedDetections from host decoding, into a new DecodedDetections
+def filter_message(inDet, thresholds=None):
+    if isinstance(inDet, DecodedDetections):
+        message, array = inDet.inNN, inDet.array
+    else:
+        message, array = inDet, detections_to_array(inDet.detections)
+    return DecodedDetections(message, filter_detections(array, thresholds))
@@ -0,0 +1,92 @@
+# import the necessary packages
+from dai_tools import config
+import datetime
+
+# how the pending messages of a stream are handed to its handler: 'all'
+# of them in order, or only the 'latest', skipping the older ones
+DRAIN_POLICIES = ('all', 'latest')
+
+
+# split the per-stream `options` (see QueueConsumer) into the arguments of
+# getOutputQueue and the drain policy of the stream
+def queue_settings(options, maxSize=config.COLOR_CAMERA_QUEUE_SIZE,
+                   blocking=config.QUEUE_BLOCKING):
+    settings = dict({'maxSize': maxSize, 'blocking': blocking,
+                     'drain': config.QUEUE_DRAIN}, **(options or {}))
+    drain = settings.pop('drain')
+    if drain not in DRAIN_POLICIES:
+        raise ValueError(f'drain must be one of {DRAIN_POLICIES}, '
+                         f'not {drain!r}')
+    return settings, drain
+
+
+# pending messages of `queue` to handle under the `drain` policy, and how
+# many were skipped. With 'latest', a host loop that fell behind goes
+# straight to the newest message instead of converting and showing every
+# stale one
+def drain_queue(queue, drain):
+    messages = queue.tryGetAll()
+    if drain == 'latest' and len(messages) > 1:
+        return messages[-1:], len(messages) - 1
+    return messages, 0
+
+
+# event-driven replacement for the `while True: q.tryGet()` polling loops.
+# Instead of spinning over every output queue, the consumer blocks in
+# getQueueEvent until one of the streams has data and then dispatches all
+# the pending messages of that stream to its handler, so an idle pipeline
+# costs no host CPU
+class QueueConsumer:
+    def __init__(self, device, handlers, maxSize=config.COLOR_CAMERA_QUEUE_SIZE,
+                 blocking=config.QUEUE_BLOCKING, timeout=0.1,
+                 instrumentation=None, queueOptions=None):
+        # `handlers` maps stream names to callables taking one message,
+        # dequeue times are recorded into `instrumentation` if given.
+        # `queueOptions` can override maxSize/blocking and the drain
+        # policy per stream, e.g.
+        # {'rgb': {'maxSize': 2, 'blocking': False, 'drain': 'latest'}}
+        queueOptions = queueOptions or {}
+        self.device = device
+        self.instrumentation = instrumentation
+        self.handlers = dict(handlers)
+        self.names = list(self.handlers)
+        self.queues = {}
+        self.drain = {}
+        for name in self.names:
+            settings, self.drain[name] = queue_settings(
+                queueOptions.get(name), maxSize, blocking)
+            self.queues[name] = device.getOutputQueue(name=name, **settings)
+        # messages left unhandled by the 'latest' drain policy
+        self.skipped = {name: 0 for name in self.names}
+        self.timeout = datetime.timedelta(seconds=timeout)
+
+    # wait up to `timeout` for data on any stream, dispatch it and return
+    # the number of messages handled (0 on timeout)
+    def poll(self):
+        name = self.device.getQueueEvent(self.names, self.timeout)
+        if not name:
+            return 0
+
+        # an event can be stale if a previous round already drained the
+        # queue, in which case tryGetAll simply returns nothing
+        if self.instrumentation is None:
+            messages, skipped = drain_queue(self.queues[name],
+                                            self.drain[name])
+        else:
+            with self.instrumentation.measure('dequeue'):
+                messages, skipped = drain_queue(self.queues[name],
+                                                self.drain[name])
+        self.skipped[name] += skipped
+        handler = self.handlers[name]
+        for message in messages:
+            handler(message)
+        return len(messages)
+
+    # dispatch messages until `stop()` returns True or the device closes.
+    # `stop` is evaluated after every dispatch round and on every timeout,
+    # which is where the demos pump the OpenCV GUI with cv2.waitKey
+    def run(self, stop=lambda: False):
+        while not self.device.isClosed():
+            self.poll()
+            if stop():
+                break
@@ -0,0 +1,166 @@
+# import the necessary packages
+from dai_tools import config
+from dai_tools.frame_container import FrameContainerWriter
+import numpy as np
+import threading
+import queue
+import cv2
+import os
+
+
+# writes raw frames into a frame container (see frame_container.py)
+# preallocated for `capacity` frames of the shape/dtype of the first
+# frame. Frames past `capacity` are refused
+class RawFrameWriter:
+    def __init__(self, path, capacity=config.RECORDER_MAX_FRAMES):
+        self.path = path
+        self.capacity = capacity
+        self.container = None
+
+    def write(self, frame, timestamp, sequenceNum):
+        if self.container is None:
+            self.container = FrameContainerWriter(
+                self.path, frame.shape, frame.dtype, self.capacity)
+        return self.container.write(frame, timestamp, sequenceNum)
+
+    def close(self):
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+
+# encodes frames into a video file with cv2.VideoWriter, opened on the
+# first frame to pick up its size and colour, and keeps the device
+# timestamps and sequence numbers in an `.index.npz` sidecar
+class VideoFrameWriter:
+    def __init__(self, path, fps=config.CAMERA_FPS, fourcc='mp4v'):
+        self.path = path
+        self.fps = fps
+        self.fourcc = fourcc
+        self.writer = None
+        self.timestamps = []
+        self.sequenceNums = []
+
+    def write(self, frame, timestamp, sequenceNum):
+        if self.writer is None:
+            self.writer = cv2.VideoWriter(
+                self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps,
+                (frame.shape[1], frame.shape[0]), frame.ndim == 3,
+            )
+        self.writer.write(frame)
+        self.timestamps.append(timestamp)
+        self.sequenceNums.append(sequenceNum)
+        return True
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.writer.release()
+        np.savez(
+            f'{self.path}.index.npz',
+            timestamps=np.array(self.timestamps, dtype=np.float64),
+            sequenceNums=np.array(self.sequenceNums, dtype=np.int64),
+        )
+        self.writer = None
+
+
+# asynchronous recorder stage: the capture loop hands messages (anything
+# with getCvFrame, getTimestamp and getSequenceNum) to submit(), which
+# never blocks. A background thread converts and writes them, with
+# `convert(message)` (getCvFrame by default). When the bounded hand-off
+# queue is full the message is dropped and counted instead of stalling the
+# loop on disk I/O. A conversion or write error (disk full, a frame of
+# another shape) is kept in `error` and reported by stats(); the messages
+# from then on are counted as `failed`, and close() still closes the writer
+class StreamRecorder:
+    def __init__(self, writer, queueSize=config.RECORDER_QUEUE_SIZE,
+                 convert=lambda message: message.getCvFrame()):
+        self.writer = writer
+        self.convert = convert
+        self.pending = queue.Queue(maxsize=queueSize)
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.overflow = 0
+        self.failed = 0
+        self.error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, message):
+        self.submitted += 1
+        try:
+            self.pending.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _run(self):
+        while True:
+            message = self.pending.get()
+            if message is None:
+                break
+            # after an error the thread keeps emptying the queue, so
+            # submit() and close() never wait on it
+            if self.error is not None:
+                self.failed += 1
+                continue
+            try:
+                written = self.writer.write(
+                    self.convert(message),
+                    message.getTimestamp().total_seconds(),
+                    message.getSequenceNum(),
+                )
+            except Exception as error:
+                self.error = error
+                self.failed += 1
+                continue
+            if written:
+                self.written += 1
+            else:
+                self.overflow += 1
+
+    # write out what is still queued, then close the writer (finalising
+    # the container, unlinking a ring), also after a write error
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.pending.put(None)
+            self.thread.join()
+        finally:
+            self.writer.close()
+
+    def stats(self):
+        return {
+            'submitted': self.submitted,
+            'written': self.written,
+            'dropped': self.dropped,
+            'overflow': self.overflow,
+            'failed': self.failed,
+            'error': repr(self.error) if self.error is not None else None,
+        }
+
+
+# one recorder per stream, writing `<directory>/<stream>.dfc` (raw frame
+# container) or `<directory>/<stream>.mp4` (encoded video)
+def create_recorders(directory, streams, recordFormat='raw'):
+    os.makedirs(directory, exist_ok=True)
+    recorders = {}
+    for stream in streams:
+        if recordFormat == 'raw':
+            writer = RawFrameWriter(os.path.join(directory, f'{stream}.dfc'))
+        else:
+            writer = VideoFrameWriter(
+                os.path.join(directory, f'{stream}.mp4'))
+        recorders[stream] = StreamRecorder(writer)
+    return recorders
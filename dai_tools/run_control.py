@@ -0,0 +1,54 @@
+# import the necessary packages
+import signal
+import time
+import cv2
+
+
+# decides when a demo loop stops: on the `q` key in the OpenCV window (GUI
+# mode only), after `duration` seconds, after `maxFrames` frames or on
+# SIGINT (Ctrl+C). In headless mode no window is ever touched, so
+# cv2.waitKey is not called at all. Used as a context manager it installs
+# the SIGINT handler for the duration of the loop, and it counts frames
+# so it can report the throughput at the end
+class StopCondition:
+    def __init__(self, headless=False, duration=None, maxFrames=None):
+        self.headless = headless
+        self.duration = duration
+        self.maxFrames = maxFrames
+        self.frames = 0
+        self.interrupted = False
+        self.startTime = time.monotonic()
+        self.previousHandler = None
+
+    def __enter__(self):
+        self.previousHandler = signal.signal(signal.SIGINT, self._interrupt)
+        self.startTime = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        signal.signal(signal.SIGINT, self.previousHandler)
+
+    def _interrupt(self, signum, frame):
+        self.interrupted = True
+
+    # count `count` processed frames
+    def tick(self, count=1):
+        self.frames += count
+
+    def elapsed(self):
+        return time.monotonic() - self.startTime
+
+    def __call__(self):
+        if self.interrupted:
+            return True
+        if self.duration is not None and self.elapsed() >= self.duration:
+            return True
+        if self.maxFrames is not None and self.frames >= self.maxFrames:
+            return True
+        # pump the GUI and break out if `q` key is pressed
+        return not self.headless and cv2.waitKey(1) == ord('q')
+
+    def summary(self):
+        elapsed = self.elapsed()
+        return (f'{self.frames} frames in {elapsed:.2f} s '
+                f'({self.frames / elapsed if elapsed else 0.0:.2f} fps)')
@@ -0,0 +1,253 @@
+# import the necessary packages
+from dai_tools import config
+from dai_tools.recorder import StreamRecorder
+from dai_tools.frame_view import FrameView
+from multiprocessing import shared_memory, resource_tracker
+import multiprocessing as mp
+import numpy as np
+import struct
+import time
+import os
+
+# fixed-slot ring buffer of frames in one named shared-memory block, for
+# handing frames from a host loop to other processes (recorder, streamer,
+# analytics) without pickling them. Layout:
+#
+#   [header, 128 B] [head counter, int64] [slot table] [frame slots]
+#
+# The header holds the slot count, frame shape and dtype, so consumers only
+# need the name, and the producer's pid. There is a single producer, which
+# never waits: it overwrites the oldest slot, stamps it with the write
+# number and then publishes the new head. Any number of consumers read
+# independently, each with its own cursor. A slot is marked as being
+# written (-1) while it is copied, and a consumer re-checks the stamp after
+# copying a frame out, so a frame overwritten mid-copy is detected and
+# skipped rather than returned torn
+RING_MAGIC = b'DAIRING1'
+RING_MAX_DIMS = 4
+RING_HEADER = struct.Struct(f'<8sII{RING_MAX_DIMS}Q16sQ')
+RING_HEADER_SIZE = 128
+SLOT_DTYPE = np.dtype([
+    ('stamp', '<i8'),
+    ('sequenceNum', '<i8'),
+    ('timestamp', '<f8'),
+])
+
+
+def _align(size, alignment=64):
+    return -(-size // alignment) * alignment
+
+
+# attach to the existing block `name` without letting this process unlink
+# it. Before Python 3.13 attaching registers the block with the resource
+# tracker, which unlinks it when the process exits; a consumer that is not
+# the producer or one of its child processes (which share the producer's
+# tracker) has a tracker of its own and must unregister it
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+    producerPid = RING_HEADER.unpack_from(shm.buf, 0)[-1]
+    if mp.parent_process() is None and producerPid != os.getpid():
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+# whether process `pid` exists, it may belong to another user
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# unlink the existing block `name` if it is a ring whose producer has
+# exited without unlinking it (e.g. crashed). A ring whose producer is
+# still running, or a block that is not a frame ring, is left alone and
+# FileExistsError raised
+def _unlink_stale(name):
+    existing = _attach(name)
+    try:
+        magic, *_, producerPid = RING_HEADER.unpack_from(existing.buf, 0)
+        if magic != RING_MAGIC:
+            raise FileExistsError(
+                f'shared memory block {name} exists and is not a frame ring')
+        if _process_alive(producerPid):
+            raise FileExistsError(
+                f'frame ring {name} is in use by process {producerPid}')
+    finally:
+        existing.close()
+    stale = shared_memory.SharedMemory(name=name)
+    stale.close()
+    stale.unlink()
+
+
+class SharedFrameRing:
+    # create the ring `name` for frames of `shape`/`dtype` (producer side,
+    # `create=True`), or attach to an existing one (consumer side). A stale
+    # block left by a producer that has exited is replaced; creating a ring
+    # whose producer is still running raises FileExistsError
+    def __init__(self, name, shape=None, dtype=None,
+                 slots=config.SHM_RING_SLOTS, create=False):
+        self.name = name
+        self.owner = create
+        if create:
+            self.shape = tuple(shape)
+            self.dtype = np.dtype(dtype)
+            self.slots = slots
+            size = self._layout()
+            try:
+                self.shm = shared_memory.SharedMemory(
+                    name=name, create=True, size=size)
+            except FileExistsError:
+                _unlink_stale(name)
+                self.shm = shared_memory.SharedMemory(
+                    name=name, create=True, size=size)
+            dims = self.shape + (0,) * (RING_MAX_DIMS - len(self.shape))
+            RING_HEADER.pack_into(
+                self.shm.buf, 0, RING_MAGIC, self.slots, len(self.shape),
+                *dims, self.dtype.str.encode(), os.getpid())
+        else:
+            self.shm = _attach(name)
+            magic, self.slots, ndim, *dims, dtype, _ = RING_HEADER.unpack_from(
+                self.shm.buf, 0)
+            if magic != RING_MAGIC:
+                self.shm.close()
+                raise ValueError(f'{name} is not a frame ring')
+            self.shape = tuple(dims[:ndim])
+            self.dtype = np.dtype(dtype.rstrip(b'\0').decode())
+            self._layout()
+
+        buf = self.shm.buf
+        self.head = np.ndarray((1,), dtype='<i8', buffer=buf,
+                               offset=RING_HEADER_SIZE)
+        self.table = np.ndarray((self.slots,), dtype=SLOT_DTYPE, buffer=buf,
+                                offset=self.tableOffset)
+        self.frames = np.ndarray((self.slots,) + self.shape, dtype=self.dtype,
+                                 buffer=buf, offset=self.dataOffset)
+        if create:
+            self.head[0] = 0
+            self.table['stamp'] = -1
+
+        # consumer state: next write number to read, and frames lost
+        # because they were overwritten before this consumer got to them
+        self.cursor = int(self.head[0])
+        self.missed = 0
+
+    def _layout(self):
+        self.tableOffset = RING_HEADER_SIZE + 64
+        self.dataOffset = _align(self.tableOffset
+                                 + self.slots * SLOT_DTYPE.itemsize)
+        frameBytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        return self.dataOffset + self.slots * frameBytes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # producer: copy `frame` into the oldest slot and publish it. Same
+    # signature as the recorder writers, so the ring can back a
+    # StreamRecorder
+    def write(self, frame, timestamp=0.0, sequenceNum=-1):
+        stamp = int(self.head[0])
+        entry = self.table[stamp % self.slots:stamp % self.slots + 1]
+        entry['stamp'] = -1
+        self.frames[stamp % self.slots] = frame
+        entry['sequenceNum'] = sequenceNum
+        entry['timestamp'] = timestamp
+        entry['stamp'] = stamp
+        self.head[0] = stamp + 1
+        return True
+
+    # consumer: number of frames written and not read yet
+    def available(self):
+        return int(self.head[0]) - self.cursor
+
+    # consumer: next unread frame as (frame copy, write stamp, device
+    # sequence number, timestamp), or None if there is none. With `latest`
+    # older unread frames are skipped (and counted in `missed`). With a
+    # `timeout` (seconds) it polls until a frame arrives
+    def read(self, latest=False, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            head = int(self.head[0])
+            # the slot after head may be being overwritten right now, so
+            # at most slots - 1 frames behind head are safe to read
+            oldest = head - self.slots + 1
+            if latest:
+                oldest = head - 1
+            if self.cursor < oldest:
+                self.missed += oldest - self.cursor
+                self.cursor = oldest
+            if self.cursor < head:
+                slot = self.cursor % self.slots
+                frame = self.frames[slot].copy()
+                entry = self.table[slot].copy()
+                # the copy is only valid if the slot still holds the same
+                # write, i.e. the producer did not lap this consumer
+                if entry['stamp'] == self.cursor == self.table[slot]['stamp']:
+                    self.cursor += 1
+                    return (frame, int(entry['stamp']),
+                            int(entry['sequenceNum']),
+                            float(entry['timestamp']))
+                self.missed += 1
+                self.cursor += 1
+                continue
+            if deadline is None or time.monotonic() >= deadline:
+                return None
+            time.sleep(0.0005)
+
+    # the producer unlinks the block, consumers only detach
+    def close(self):
+        if self.shm is None:
+            return
+        del self.head, self.table, self.frames
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+
+
+# recorder writer (see recorder.py) publishing frames into the ring
+# `name`, created on the first frame with its shape and dtype
+class SharedRingWriter:
+    def __init__(self, name, slots=config.SHM_RING_SLOTS):
+        self.name = name
+        self.slots = slots
+        self.ring = None
+
+    def write(self, frame, timestamp, sequenceNum):
+        if self.ring is None:
+            self.ring = SharedFrameRing(self.name, frame.shape, frame.dtype,
+                                        self.slots, create=True)
+        return self.ring.write(frame, timestamp, sequenceNum)
+
+    def close(self):
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+
+# one background sink per stream publishing its frames into the ring
+# `<prefix>_<stream>`, with the submit/close/stats interface of the
+# recorders (see create_recorders). With the 'planar' layout the frames
+# are shared as the camera sends them, (3, H, W) planes (or (H, W)
+# grayscale) copied straight from the message buffer without any BGR
+# conversion; 'bgr' shares getCvFrame frames
+def create_ring_sinks(prefix, streams, slots=config.SHM_RING_SLOTS,
+                      layout='bgr'):
+    if layout == 'planar':
+        convert = lambda message: FrameView(message).planar
+    else:
+        convert = lambda message: message.getCvFrame()
+    return {
+        stream: StreamRecorder(SharedRingWriter(f'{prefix}_{stream}', slots),
+                               convert=convert)
+        for stream in streams
+    }
@@ -0,0 +1,667 @@
+# import the necessary packages
+from dai_tools import config
+from dai_tools.frame_source import FrameSource, ReplayImgDetections
+from dai_tools.frame_view import FrameView, PLANAR_TYPES
+from dai_tools.frame_view import INTERLEAVED_TYPES, GRAY_TYPES
+from dai_tools.ssd_decoder import SSD_FIELDS
+from types import SimpleNamespace
+from collections import deque
+import numpy as np
+import threading
+import datetime
+import time
+import cv2
+
+# stand-in for an OAK running a dai.Pipeline, for exercising the host code
+# without hardware (CI, load tests). The pipeline built by the
+# create_*_pipeline functions (or pipeline_builder.py) is inspected: every
+# XLinkOut stream is traced back to the camera output or network feeding
+# it, and the cameras' preview size, resolution, colour order, layout and
+# FPS are read from their nodes. A producer thread then plays the device:
+#
+#   cameras    capture synthetic frames on the camera's own FPS schedule
+#              (a cycle of SIMULATED_FRAME_PATTERNS scrolling textures),
+#              stamped like the device with the capture time on the host
+#              monotonic clock and a sequence number counting every
+#              sensor frame
+#   networks   detection networks take SIMULATED_INFERENCE_TIME seconds
+#              per frame and send ImgDetections (and the raw SSD tensor on
+#              outNetwork, or on out for a plain NeuralNetwork) of
+#              SIMULATED_OBJECTS objects moving through the scene, with the
+#              sequence number and timestamp of the frame they ran on.
+#              Frames arriving while the network is busy wait in its input
+#              queue (the node's queue size), the oldest being dropped
+#
+# The host output queues behave like dai.DataOutputQueue: a non-blocking
+# queue that is full loses its oldest message (counted in `dropped`), a
+# blocking one stalls whatever feeds it until the host reads, and the
+# sensor frames that came due meanwhile are lost (counted in `stalled`,
+# and visible to the host as sequence number gaps). Supported sources are
+# ColorCamera preview (RGB/BGR, planar or interleaved), video (NV12) and
+# isp (YUV420p), MonoCamera out (RAW8), and the out, outNetwork and
+# passthrough outputs of MobileNetDetectionNetwork, YoloDetectionNetwork
+# and NeuralNetwork nodes fed by one of those cameras
+CAMERA_TYPES = ('ColorCamera', 'MonoCamera')
+NETWORK_TYPES = ('MobileNetDetectionNetwork', 'YoloDetectionNetwork',
+                 'NeuralNetwork')
+NETWORK_OUTPUTS = ('out', 'outNetwork', 'passthrough')
+# YUV frame types and the OpenCV conversion getCvFrame applies to them
+YUV_TYPES = {'NV12': cv2.COLOR_YUV2BGR_NV12,
+             'YUV420p': cv2.COLOR_YUV2BGR_I420}
+# rows of the raw SSD output tensor, as MobileNet-SSD sends it
+SSD_ROWS = 100
+
+
+# class name of a pipeline node, e.g. MobileNetDetectionNetwork. Not
+# getName(), which reports the node's base kind (DetectionNetwork for
+# both MobileNet and YOLO networks in depthai 2.24)
+def _node_type(node):
+    return type(node).__name__
+
+
+# value of a node getter, or `default` when this depthai version has no
+# such getter
+def _property(node, getter, default):
+    method = getattr(node, getter, None)
+    return default if method is None else method()
+
+
+# (frame type, width, height) a camera output sends
+def _frame_format(node, output):
+    if _node_type(node) == 'MonoCamera':
+        if output != 'out':
+            raise ValueError(f'cannot simulate MonoCamera.{output}')
+        width, height = node.getResolutionSize()
+        return 'RAW8', width, height
+    if output == 'preview':
+        width, height = node.getPreviewSize()
+        layout = 'i' if node.getInterleaved() else 'p'
+        return f'{node.getColorOrder().name}888{layout}', width, height
+    if output == 'video':
+        width, height = node.getVideoSize()
+        return 'NV12', width, height
+    if output == 'isp':
+        width, height = node.getIspSize()
+        return 'YUV420p', width, height
+    raise ValueError(f'cannot simulate ColorCamera.{output}')
+
+
+# the flat pixel buffers of `count` synthetic frames: a blurred noise
+# texture, scrolled a few pixels further on every frame, in the layout of
+# `typeName`
+def synthetic_frames(typeName, width, height, count, seed=0):
+    rng = np.random.default_rng(seed)
+    texture = cv2.GaussianBlur(
+        rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8),
+        (0, 0), 2)
+    frames = []
+    for i in range(count):
+        bgr = np.roll(texture, 4 * i, axis=1)
+        if typeName in PLANAR_TYPES or typeName in INTERLEAVED_TYPES:
+            if typeName.startswith('RGB'):
+                bgr = bgr[..., ::-1]
+            frame = bgr.transpose(2, 0, 1) if typeName in PLANAR_TYPES \
+                else bgr
+        elif typeName in GRAY_TYPES:
+            frame = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        else:
+            frame = cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV_I420)
+            if typeName == 'NV12':
+                # interleave the U and V planes that follow the Y plane
+                chroma = frame[height:].reshape(2, -1)
+                frame = np.concatenate(
+                    (frame[:height].reshape(-1), chroma.T.reshape(-1)))
+        frames.append(np.ascontiguousarray(frame).reshape(-1))
+    return frames
+
+
+# simulated counterpart of dai.ImgFrame. The pixel buffer is shared with
+# the device's frame patterns, like a replayed frame it must not be
+# written to; getCvFrame hands out a fresh BGR frame
+class SimulatedImgFrame:
+    def __init__(self, data, typeName, width, height, timestamp,
+                 sequenceNum):
+        self.data = data
+        self.typeName = typeName
+        self.width = width
+        self.height = height
+        self.timestamp = timestamp
+        self.sequenceNum = sequenceNum
+
+    def getData(self):
+        return self.data
+
+    def getType(self):
+        return SimpleNamespace(name=self.typeName)
+
+    def getWidth(self):
+        return self.width
+
+    def getHeight(self):
+        return self.height
+
+    def getFrame(self):
+        if self.typeName in YUV_TYPES:
+            return self.data.reshape(self.height * 3 // 2, self.width)
+        if self.typeName in INTERLEAVED_TYPES:
+            return self.data.reshape(self.height, self.width, 3)
+        return FrameView(self).planar
+
+    def getCvFrame(self):
+        if self.typeName in YUV_TYPES:
+            return cv2.cvtColor(self.getFrame(), YUV_TYPES[self.typeName])
+        return FrameView(self).bgr()
+
+    def getSequenceNum(self):
+        return self.sequenceNum
+
+    def getTimestamp(self):
+        return datetime.timedelta(seconds=self.timestamp)
+
+
+# simulated counterpart of dai.NNData, holding named output tensors
+class SimulatedNNData:
+    def __init__(self, layers, timestamp, sequenceNum):
+        self.timestamp = timestamp
+        self.sequenceNum = sequenceNum
+        # like the device, the layers are stored as fp16 in one byte
+        # buffer, each located by the offset and dims of its tensor
+        self.tensors = []
+        chunks, offset = [], 0
+        for name, values in layers.items():
+            values = np.ascontiguousarray(values, dtype=np.float16)
+            self.tensors.append(SimpleNamespace(
+                name=name, offset=offset, dims=list(values.shape),
+                dataType=SimpleNamespace(name='FP16')))
+            chunks.append(values.view(np.uint8).ravel())
+            offset += values.nbytes
+        self.data = np.concatenate(chunks)
+
+    def getAllLayerNames(self):
+        return [tensor.name for tensor in self.tensors]
+
+    def getRaw(self):
+        return SimpleNamespace(tensors=list(self.tensors))
+
+    def getData(self):
+        return self.data
+
+    # like the device, the values come back as a list of floats
+    def getLayerFp16(self, name):
+        for tensor in self.tensors:
+            if tensor.name == name:
+                return np.frombuffer(
+                    self.data, dtype=np.float16,
+                    count=int(np.prod(tensor.dims)), offset=tensor.offset
+                ).astype(np.float32).tolist()
+        return []
+
+    def getFirstLayerFp16(self):
+        return self.getLayerFp16(next(iter(self.layers)))
+
+    def getSequenceNum(self):
+        return self.sequenceNum
+
+    def getTimestamp(self):
+        return datetime.timedelta(seconds=self.timestamp)
+
+
+# objects moving through the simulated scene. Every object has a class, a
+# box size and a constant velocity and bounces off the frame borders; its
+# confidence wavers around a base value, now and then under NN_THRESHOLD.
+# The scene at a frame depends only on the frame's sequence number, so the
+# detections of a frame are the same whenever the network gets to it
+class SimulatedScene:
+    def __init__(self, objects=config.SIMULATED_OBJECTS, seed=0):
+        rng = np.random.default_rng(seed)
+        self.labels = rng.integers(1, len(config.CLASS_LABELS), objects)
+        self.sizes = rng.uniform(0.15, 0.35, (objects, 2))
+        self.starts = rng.uniform(0.0, 2.0, (objects, 2))
+        self.speeds = rng.uniform(-0.02, 0.02, (objects, 2))
+        self.confidences = rng.uniform(0.55, 0.95, objects)
+        self.phases = rng.uniform(0.0, 2 * np.pi, objects)
+
+    # (N, 6) float32 rows of (label, confidence, xmin, ymin, xmax, ymax)
+    # of the objects in frame `sequenceNum`
+    def detections(self, sequenceNum):
+        travel = (self.starts + self.speeds * sequenceNum) % 2.0
+        corner = np.where(travel > 1.0, 2.0 - travel, travel) * (
+            1.0 - self.sizes)
+        confidence = np.clip(self.confidences + 0.1 * np.sin(
+            0.2 * sequenceNum + self.phases), 0.0, 1.0)
+        return np.column_stack((self.labels, confidence, corner,
+                                corner + self.sizes)).astype(np.float32)
+
+    # the same objects as the flat raw SSD output tensor: (image_id, label,
+    # confidence, xmin, ymin, xmax, ymax) rows, padded with image_id -1
+    def ssdOutput(self, sequenceNum):
+        rows = self.detections(sequenceNum)[:SSD_ROWS]
+        tensor = np.zeros((SSD_ROWS, SSD_FIELDS), dtype=np.float32)
+        tensor[len(rows):, 0] = -1.0
+        tensor[:len(rows), 1:] = rows
+        return tensor.reshape(-1)
+
+
+# one simulated output queue, with the dai.DataOutputQueue interface (get,
+# tryGet, tryGetAll, has). Messages are pushed by the device thread under
+# the device's condition
+class SimulatedQueue:
+    def __init__(self, name, device, maxSize, blocking):
+        self.name = name
+        self.device = device
+        self.maxSize = maxSize
+        self.blocking = blocking
+        # (arrival number, message) pairs, the arrival number ordering the
+        # messages of all the queues for getQueueEvent
+        self.messages = deque()
+        # messages sent to the queue, read by the host and overwritten
+        # before the host read them
+        self.sent = 0
+        self.read = 0
+        self.dropped = 0
+
+    def getName(self):
+        return self.name
+
+    def getMaxSize(self):
+        return self.maxSize
+
+    def getBlocking(self):
+        return self.blocking
+
+    # device side: False if the queue is blocking and full, the sender
+    # then retries once the host made room
+    def _push(self, message):
+        if len(self.messages) >= self.maxSize:
+            if self.blocking:
+                return False
+            self.messages.popleft()
+            self.dropped += 1
+        self.device.arrivals += 1
+        self.messages.append((self.device.arrivals, message))
+        self.sent += 1
+        return True
+
+    def _pop(self, count):
+        # a full blocking queue may be stalling the device
+        if self.blocking and len(self.messages) >= self.maxSize:
+            self.device.condition.notify_all()
+        messages = [self.messages.popleft()[1] for _ in range(count)]
+        self.read += count
+        return messages
+
+    def has(self):
+        with self.device.condition:
+            return bool(self.messages)
+
+    def tryGet(self):
+        with self.device.condition:
+            return self._pop(1)[0] if self.messages else None
+
+    def tryGetAll(self):
+        with self.device.condition:
+            return self._pop(len(self.messages))
+
+    def get(self):
+        with self.device.condition:
+            while not self.messages:
+                if self.device.closing or self.device.finished:
+                    raise RuntimeError(
+                        f"Simulated device closed, stream '{self.name}' "
+                        f"has no more messages")
+                self.device.condition.wait()
+            return self._pop(1)[0]
+
+
+# a camera node: its frame patterns per output and what each output feeds
+# (stream names and networks)
+class SimulatedCamera:
+    def __init__(self, node, fps, patterns, seed):
+        self.node = node
+        self.name = f'{_node_type(node)}{node.id}'
+        self.fps = fps
+        self.patternCount = patterns
+        self.seed = seed
+        self.formats = {}
+        self.patterns = {}
+        self.targets = {}
+        # next sensor frame, frames sent and frames lost while stalled
+        self.index = 0
+        self.captured = 0
+        self.stalled = 0
+        self.pending = []
+
+    def addTarget(self, output, target):
+        if output not in self.formats:
+            self.formats[output] = _frame_format(self.node, output)
+            self.patterns[output] = synthetic_frames(
+                *self.formats[output], self.patternCount, self.seed)
+        self.targets.setdefault(output, []).append(target)
+
+    def captureTime(self, device, index):
+        return device.startTime + index / self.fps
+
+    # send every frame due at `now`; returns the time of the next one
+    def step(self, device, now):
+        if self.pending:
+            self.pending = device._deliver(self.pending)
+            if self.pending:
+                return float('inf')
+            # the sensor frames that came due while the pipeline was stalled
+            # were never captured
+            dueIndex = int((now - device.startTime) * self.fps) + 1
+            if dueIndex > self.index:
+                self.stalled += dueIndex - self.index
+                self.index = dueIndex
+        while not device.exhausted(self.captured):
+            timestamp = self.captureTime(device, self.index)
+            if timestamp > now:
+                return timestamp
+            self.capture(device, timestamp)
+            if self.pending:
+                return float('inf')
+        return float('inf')
+
+    def capture(self, device, timestamp):
+        for output, targets in self.targets.items():
+            patterns = self.patterns[output]
+            typeName, width, height = self.formats[output]
+            frame = SimulatedImgFrame(
+                patterns[self.index % len(patterns)], typeName, width,
+                height, timestamp, self.index)
+            for target in targets:
+                if isinstance(target, str):
+                    self.pending += device._deliver([(target, frame)])
+                else:
+                    target.submit(frame)
+        self.index += 1
+        self.captured += 1
+
+    def isIdle(self):
+        return not self.pending
+
+    def stats(self):
+        return {'fps': self.fps, 'captured': self.captured,
+                'stalled': self.stalled}
+
+
+# a detection (or plain SSD NeuralNetwork) node fed by a camera output
+class SimulatedNetwork:
+    def __init__(self, node, scene, inferenceTime):
+        self.node = node
+        self.name = f'{_node_type(node)}{node.id}'
+        self.scene = scene
+        self.inferenceTime = inferenceTime
+        # a plain NeuralNetwork sends the raw tensor on `out`, decoded and
+        # thresholded on the host
+        self.raw = _node_type(node) == 'NeuralNetwork'
+        self.threshold = 0.0 if self.raw else _property(
+            node, 'getConfidenceThreshold', config.NN_THRESHOLD)
+        queueSize = _property(getattr(node, 'input', None), 'getQueueSize', 1)
+        self.waiting = deque(maxlen=max(1, queueSize))
+        self.targets = {}
+        self.current = None
+        self.doneTime = 0.0
+        self.pending = []
+        self.inferences = 0
+        self.skipped = 0
+
+    def addTarget(self, output, target):
+        if output not in NETWORK_OUTPUTS or (self.raw
+                                             and output == 'outNetwork'):
+            raise ValueError(f'cannot simulate {_node_type(self.node)}.'
+                             f'{output}')
+        self.targets.setdefault(output, []).append(target)
+
+    # a frame arrives on the network input, overwriting the oldest waiting
+    # one when the input queue is full
+    def submit(self, frame):
+        if len(self.waiting) == self.waiting.maxlen:
+            self.skipped += 1
+        self.waiting.append(frame)
+
+    # send the results of every inference finished at `now`; returns the
+    # time the current one finishes
+    def step(self, device, now):
+        if self.pending:
+            self.pending = device._deliver(self.pending)
+            if self.pending:
+                return float('inf')
+        while True:
+            if self.current is None:
+                if not self.waiting:
+                    return float('inf')
+                self.current = self.waiting.popleft()
+                self.doneTime = max(self.doneTime, self.current.timestamp) \
+                    + self.inferenceTime
+            if self.doneTime > now:
+                return self.doneTime
+            self.pending = device._deliver(self.results(self.current))
+            self.current = None
+            self.inferences += 1
+            if self.pending:
+                return float('inf')
+
+    def results(self, frame):
+        seq, timestamp = frame.sequenceNum, frame.timestamp
+        tensor = None
+        if self.raw or 'outNetwork' in self.targets:
+            tensor = SimulatedNNData(
+                {config.SSD_OUTPUT_LAYER: self.scene.ssdOutput(seq)},
+                timestamp, seq)
+        messages = {'passthrough': frame, 'outNetwork': tensor,
+                    'out': tensor}
+        if not self.raw and 'out' in self.targets:
+            rows = self.scene.detections(seq)
+            messages['out'] = ReplayImgDetections(
+                rows[rows[:, 1] >= self.threshold], timestamp, seq)
+        return [(stream, messages[output])
+                for output, streams in self.targets.items()
+                for stream in streams]
+
+    def isIdle(self):
+        return self.current is None and not self.waiting and not self.pending
+
+    def stats(self):
+        return {'inferences': self.inferences, 'skipped': self.skipped}
+
+
+# FrameSource running `pipeline` on a simulated device (see above). The
+# cameras start capturing when the device is created, like dai.Device
+# starting the pipeline. `fps` overrides the FPS of every camera, and with
+# `maxFrames` the cameras stop after that many frames: the device then
+# closes once the host has read everything, so a host loop ends on its
+# own like on a replayed recording. Raises ValueError for pipelines with
+# nodes it cannot simulate
+class SimulatedDevice(FrameSource):
+    def __init__(self, pipeline, fps=None, maxFrames=None,
+                 objects=config.SIMULATED_OBJECTS,
+                 inferenceTime=config.SIMULATED_INFERENCE_TIME,
+                 patterns=config.SIMULATED_FRAME_PATTERNS, seed=0,
+                 mxId='simulated'):
+        self.maxFrames = maxFrames
+        self.mxId = mxId
+        self.scene = SimulatedScene(objects, seed)
+        self.cameras = {}
+        self.networks = {}
+        self.streams = []
+
+        # trace every XLinkOut stream back to the output feeding it
+        nodes = {node.id: node for node in pipeline.getAllNodes()}
+        self.inputs = {}
+        for connection in pipeline.getConnections():
+            self.inputs.setdefault(connection.inputId, (
+                connection.outputId, connection.outputName))
+        for node in nodes.values():
+            if _node_type(node) != 'XLinkOut':
+                continue
+            stream = node.getStreamName()
+            if node.id not in self.inputs:
+                raise ValueError(f"stream '{stream}' is not linked")
+            producer, output = self._producer(nodes, *self.inputs[node.id],
+                                              fps, patterns, inferenceTime,
+                                              seed)
+            producer.addTarget(output, stream)
+            self.streams.append(stream)
+        if not self.cameras:
+            raise ValueError('the pipeline has no camera to simulate')
+
+        # everything below is shared with the device thread and guarded by
+        # the condition, which also wakes up both sides
+        self.condition = threading.Condition()
+        self.queues = {}
+        self.arrivals = 0
+        self.closing = False
+        self.finished = False
+        self.producerCpu = 0.0
+        self.startTime = time.monotonic()
+        self.thread = threading.Thread(target=self._run, daemon=True,
+                                       name=f'simulated-{mxId}')
+        self.thread.start()
+
+    # the simulated node behind output `output` of node `nodeId`
+    def _producer(self, nodes, nodeId, output, fps, patterns, inferenceTime,
+                  seed):
+        node = nodes[nodeId]
+        nodeType = _node_type(node)
+        if nodeType in CAMERA_TYPES:
+            if nodeId not in self.cameras:
+                self.cameras[nodeId] = SimulatedCamera(
+                    node, fps or _property(node, 'getFps', config.CAMERA_FPS),
+                    patterns, seed + len(self.cameras))
+            return self.cameras[nodeId], output
+        if nodeType in NETWORK_TYPES:
+            if nodeId not in self.networks:
+                if nodeId not in self.inputs:
+                    raise ValueError(f'{nodeType} input is not linked')
+                camera, cameraOutput = self._producer(
+                    nodes, *self.inputs[nodeId], fps, patterns,
+                    inferenceTime, seed)
+                if not isinstance(camera, SimulatedCamera):
+                    raise ValueError(f'cannot simulate {nodeType} fed by '
+                                     f'{_node_type(camera.node)}')
+                self.networks[nodeId] = SimulatedNetwork(
+                    node, self.scene, inferenceTime)
+                camera.addTarget(cameraOutput, self.networks[nodeId])
+            return self.networks[nodeId], output
+        raise ValueError(f'cannot simulate {nodeType} nodes')
+
+    def getOutputQueueNames(self):
+        return list(self.streams)
+
+    def getOutputQueue(self, name, maxSize=16, blocking=True):
+        if name not in self.streams:
+            raise RuntimeError(f"Queue for stream name '{name}' doesn't "
+                               f"exist")
+        with self.condition:
+            if name not in self.queues:
+                self.queues[name] = SimulatedQueue(name, self, maxSize,
+                                                   blocking)
+            return self.queues[name]
+
+    # device side: push the (stream, message) pairs into their queues and
+    # return the ones a full blocking queue refused. Messages of streams
+    # the host never opened are discarded
+    def _deliver(self, messages):
+        refused = []
+        for stream, message in messages:
+            queue = self.queues.get(stream)
+            if queue is not None and not queue._push(message):
+                refused.append((stream, message))
+        return refused
+
+    def exhausted(self, captured):
+        return self.maxFrames is not None and captured >= self.maxFrames
+
+    # device thread: step the cameras, then the networks they fed, and
+    # sleep until the next frame or inference is due or the host frees a
+    # blocking queue
+    def _run(self):
+        start = time.thread_time()
+        producers = list(self.cameras.values()) + list(self.networks.values())
+        with self.condition:
+            while not self.closing:
+                wake = min(p.step(self, time.monotonic()) for p in producers)
+                if self.maxFrames is not None and all(
+                        self.exhausted(c.captured)
+                        for c in self.cameras.values()) and all(
+                        p.isIdle() for p in producers):
+                    self.finished = True
+                self.condition.notify_all()
+                self.producerCpu = time.thread_time() - start
+                if self.finished or wake == float('inf'):
+                    self.condition.wait()
+                else:
+                    self.condition.wait(max(0.0, wake - time.monotonic()))
+
+    # counterpart of dai.Device.getQueueEvent: wait until one of the named
+    # queues has a message and return its name, the queue holding the
+    # oldest message first, or return an empty string once `timeout` (a
+    # timedelta or seconds) elapses or the device closed
+    def getQueueEvent(self, queueNames, timeout=None):
+        if isinstance(timeout, datetime.timedelta):
+            timeout = timeout.total_seconds()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                pending = [(self.queues[name].messages[0][0], name)
+                           for name in queueNames
+                           if name in self.queues
+                           and self.queues[name].messages]
+                if pending:
+                    return min(pending)[1]
+                if self.closing or self.finished:
+                    return ''
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0.0:
+                        return ''
+                self.condition.wait(remaining)
+
+    # the device clock: capture timestamps are host monotonic times, like
+    # the synced timestamps of a real device
+    def clockNow(self):
+        return datetime.timedelta(seconds=time.monotonic())
+
+    def isClosed(self):
+        with self.condition:
+            return self.closing or (self.finished and not any(
+                q.messages for q in self.queues.values()))
+
+    def close(self):
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        if self.thread.is_alive() and \
+                self.thread is not threading.current_thread():
+            self.thread.join()
+
+    # per-stream counters of the output queues (sent, read by the host,
+    # dropped because the host queue was full), per-camera frames captured
+    # and lost while stalled, per-network inferences and frames skipped
+    # while busy, and the CPU seconds the device thread itself used
+    def stats(self):
+        with self.condition:
+            return {
+                'streams': {
+                    name: {'sent': q.sent, 'read': q.read,
+                           'dropped': q.dropped, 'queued': len(q.messages)}
+                    for name, q in self.queues.items()
+                },
+                'cameras': {c.name: c.stats() for c in self.cameras.values()},
+                'networks': {n.name: n.stats()
+                             for n in self.networks.values()},
+                'producerCpu': round(self.producerCpu, 3),
+            }
+
+    # stand-ins for the device information the demos print on startup
+    def getConnectedCameras(self):
+        return [_property(c.node, 'getBoardSocket', c.name)
+                for c in self.cameras.values()]
+
+    def getUsbSpeed(self):
+        return SimpleNamespace(name='SIMULATED')
+
+    def getDeviceInfo(self):
+        return SimpleNamespace(getMxId=lambda: self.mxId)
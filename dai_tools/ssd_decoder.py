@@ -0,0 +1,110 @@
+# import the necessary packages
+from dai_tools import config
+from types import SimpleNamespace
+import numpy as np
+
+# columns of a decoded SSD detection array, as laid out in the raw
+# MobileNet-SSD `detection_out` tensor of shape (1, 1, N, 7)
+SSD_FIELDS = 7
+IMAGE_ID, LABEL, CONFIDENCE, XMIN, YMIN, XMAX, YMAX = range(SSD_FIELDS)
+
+
+# per-class confidence thresholds as an array indexed by label: `default`
+# everywhere, overridden by the {class name: threshold} in `overrides`
+def class_threshold_array(default=config.NN_THRESHOLD,
+                          overrides=config.CLASS_THRESHOLDS,
+                          labels=config.CLASS_LABELS):
+    thresholds = np.full(len(labels), default, dtype=np.float32)
+    for name, threshold in overrides.items():
+        thresholds[labels.index(name)] = threshold
+    return thresholds
+
+
+# mask of the rows of an (N, 7) detection array whose confidence reaches
+# the threshold of their class. Rows with a label outside `thresholds`
+# (negative, or past the last class of a mismatched blob) are masked out
+# rather than judged against another class's threshold and passed on to
+# code indexing the class labels
+def threshold_mask(detections, thresholds):
+    labels = detections[:, LABEL].astype(np.intp)
+    mask = (labels >= 0) & (labels < len(thresholds))
+    mask[mask] = (detections[mask, CONFIDENCE]
+                  >= thresholds[labels[mask]])
+    return mask
+
+
+# decode the flat MobileNet-SSD output (the list from
+# NNData.getLayerFp16(...) or an fp16/fp32 array) into an (N, 7) float32
+# array of (image_id, label, confidence, xmin, ymin, xmax, ymax) rows. Rows
+# past the first negative image_id are padding; the rest are thresholded
+# in bulk against `thresholds` indexed by label (see threshold_mask)
+def decode_ssd_output(values, thresholds=None):
+    if thresholds is None:
+        thresholds = class_threshold_array()
+    if isinstance(values, list):
+        # fromiter is about twice as fast as asarray on a list of floats
+        values = np.fromiter(values, dtype=np.float32, count=len(values))
+    raw = np.asarray(values, dtype=np.float32).reshape(-1, SSD_FIELDS)
+    end = np.flatnonzero(raw[:, IMAGE_ID] < 0)
+    if end.size:
+        raw = raw[:end[0]]
+    return raw[threshold_mask(raw, thresholds)]
+
+
+# (N, 7) detection array from the `detections` of an ImgDetections message,
+# so device-side detections go through the same host post-processing
+def detections_to_array(detections):
+    array = np.zeros((len(detections), SSD_FIELDS), dtype=np.float32)
+    for i, d in enumerate(detections):
+        array[i, LABEL:] = (d.label, d.confidence, d.xmin, d.ymin, d.xmax,
+                            d.ymax)
+    return array
+
+
+# ImgDetections-shaped message built on the host from a raw NNData (or
+# device ImgDetections) message: `array` holds the (N, 7) detections and
+# `detections` the same rows as objects with label, confidence, xmin,
+# ymin, xmax and ymax
+class DecodedDetections:
+    def __init__(self, inNN, array):
+        self.inNN = inNN
+        self.array = array
+        self.detections = [
+            SimpleNamespace(
+                label=int(row[LABEL]), confidence=float(row[CONFIDENCE]),
+                xmin=float(row[XMIN]), ymin=float(row[YMIN]),
+                xmax=float(row[XMAX]), ymax=float(row[YMAX]),
+            ) for row in array
+        ]
+
+    def getSequenceNum(self):
+        return self.inNN.getSequenceNum()
+
+    def getTimestamp(self):
+        return self.inNN.getTimestamp()
+
+
+# values of the fp16 layer `layer` of an NNData message. A device message
+# keeps all its layers in one byte buffer, each located by the offset and
+# dims of its tensor, so the layer's bytes are sliced out of that buffer
+# and viewed as fp16 instead of going through the Python list of floats
+# getLayerFp16 builds (the slice is only copied when getData returns a
+# non-contiguous view). Messages without the raw buffer, or a layer of
+# another data type or cut short, go through getLayerFp16
+def nn_layer_values(inNN, layer=config.SSD_OUTPUT_LAYER):
+    getRaw = getattr(inNN, 'getRaw', None)
+    if getRaw is not None:
+        for tensor in getRaw().tensors:
+            if tensor.name != layer or tensor.dataType.name != 'FP16':
+                continue
+            size = 2 * int(np.prod(tensor.dims))
+            data = inNN.getData()[tensor.offset:tensor.offset + size]
+            if len(data) == size:
+                return np.ascontiguousarray(data).view(np.float16)
+    return inNN.getLayerFp16(layer)
+
+
+# decode the SSD output layer of an NNData message
+def decode_nn_data(inNN, thresholds=None, layer=config.SSD_OUTPUT_LAYER):
+    return DecodedDetections(
+        inNN, decode_ssd_output(nn_layer_values(inNN, layer), thresholds))
@@ -0,0 +1,212 @@
+# import the necessary packages
+from dai_tools import config
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import cv2
+
+
+# rectification of a left/right mono pair. The undistort/rectify maps are
+# computed once from the stereo calibration and kept as fixed-point
+# (CV_16SC2) tables, so each frame only costs two cv2.remap calls. With a
+# RectificationMapCache (and the device MxID as key) the tables are read
+# from disk instead, and computed only the first time
+class StereoRectifier:
+    def __init__(self, leftK, leftD, rightK, rightD, R, T, size, cache=None,
+                 mxId=None):
+        self.size = tuple(size)
+        leftK, leftD, rightK, rightD, R = (
+            np.asarray(a, dtype=np.float64)
+            for a in (leftK, leftD, rightK, rightD, R))
+        T = np.asarray(T, dtype=np.float64).reshape(3, 1)
+        R1, R2, P1, P2, self.Q, _, _ = cv2.stereoRectify(
+            leftK, leftD, rightK, rightD, self.size, R, T, alpha=0)
+
+        if cache is None:
+            self.leftMaps = cv2.initUndistortRectifyMap(
+                leftK, leftD, R1, P1, self.size, cv2.CV_16SC2)
+            self.rightMaps = cv2.initUndistortRectifyMap(
+                rightK, rightD, R2, P2, self.size, cv2.CV_16SC2)
+        else:
+            import depthai as dai
+            self.leftTable = cache.get(
+                mxId, dai.CameraBoardSocket.LEFT, self.size,
+                leftK, leftD, R1, P1)
+            self.rightTable = cache.get(
+                mxId, dai.CameraBoardSocket.RIGHT, self.size,
+                rightK, rightD, R2, P2)
+
+        # focal length of the rectified pair in pixels and the baseline in
+        # the units of T, what disparity_to_depth needs
+        self.focal = float(P1[0, 0])
+        self.baseline = float(np.abs(T[0, 0]))
+
+    # build the rectifier from the dai.CalibrationHandler stored on the
+    # device (device.readCalibration()) for frames of `size` (width,
+    # height). The baseline is in centimeters, as stored by the device
+    @classmethod
+    def from_calibration(cls, calibration, size, cache=None, mxId=None):
+        import depthai as dai
+        width, height = size
+        left, right = dai.CameraBoardSocket.LEFT, dai.CameraBoardSocket.RIGHT
+        extrinsics = np.array(calibration.getCameraExtrinsics(left, right))
+        return cls(
+            calibration.getCameraIntrinsics(left, width, height),
+            calibration.getDistortionCoefficients(left),
+            calibration.getCameraIntrinsics(right, width, height),
+            calibration.getDistortionCoefficients(right),
+            extrinsics[:3, :3], extrinsics[:3, 3], size, cache, mxId,
+        )
+
+    # the tables of a cache are only loaded on the first frame
+    def __getattr__(self, attr):
+        if attr == 'leftMaps':
+            return self.leftTable.maps
+        if attr == 'rightMaps':
+            return self.rightTable.maps
+        raise AttributeError(attr)
+
+    def rectify(self, left, right):
+        return (
+            cv2.remap(left, *self.leftMaps, cv2.INTER_LINEAR),
+            cv2.remap(right, *self.rightMaps, cv2.INTER_LINEAR),
+        )
+
+
+def create_stereo_matcher(algorithm=config.STEREO_ALGORITHM,
+                          numDisparities=config.STEREO_NUM_DISPARITIES,
+                          blockSize=config.STEREO_BLOCK_SIZE):
+    if algorithm == 'bm':
+        return cv2.StereoBM_create(numDisparities, blockSize)
+    if algorithm == 'sgbm':
+        return cv2.StereoSGBM_create(
+            0, numDisparities, blockSize,
+            P1=8 * blockSize * blockSize, P2=32 * blockSize * blockSize,
+            uniquenessRatio=10, speckleWindowSize=100, speckleRange=2,
+        )
+    raise ValueError(f'unknown stereo algorithm {algorithm!r}')
+
+
+# disparity of a rectified pair computed as `stripes` horizontal stripes on
+# a pool of `workers` threads. cv2 releases the GIL while matching, so the
+# stripes run on separate cores. Each stripe is matched with `margin` extra
+# rows above and below that are cropped afterwards, so the block window
+# (and most of the SGBM path aggregation) sees the same neighbourhood as a
+# full-frame match. Every stripe has its own matcher instance since a
+# cv2.StereoMatcher must not be used from several threads at once
+class StripedStereoMatcher:
+    def __init__(self, stripes=config.STEREO_STRIPES,
+                 workers=config.STEREO_WORKERS,
+                 algorithm=config.STEREO_ALGORITHM,
+                 numDisparities=config.STEREO_NUM_DISPARITIES,
+                 blockSize=config.STEREO_BLOCK_SIZE, margin=None):
+        self.stripes = stripes
+        self.workers = workers
+        self.numDisparities = numDisparities
+        self.margin = max(blockSize, 16) if margin is None else margin
+        self.matchers = [
+            create_stereo_matcher(algorithm, numDisparities, blockSize)
+            for _ in range(stripes)
+        ]
+        self.pool = None
+        if workers > 1 and stripes > 1:
+            self.pool = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix='stereo')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def _match(self, i, left, right, out, bounds):
+        start, stop = bounds[i], bounds[i + 1]
+        top = max(start - self.margin, 0)
+        bottom = min(stop + self.margin, left.shape[0])
+        disparity = self.matchers[i].compute(
+            left[top:bottom], right[top:bottom])
+        out[start:stop] = disparity[start - top:stop - top]
+
+    # float32 disparity in pixels for a rectified grayscale pair; pixels
+    # without a valid match are 0
+    def compute(self, left, right):
+        height = left.shape[0]
+        bounds = np.linspace(0, height, self.stripes + 1).astype(int)
+        fixed = np.empty(left.shape[:2], dtype=np.int16)
+        if self.pool is None:
+            for i in range(self.stripes):
+                self._match(i, left, right, fixed, bounds)
+        else:
+            futures = [
+                self.pool.submit(self._match, i, left, right, fixed, bounds)
+                for i in range(self.stripes)
+            ]
+            for future in futures:
+                future.result()
+
+        # the matchers return 4-bit fixed point disparities, negative where
+        # no match was found
+        disparity = fixed.astype(np.float32)
+        disparity *= 1.0 / 16.0
+        np.maximum(disparity, 0.0, out=disparity)
+        return disparity
+
+
+# depth (in the units of `baseline`) from a disparity map, 0 where the
+# disparity is invalid
+def disparity_to_depth(disparity, focal, baseline):
+    depth = np.zeros_like(disparity, dtype=np.float32)
+    valid = disparity > 0
+    depth[valid] = focal * baseline / disparity[valid]
+    return depth
+
+
+# colour-mapped disparity for cv2.imshow
+def colorizeDisparity(disparity,
+                      numDisparities=config.STEREO_NUM_DISPARITIES):
+    scaled = cv2.convertScaleAbs(disparity, alpha=255.0 / numDisparities)
+    return cv2.applyColorMap(scaled, cv2.COLORMAP_JET)
+
+
+# host depth stage fed with left/right mono frames: rectifies the pair
+# when a rectifier is given (frames of recordings without calibration are
+# assumed rectified already), then runs the striped matcher
+class StereoDepth:
+    def __init__(self, rectifier=None, **matcherOptions):
+        self.rectifier = rectifier
+        self.matcher = StripedStereoMatcher(**matcherOptions)
+
+    # the stage for a frame source: the calibration is read from the
+    # device when it has one, and its rectification tables are taken from
+    # `cache` (if any) under the device MxID
+    @classmethod
+    def from_device(cls, device, size, cache=None, **matcherOptions):
+        rectifier = None
+        if hasattr(device, 'readCalibration'):
+            rectifier = StereoRectifier.from_calibration(
+                device.readCalibration(), size, cache,
+                device.getDeviceInfo().getMxId())
+        return cls(rectifier, **matcherOptions)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.matcher.close()
+
+    def disparity(self, left, right):
+        if self.rectifier is not None:
+            left, right = self.rectifier.rectify(left, right)
+        return self.matcher.compute(left, right)
+
+    # depth in centimeters, only available with a calibrated rectifier
+    def depth(self, disparity):
+        return disparity_to_depth(
+            disparity, self.rectifier.focal, self.rectifier.baseline)
@@ -0,0 +1,148 @@
+# import the necessary packages
+from dai_tools import config
+from dai_tools.queue_consumer import QueueConsumer
+from dai_tools.sync import MessageSynchronizer
+from dai_tools.frame_view import FrameView
+from collections import deque
+import functools
+import asyncio
+
+# how bundles are handed out when the code iterating falls behind: 'none'
+# yields every bundle, 'latest' only the newest of those that completed
+# while the previous one was being processed
+DROP_POLICIES = ('none', 'latest')
+
+
+# the messages of one or more streams that belong together (same sequence
+# number), with typed access to what the demos need from them
+class MessageBundle:
+    def __init__(self, messages):
+        self.messages = messages
+        self._frame = None
+
+    def __getitem__(self, stream):
+        return self.messages[stream]
+
+    def __contains__(self, stream):
+        return stream in self.messages
+
+    def streams(self):
+        return list(self.messages)
+
+    @property
+    def sequenceNum(self):
+        return next(iter(self.messages.values())).getSequenceNum()
+
+    # device timestamp of every message, in seconds
+    @property
+    def timestamps(self):
+        return {stream: message.getTimestamp().total_seconds()
+                for stream, message in self.messages.items()}
+
+    # FrameView of the first image message (see frame_view.py), or None
+    @property
+    def frame(self):
+        if self._frame is None:
+            for message in self.messages.values():
+                if hasattr(message, 'getType') and hasattr(message,
+                                                           'getWidth'):
+                    self._frame = FrameView(message)
+                    break
+        return self._frame
+
+    # detections of the first detection message, or None
+    @property
+    def detections(self):
+        for message in self.messages.values():
+            if hasattr(message, 'detections'):
+                return message.detections
+        return None
+
+
+# iterable over the output queues of a device (or any frame source) that
+# yields MessageBundles, for host logic written as a chain of generator
+# stages instead of a hand-written `while True` loop. With `sync` (and
+# more than one stream) a bundle holds one message of every stream with
+# the same sequence number (see sync.py), otherwise every message is a
+# bundle of its own. The queues are read by a QueueConsumer, so
+# `queueOptions` sets maxSize/blocking and the drain policy per stream as
+# for the demos. `drop` is the bundle-level drop policy (DROP_POLICIES).
+# Iteration ends when the device closes or `stop()` returns True. Both
+# `for` and `async for` work; the async form waits for the queues on an
+# executor thread so the event loop keeps running
+class MessageStream:
+    def __init__(self, device, streams, sync=True, drop='none',
+                 queueOptions=None, stop=lambda: False, timeout=0.1,
+                 syncSize=config.SYNC_BUFFER_SIZE):
+        if drop not in DROP_POLICIES:
+            raise ValueError(f'drop must be one of {DROP_POLICIES}, '
+                             f'not {drop!r}')
+        self.device = device
+        self.streams = tuple(streams)
+        self.drop = drop
+        self.stop = stop
+        self.synchronizer = None
+        if sync and len(self.streams) > 1:
+            self.synchronizer = MessageSynchronizer(self.streams, syncSize)
+        self.consumer = QueueConsumer(
+            device, {s: functools.partial(self._add, s) for s in self.streams},
+            timeout=timeout, queueOptions=queueOptions)
+        self.pending = deque()
+        self.yielded = 0
+        self.skipped = 0
+
+    def _add(self, stream, message):
+        if self.synchronizer is None:
+            self.pending.append(MessageBundle({stream: message}))
+            return
+        synced = self.synchronizer.add(stream, message)
+        if synced is not None:
+            self.pending.append(MessageBundle(synced))
+
+    # the bundles to hand out next, waiting for at least one; None once
+    # the stream has ended
+    def _next_bundles(self):
+        while not self.pending:
+            if self.device.isClosed() or self.stop():
+                return None
+            self.consumer.poll()
+        bundles = list(self.pending)
+        self.pending.clear()
+        if self.drop == 'latest' and len(bundles) > 1:
+            self.skipped += len(bundles) - 1
+            bundles = bundles[-1:]
+        self.yielded += len(bundles)
+        return bundles
+
+    def __iter__(self):
+        while True:
+            bundles = self._next_bundles()
+            if bundles is None:
+                return
+            yield from bundles
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            bundles = await loop.run_in_executor(None, self._next_bundles)
+            if bundles is None:
+                return
+            for bundle in bundles:
+                yield bundle
+
+    def stats(self):
+        stats = {
+            'bundles': self.yielded,
+            'skipped': self.skipped,
+            'drained': dict(self.consumer.skipped),
+        }
+        if self.synchronizer is not None:
+            stats['sync'] = self.synchronizer.stats()
+        return stats
+
+
+# `for bundle in iter_messages(device, ('rgb', 'nn')):` or
+# `async for bundle in iter_messages(...)`, see MessageStream for the
+# options. The returned stream also reports its counters with stats()
+def iter_messages(device, streams, **options):
+    return MessageStream(device, streams, **options)
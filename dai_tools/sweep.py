@@ -0,0 +1,186 @@
+# import the necessary packages
+from dai_tools import config
+from dai_tools.frame_source import DeviceFrameSource, ReplayFrameSource
+from dai_tools.frame_source import save_frames, save_detections
+from dai_tools.pipeline_builder import build_pipeline, graph_path
+from dai_tools.object_detection_mobilenet import object_detection_mobilenet
+from types import SimpleNamespace
+import numpy as np
+import contextlib
+import itertools
+import tempfile
+import json
+import time
+import cv2
+import io
+import os
+
+# the config.py settings a sweep can vary, and the values tried when a
+# grid does not list them
+SWEEP_DEFAULTS = {
+    'COLOR_CAMERA_PREVIEW_SIZE': [config.COLOR_CAMERA_PREVIEW_SIZE],
+    'CAMERA_FPS': [15, 30, config.CAMERA_FPS],
+    'INFERENCE_THREADS': [config.INFERENCE_THREADS],
+    'COLOR_CAMERA_QUEUE_SIZE': [1, config.COLOR_CAMERA_QUEUE_SIZE],
+    'QUEUE_BLOCKING': [False, True],
+}
+
+SWEEP_COLUMNS = ('previewSize', 'fps', 'threads', 'queueSize', 'blocking',
+                 'throughputFps', 'meanLatencyMs', 'p99LatencyMs',
+                 'dropPct', 'cpuPct')
+
+
+# every combination of the settings in `grid`, a mapping from config.py
+# names to lists of values (missing names take SWEEP_DEFAULTS)
+def sweep_grid(grid=None):
+    grid = dict(SWEEP_DEFAULTS, **(grid or {}))
+    names = list(SWEEP_DEFAULTS)
+    for unknown in set(grid) - set(names):
+        raise ValueError(f'{unknown} cannot be swept')
+    return [dict(zip(names, values))
+            for values in itertools.product(*(grid[n] for n in names))]
+
+
+# overrides of pipelines/object_detection.json for one sweep point
+def graph_overrides(settings):
+    width, height = settings['COLOR_CAMERA_PREVIEW_SIZE']
+    return [
+        f'nodes.camRgb.properties.previewSize=[{width},{height}]',
+        f'nodes.camRgb.properties.fps={settings["CAMERA_FPS"]}',
+        f'nodes.nn.properties.numInferenceThreads='
+        f'{settings["INFERENCE_THREADS"]}',
+    ]
+
+
+def queue_options(settings):
+    options = {'maxSize': settings['COLOR_CAMERA_QUEUE_SIZE'],
+               'blocking': settings['QUEUE_BLOCKING']}
+    return {stream: options for stream in ('rgb', 'nn', 'nnNetwork')}
+
+
+# rgb frames and nn detections the host path is fed with when no device
+# is used: read from `recording` (a directory with rgb and nn streams) or
+# made up, `count` frames of noise with `detections` boxes each. The
+# frames are looped over for longer runs
+def _source_streams(recording, count=60, detections=5, seed=0):
+    if recording is not None:
+        with ReplayFrameSource(recording, realtime=False) as source:
+            rgb = source.getOutputQueue('rgb')
+            nn = source.getOutputQueue('nn')
+            frames = [rgb.get().getFrame() for _ in range(
+                min(count, len(source.recordings['rgb']['timestamps'])))]
+            messages = [nn.get().detections for _ in range(len(frames))]
+        return frames, messages
+
+    rng = np.random.default_rng(seed)
+    texture = rng.integers(0, 255, size=(count, 120, 160, 3), dtype=np.uint8)
+    messages = []
+    for _ in range(count):
+        mins = rng.uniform(0.0, 0.7, size=(detections, 2))
+        maxs = mins + rng.uniform(0.05, 0.3, size=(detections, 2))
+        messages.append([
+            SimpleNamespace(label=int(rng.integers(1, 21)),
+                            confidence=float(rng.uniform(0.5, 1.0)),
+                            xmin=mins[i, 0], ymin=mins[i, 1],
+                            xmax=maxs[i, 0], ymax=maxs[i, 1])
+            for i in range(detections)
+        ])
+    return list(texture), messages
+
+
+# write the replay a sweep point runs on: the source frames resized to the
+# preview size and timed at the camera fps, with their detections
+def prepare_replay(directory, settings, frames, detections, duration):
+    fps = settings['CAMERA_FPS']
+    count = int(fps * duration)
+    size = tuple(settings['COLOR_CAMERA_PREVIEW_SIZE'])
+    resized = [cv2.resize(frame, size) for frame in frames]
+    order = [i % len(frames) for i in range(count)]
+    timestamps = np.arange(count) / fps
+    save_frames(directory, 'rgb', [resized[i] for i in order], timestamps,
+                range(count))
+    save_detections(directory, 'nn', [detections[i] for i in order],
+                    timestamps, range(count))
+
+
+# run the object detection host loop once with `settings`, on the device
+# (pipeline built from the graph with the settings applied) or on a
+# real-time replay, and return one row of the sweep table. Frames are
+# converted and annotated as in a displayed run, just not shown
+def run_sweep_point(settings, duration, replayDir=None, graph=None,
+                    **detectionOptions):
+    if replayDir is None:
+        pipeline, _ = build_pipeline(graph, graph_overrides(settings))
+        source = DeviceFrameSource(pipeline)
+    else:
+        source = ReplayFrameSource(replayDir, realtime=True)
+
+    cpuStart = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = object_detection_mobilenet(
+            None, source=source, headless=True, annotate=True,
+            duration=duration,
+            queueOptions=queue_options(settings), **detectionOptions)
+    cpu = time.process_time() - cpuStart
+
+    endToEnd = report['metrics'].stages.get('endToEnd')
+    summary = endToEnd.summary() if endToEnd is not None else {}
+    captured = report['rgbCaptured']
+    dropped = captured - report['sync']['matched']
+    return {
+        'previewSize': 'x'.join(
+            str(v) for v in settings['COLOR_CAMERA_PREVIEW_SIZE']),
+        'fps': settings['CAMERA_FPS'],
+        'threads': settings['INFERENCE_THREADS'],
+        'queueSize': settings['COLOR_CAMERA_QUEUE_SIZE'],
+        'blocking': settings['QUEUE_BLOCKING'],
+        'throughputFps': report['frames'] / report['elapsed'],
+        'meanLatencyMs': summary.get('mean', 0.0) * 1e3,
+        'p99LatencyMs': summary.get('p99', 0.0) * 1e3,
+        'dropPct': dropped / captured * 100 if captured else 0.0,
+        'cpuPct': cpu / report['elapsed'] * 100,
+    }
+
+
+# sweep the object detection host path over `grid` (see sweep_grid),
+# `duration` seconds per point. With `device` each point runs the pipeline
+# of `graph` on the OAK; otherwise the host path is replayed in real time
+# from `recording` (a directory with rgb and nn streams) or from synthetic
+# frames, so only the host-side settings matter: INFERENCE_THREADS then
+# only labels the rows. Rows are printed as they complete and, with
+# `outputPath`, written as CSV (.csv) or JSON
+def run_sweep(grid=None, duration=5.0, device=False, recording=None,
+              graph=graph_path('object_detection'), outputPath=None,
+              **detectionOptions):
+    points = sweep_grid(grid)
+    rows = []
+    print(' '.join(f'{c:>13}' for c in SWEEP_COLUMNS))
+    with tempfile.TemporaryDirectory() as directory:
+        if not device:
+            frames, detections = _source_streams(recording)
+        for i, settings in enumerate(points):
+            replayDir = None
+            if not device:
+                replayDir = os.path.join(directory, str(i))
+                prepare_replay(replayDir, settings, frames, detections,
+                               duration)
+            row = run_sweep_point(settings, duration, replayDir, graph,
+                                  **detectionOptions)
+            rows.append(row)
+            print(' '.join(
+                f'{row[c]:>13.2f}' if isinstance(row[c], float)
+                else f'{str(row[c]):>13}' for c in SWEEP_COLUMNS))
+
+    if outputPath is not None:
+        write_sweep_table(rows, outputPath)
+    return rows
+
+
+def write_sweep_table(rows, path):
+    with open(path, 'w') as f:
+        if path.endswith('.csv'):
+            f.write(','.join(SWEEP_COLUMNS) + '\n')
+            for row in rows:
+                f.write(','.join(str(row[c]) for c in SWEEP_COLUMNS) + '\n')
+        else:
+            json.dump(rows, f, indent=2)
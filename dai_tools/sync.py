@@ -0,0 +1,76 @@
+# import the necessary packages
+from dai_tools import config
+from collections import OrderedDict
+import time
+
+
+# host-side synchronizer pairing messages of several streams (e.g. the
+# `rgb` frames and the `nn` detections computed on them) by their
+# getSequenceNum(). Each stream keeps at most `maxSize` unmatched messages
+# in a bounded buffer: when it is full the oldest one is evicted, and once
+# a sequence number is complete every older unmatched message is stale and
+# dropped, so memory stays bounded even if one of the streams stalls
+class MessageSynchronizer:
+    def __init__(self, streams=('rgb', 'nn'),
+                 maxSize=config.SYNC_BUFFER_SIZE):
+        self.streams = tuple(streams)
+        self.maxSize = maxSize
+        self.buffers = {stream: OrderedDict() for stream in self.streams}
+
+        # counters: completed sets, and per-stream messages dropped because
+        # they went stale or overflowed the buffer
+        self.matched = 0
+        self.dropped = {stream: 0 for stream in self.streams}
+
+        # pairing latency, i.e. host time between the first and the last
+        # message of a set arriving, in seconds
+        self.lastLatency = 0.0
+        self.maxLatency = 0.0
+        self.totalLatency = 0.0
+
+    # add a message of `stream`; returns a dict stream -> message once all
+    # the streams have a message with the same sequence number, else None
+    def add(self, stream, message):
+        seq = message.getSequenceNum()
+        now = time.monotonic()
+        buffer = self.buffers[stream]
+        buffer[seq] = (message, now)
+        if len(buffer) > self.maxSize:
+            buffer.popitem(last=False)
+            self.dropped[stream] += 1
+
+        if not all(seq in self.buffers[s] for s in self.streams):
+            return None
+
+        synced = {}
+        firstArrival = now
+        for s in self.streams:
+            buffer = self.buffers[s]
+            synced[s], arrival = buffer.pop(seq)
+            firstArrival = min(firstArrival, arrival)
+
+            # everything older than the completed set can never be paired
+            while buffer and next(iter(buffer)) < seq:
+                buffer.popitem(last=False)
+                self.dropped[s] += 1
+
+        latency = now - firstArrival
+        self.matched += 1
+        self.lastLatency = latency
+        self.maxLatency = max(self.maxLatency, latency)
+        self.totalLatency += latency
+        return synced
+
+    def meanLatency(self):
+        return self.totalLatency / self.matched if self.matched else 0.0
+
+    # summary of the counters, latencies in milliseconds
+    def stats(self):
+        return {
+            'matched': self.matched,
+            'dropped': dict(self.dropped),
+            'pending': {s: len(b) for s, b in self.buffers.items()},
+            'lastLatencyMs': self.lastLatency * 1e3,
+            'meanLatencyMs': self.meanLatency() * 1e3,
+            'maxLatencyMs': self.maxLatency * 1e3,
+        }
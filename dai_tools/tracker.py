@@ -0,0 +1,244 @@
+# import the necessary packages
+from dai_tools import config
+from dai_tools.postprocess import iou_matrix
+from dai_tools.ssd_decoder import LABEL, CONFIDENCE, XMIN, YMAX, SSD_FIELDS
+from dai_tools.ssd_decoder import DecodedDetections, detections_to_array
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+
+# minimum-cost assignment between the rows and columns of `cost` with the
+# shortest augmenting path (Hungarian) algorithm. The scan over columns is
+# vectorized, so each row only costs as many numpy steps as columns it
+# visits. Returns (rows, cols) like scipy's linear_sum_assignment, which is
+# used instead when scipy is installed
+def linear_assignment(cost):
+    if linear_sum_assignment is not None:
+        return linear_sum_assignment(cost)
+    cost = np.asarray(cost, dtype=np.float64)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    if n == 0:
+        return np.empty(0, np.intp), np.empty(0, np.intp)
+
+    # potentials, and for each column (1-based, 0 is a virtual column) the
+    # row assigned to it and the previous column on the augmenting path
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.intp)
+    way = np.zeros(m + 1, dtype=np.intp)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            current = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (current < minv[1:])
+            minv[1:][better] = current[better]
+            way[1:][better] = j0
+            masked = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(masked)) + 1
+            delta = masked[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        # flip the augmenting path
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    cols = np.flatnonzero(p[1:])
+    rows = p[1:][cols] - 1
+    if transposed:
+        rows, cols = cols, rows
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+# match tracks (rows) to detections (columns) given their IoU matrix,
+# keeping only pairs with IoU >= `threshold`. Pairs that are each other's
+# only candidate are matched directly, which covers most of a scene with
+# well separated objects. Only the remaining contested rows and columns go
+# through linear_assignment
+def associate(iou, threshold):
+    gate = iou >= threshold
+    rowCandidates = gate.sum(axis=1)
+    colCandidates = gate.sum(axis=0)
+    unique = gate & (rowCandidates == 1)[:, None] & (colCandidates == 1)
+    rows, cols = np.nonzero(unique)
+
+    contestedRows = np.flatnonzero(rowCandidates > 1)
+    contestedCols = np.flatnonzero(colCandidates > 1)
+    contestedRows = np.union1d(
+        contestedRows, np.flatnonzero(gate[:, contestedCols].any(axis=1)))
+    contestedCols = np.union1d(
+        contestedCols, np.flatnonzero(gate[contestedRows].any(axis=0)))
+    if len(contestedRows) and len(contestedCols):
+        sub = iou[np.ix_(contestedRows, contestedCols)]
+        subRows, subCols = linear_assignment(-sub)
+        good = sub[subRows, subCols] >= threshold
+        rows = np.concatenate((rows, contestedRows[subRows[good]]))
+        cols = np.concatenate((cols, contestedCols[subCols[good]]))
+    return rows, cols
+
+
+# (xmin, ymin, xmax, ymax) <-> SORT measurement (cx, cy, area, aspect)
+def _to_measurement(boxes):
+    width = boxes[:, 2] - boxes[:, 0]
+    height = boxes[:, 3] - boxes[:, 1]
+    return np.stack((boxes[:, 0] + width / 2, boxes[:, 1] + height / 2,
+                     width * height, width / np.maximum(height, 1e-6)),
+                    axis=1)
+
+
+def _to_boxes(state):
+    area = np.maximum(state[:, 2], 1e-9)
+    width = np.sqrt(area * state[:, 3])
+    height = area / np.maximum(width, 1e-9)
+    return np.stack((state[:, 0] - width / 2, state[:, 1] - height / 2,
+                     state[:, 0] + width / 2, state[:, 1] + height / 2),
+                    axis=1)
+
+
+# SORT-style multi-object tracker for the (N, 7) detection arrays of the
+# host pipeline. Every track lives in rows of preallocated arrays (Kalman
+# state and covariance, id, label, confidence, hits, age), grown by
+# doubling, so predict and update are batched numpy operations over all
+# tracks instead of per-object Python classes. Tracks are matched to
+# detections of the same class by IoU with linear_assignment
+class SortTracker:
+    # constant-velocity model over (cx, cy, area, aspect, vx, vy, varea)
+    F = np.eye(7)
+    F[0, 4] = F[1, 5] = F[2, 6] = 1.0
+    H = np.eye(4, 7)
+    Q = np.diag([1e-4, 1e-4, 1e-5, 1e-6, 1e-4, 1e-4, 1e-6])
+    R = np.diag([1e-4, 1e-4, 1e-4, 1e-3])
+    P0 = np.diag([1e-4, 1e-4, 1e-4, 1e-3, 1e-2, 1e-2, 1e-3])
+
+    def __init__(self, maxAge=config.TRACKER_MAX_AGE,
+                 minHits=config.TRACKER_MIN_HITS,
+                 iouThreshold=config.TRACKER_IOU_THRESHOLD, capacity=64):
+        self.maxAge = maxAge
+        self.minHits = minHits
+        self.iouThreshold = iouThreshold
+        self.nextId = 1
+        self.frameCount = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.x = np.zeros((capacity, 7))
+        self.P = np.zeros((capacity, 7, 7))
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.labels = np.zeros(capacity, dtype=np.float32)
+        self.confidences = np.zeros(capacity, dtype=np.float32)
+        self.hits = np.zeros(capacity, dtype=np.int64)
+        self.age = np.zeros(capacity, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+
+    # double the capacity of every state array
+    def _grow(self):
+        old = (self.x, self.P, self.ids, self.labels, self.confidences,
+               self.hits, self.age, self.active)
+        self._allocate(2 * len(self.active))
+        new = (self.x, self.P, self.ids, self.labels, self.confidences,
+               self.hits, self.age, self.active)
+        for src, dst in zip(old, new):
+            dst[:len(src)] = src
+
+    def __len__(self):
+        return int(self.active.sum())
+
+    # advance the detections of one frame (an (N, 7) array) and return the
+    # confirmed tracks updated in this frame as an (K, 7) array with the
+    # track id in the first column
+    def update(self, detections):
+        self.frameCount += 1
+        rows = np.flatnonzero(self.active)
+
+        # batched Kalman predict of every live track
+        if len(rows):
+            self.x[rows] = self.x[rows] @ self.F.T
+            self.P[rows] = self.F @ self.P[rows] @ self.F.T + self.Q
+            self.age[rows] += 1
+
+        # associate by IoU, never across classes
+        matchedTracks = np.empty(0, np.intp)
+        matchedDets = np.empty(0, np.intp)
+        if len(rows) and len(detections):
+            iou = iou_matrix(_to_boxes(self.x[rows]),
+                             detections[:, XMIN:YMAX + 1])
+            iou[self.labels[rows][:, None] != detections[None, :, LABEL]] = 0
+            trackIdx, detIdx = associate(iou, self.iouThreshold)
+            matchedTracks = rows[trackIdx]
+            matchedDets = detIdx
+
+        # batched Kalman update of the matched tracks
+        if len(matchedTracks):
+            z = _to_measurement(detections[matchedDets, XMIN:YMAX + 1])
+            P = self.P[matchedTracks]
+            S = self.H @ P @ self.H.T + self.R
+            K = P @ self.H.T @ np.linalg.inv(S)
+            innovation = z - self.x[matchedTracks] @ self.H.T
+            self.x[matchedTracks] += np.einsum('nij,nj->ni', K, innovation)
+            self.P[matchedTracks] = (np.eye(7) - K @ self.H) @ P
+            self.confidences[matchedTracks] = detections[matchedDets,
+                                                         CONFIDENCE]
+            self.hits[matchedTracks] += 1
+            self.age[matchedTracks] = 0
+
+        # start a track for every unmatched detection
+        unmatched = np.setdiff1d(np.arange(len(detections)), matchedDets)
+        if len(unmatched):
+            while len(self.active) - len(self) < len(unmatched):
+                self._grow()
+            slots = np.flatnonzero(~self.active)[:len(unmatched)]
+            self.x[slots] = 0.0
+            self.x[slots, :4] = _to_measurement(
+                detections[unmatched, XMIN:YMAX + 1])
+            self.P[slots] = self.P0
+            self.ids[slots] = np.arange(self.nextId,
+                                        self.nextId + len(slots))
+            self.nextId += len(slots)
+            self.labels[slots] = detections[unmatched, LABEL]
+            self.confidences[slots] = detections[unmatched, CONFIDENCE]
+            self.hits[slots] = 1
+            self.age[slots] = 0
+            self.active[slots] = True
+
+        # drop tracks that have not been seen for too long
+        self.active &= self.age <= self.maxAge
+
+        # report the confirmed tracks seen in this frame
+        report = np.flatnonzero(self.active & (self.age == 0) & (
+            (self.hits >= self.minHits) | (self.frameCount <= self.minHits)))
+        tracks = np.empty((len(report), SSD_FIELDS), dtype=np.float32)
+        tracks[:, 0] = self.ids[report]
+        tracks[:, LABEL] = self.labels[report]
+        tracks[:, CONFIDENCE] = self.confidences[report]
+        tracks[:, XMIN:YMAX + 1] = _to_boxes(self.x[report])
+        return tracks
+
+
+# run the detections of a message (device ImgDetections or host
+# DecodedDetections) through `tracker`, returning the confirmed tracks as
+# DecodedDetections whose array has the track IDs in its first column
+def track_message(tracker, inDet):
+    if isinstance(inDet, DecodedDetections):
+        message, array = inDet.inNN, inDet.array
+    else:
+        message, array = inDet, detections_to_array(inDet.detections)
+    return DecodedDetections(message, tracker.update(array))
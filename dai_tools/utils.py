@@ -18,17 +18,38 @@ def frameNorm(frame, bbox):
     return (np.clip(np.array(bbox), 0, 1) * normVals).astype(int)
 
 
-# displayFrame method iterates over the detections of a frame,
-# denormalizes the bounding box coordinates and annotates the frame with
-# class label, detection confidence, bounding box
-def displayFrame(name, frame, detections):
-    for detection in detections:
-        bbox = frameNorm(
-            frame, (
-                detection.xmin, detection.ymin,
-                detection.xmax, detection.ymax,
-            ),
-        )
+# batched version of frameNorm: all the bounding boxes of a frame come in
+# as one (N, 4) array of <0..1> floats (xmin, ymin, xmax, ymax) and are
+# denormalized to an (N, 4) int32 array of pixel coordinates in a single
+# vectorized call instead of one small array allocation per detection
+def frameNormBatch(frame, bboxes):
+    bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+    normVals = np.array(
+        (frame.shape[1], frame.shape[0], frame.shape[1], frame.shape[0]),
+        dtype=np.float32,
+    )
+    return (np.clip(bboxes, 0, 1) * normVals).astype(np.int32)
+
+
+# gather the bounding boxes of an ImgDetections message (or of its
+# `detections` list) into one (N, 4) float32 array for frameNormBatch
+def detectionsToBBoxes(detections):
+    detections = getattr(detections, 'detections', detections)
+    return np.array(
+        [(d.xmin, d.ymin, d.xmax, d.ymax) for d in detections],
+        dtype=np.float32,
+    ).reshape(-1, 4)
+
+
+# annotateFrame method denormalizes the bounding box coordinates of all the
+# detections of a frame at once, then iterates over them and annotates the
+# frame with class label, detection confidence, bounding box. Like
+# detectionsToBBoxes it takes an ImgDetections message or its
+# `detections` list
+def annotateFrame(frame, detections):
+    detections = getattr(detections, 'detections', detections)
+    bboxes = frameNormBatch(frame, detectionsToBBoxes(detections))
+    for detection, bbox in zip(detections, bboxes.tolist()):
         cv2.putText(
             frame, labelMap[detection.label], (
                 bbox[0] + 10,
@@ -44,6 +65,23 @@ def displayFrame(name, frame, detections):
         cv2.rectangle(frame, (bbox[0], bbox[1]), (bbox[2], bbox[3]),
             color, 2)
 
+
+# annotateTrackIds method writes the track ID of every (K, 7) tracker row
+# (id, label, confidence, xmin, ymin, xmax, ymax) below its box
+def annotateTrackIds(frame, tracks):
+    bboxes = frameNormBatch(frame, tracks[:, 3:7])
+    for trackId, bbox in zip(tracks[:, 0].astype(int).tolist(),
+                             bboxes.tolist()):
+        cv2.putText(
+            frame, f'ID {trackId}', (bbox[0] + 10, bbox[3] - 10),
+            cv2.FONT_HERSHEY_TRIPLEX, 0.5, color,
+        )
+
+
+# displayFrame method annotates the frame with its detections and shows it
+def displayFrame(name, frame, detections):
+    annotateFrame(frame, detections)
+
     # show the frame
     cv2.imshow(name, frame)
 
@@ -1,12 +1,29 @@
 # USAGE
 # python main.py --demo color_camera
 # python main.py --demo mono_cameras
+# python main.py --demo mono_cameras --depth --depth-workers 4
+# python main.py --demo mono_cameras --all-devices
+# python main.py --demo color_camera --share oakd
+# python main.py --demo object_detection --headless --serve 8080
+# python main.py --demo mono_cameras --depth --latest-only left --latest-only right
 # python main.py --demo object_detection
+# python main.py --demo object_detection --replay recordings/people
+# python main.py --demo object_detection --headless --duration 60
+# python main.py --demo object_detection --simulate --headless --duration 30
+# python main.py --demo mono_cameras --all-devices --simulate 4
+# python main.py --demo object_detection --pipeline pipelines/object_detection.json --set nodes.camRgb.properties.fps=30
 
 # import the necessary packages
 from dai_tools.color_camera_preview import color_camera, create_color_camera_pipeline
 from dai_tools.left_right_mono_camera_preview import create_mono_camera_pipeline, mono_cameras_preview
 from dai_tools.object_detection_mobilenet import create_detection_pipeline, object_detection_mobilenet
+from dai_tools.object_detection_mobilenet import host_decoding_graph
+from dai_tools.frame_source import ReplayFrameSource
+from dai_tools.simulated_device import SimulatedDevice
+from dai_tools.pipeline_builder import build_pipeline, load_graph, apply_overrides
+from dai_tools.multi_device import multi_device_preview
+from dai_tools.mjpeg_server import MjpegServer
+from dai_tools import config
 import argparse
 
 # define the argparser and parse the command line arguments
@@ -15,24 +32,214 @@ parser.add_argument(
     '-d', '--demo', type=str, default='color_camera',
     help='Run color camera or mono cameras or object detection exampes',
 )
+parser.add_argument(
+    '-r', '--replay', type=str, default=None,
+    help='Replay a recording directory instead of connecting to the OAK',
+)
+parser.add_argument(
+    '--max-speed', action='store_true',
+    help='Replay the recording as fast as possible instead of in real time',
+)
+parser.add_argument(
+    '--simulate', type=int, nargs='?', const=1, default=None,
+    metavar='DEVICES',
+    help='Run the demo on simulated devices producing synthetic frames '
+         'and detections instead of the OAK',
+)
+parser.add_argument(
+    '--headless', action='store_true',
+    help='Do not open any window, annotate or display frames',
+)
+parser.add_argument(
+    '--annotate', action='store_true',
+    help='With --headless, still convert and annotate the object detection '
+         'frames without displaying them',
+)
+parser.add_argument(
+    '--duration', type=float, default=None,
+    help='Stop the demo after this many seconds',
+)
+parser.add_argument(
+    '--frames', type=int, default=None,
+    help='Stop the demo after this many frames',
+)
+parser.add_argument(
+    '--metrics', type=str, default=None,
+    help='Write object detection stage latencies to this .json/.prom file',
+)
+parser.add_argument(
+    '--record', type=str, default=None,
+    help='Archive the camera streams into this directory',
+)
+parser.add_argument(
+    '--record-format', type=str, default='raw', choices=('raw', 'video'),
+    help='Record raw memory-mapped frames or encoded video',
+)
+parser.add_argument(
+    '--share', type=str, default=None, metavar='NAME',
+    help='Publish the camera streams into shared-memory rings NAME_<stream>',
+)
+parser.add_argument(
+    '--share-layout', type=str, default='bgr', choices=('bgr', 'planar'),
+    help='Share BGR frames, or the planar frames as the camera sends them',
+)
+parser.add_argument(
+    '--serve', type=int, default=None, metavar='PORT',
+    help='Stream the (annotated) frames as MJPEG over HTTP on this port',
+)
+parser.add_argument(
+    '--host-decoding', action='store_true',
+    help='Run a generic NeuralNetwork node and decode SSD output on host',
+)
+parser.add_argument(
+    '--host-nms', action='store_true',
+    help='Apply per-class thresholds, NMS and a top-K cap on the host',
+)
+parser.add_argument(
+    '--track', action='store_true',
+    help='Track detections across frames and draw their track IDs',
+)
+parser.add_argument(
+    '--depth', action='store_true',
+    help='Compute a disparity map on the host from the mono cameras',
+)
+parser.add_argument(
+    '--depth-workers', type=int, default=config.STEREO_WORKERS,
+    help='Threads matching the disparity map stripes in parallel',
+)
+parser.add_argument(
+    '-p', '--pipeline', type=str, default=None,
+    help='Build the pipeline from this JSON/YAML graph description',
+)
+parser.add_argument(
+    '--set', action='append', default=[], metavar='PATH=VALUE',
+    help='Override a value of the --pipeline graph, '
+         'e.g. nodes.camRgb.properties.fps=30',
+)
+parser.add_argument(
+    '--latest-only', action='append', default=[], metavar='STREAM',
+    help='Handle only the newest pending message of this stream, '
+         'skipping stale ones',
+)
+parser.add_argument(
+    '--all-devices', action='store_true',
+    help='Run the camera preview on every attached OAK at once',
+)
+parser.add_argument(
+    '--offload', action='store_true',
+    help='Annotate object detection frames on a pool of worker processes',
+)
 args = parser.parse_args()
+if args.host_decoding and args.replay is not None:
+    parser.error('--host-decoding needs the raw network output of a device, '
+                 'recordings only hold decoded detections')
+
+# a pipeline graph replaces the demo's hand-written pipeline, and brings
+# its own output queue settings. With --host-decoding its detection
+# network is swapped for one sending the raw output, as in
+# create_detection_pipeline
+graphPipeline, queueOptions = None, None
+if args.pipeline is not None:
+    graph = apply_overrides(load_graph(args.pipeline), args.set)
+    if args.host_decoding and args.demo == 'object_detection':
+        graph = host_decoding_graph(graph)
+    graphPipeline, queueOptions = build_pipeline(graph)
+
+# streams drained latest-only, on top of the graph's queue settings
+for stream in args.latest_only:
+    queueOptions = dict(queueOptions or {})
+    queueOptions[stream] = dict(queueOptions.get(stream, {}), drain='latest')
+
+# run limits and queue settings shared by all the demos
+runOptions = dict(
+    headless=args.headless, duration=args.duration, maxFrames=args.frames,
+    queueOptions=queueOptions,
+)
+
+# MJPEG server the demos stream their frames to
+server = None
+if args.serve is not None:
+    server = MjpegServer(port=args.serve).start()
+    print(f'Streaming on http://localhost:{server.port}/')
+
+# the camera previews can archive their streams, share them with other
+# processes and stream them
+recordOptions = dict(
+    runOptions, recordDir=args.record, recordFormat=args.record_format,
+    shareName=args.share, shareLayout=args.share_layout, server=server,
+)
+
+# the object detection demo can also export its per-stage latencies
+detectionOptions = dict(
+    runOptions, metricsPath=args.metrics, hostDecoding=args.host_decoding,
+    hostNMS=args.host_nms, track=args.track, offload=args.offload,
+    server=server, annotate=args.annotate,
+)
+
+# when a recording is given, the demos read from it instead of the device
+source = None
+if args.replay is not None:
+    source = ReplayFrameSource(args.replay, realtime=not args.max_speed)
+
+# with --simulate the demos run their pipeline on a simulated device (see
+# simulated_device.py) instead of the OAK
+def demo_source(pipeline):
+    if args.simulate is not None:
+        return SimulatedDevice(pipeline)
+    return source
+
+# with --all-devices the camera previews run on every attached device (or
+# on the replayed recording, or on DEVICES simulated devices), merged into
+# one host loop
+if args.all_devices and args.demo in ('color_camera', 'mono_cameras'):
+    if args.demo == 'color_camera':
+        createPipeline, streams = create_color_camera_pipeline, ('rgb',)
+    else:
+        createPipeline = create_mono_camera_pipeline
+        streams = ('left', 'right')
+    sources = None
+    if source is not None:
+        sources = {args.replay: source}
+    elif args.simulate is not None:
+        sources = {
+            f'simulated{i}': SimulatedDevice(createPipeline(), seed=i,
+                                             mxId=f'simulated{i}')
+            for i in range(args.simulate)
+        }
+    multi_device_preview(createPipeline, streams, sources=sources,
+                         **runOptions)
 
 # if demo is color_camera then call create_color_camera_pipeline()
 # then pass the pipeline to color_camera method for rgb preview
-if args.demo == 'color_camera':
-    pipeline = create_color_camera_pipeline()
-    color_camera(pipeline=pipeline)
+elif args.demo == 'color_camera':
+    pipeline = graphPipeline
+    if pipeline is None:
+        pipeline = create_color_camera_pipeline()
+    color_camera(pipeline=pipeline, source=demo_source(pipeline),
+                 **recordOptions)
 
 # if demo is mono_cameras then call create_mono_camera_pipeline()
 # pass the pipeline to mono_cameras_preview for displaying left &
 # right grayscale camera feed
 elif args.demo == 'mono_cameras':
-    pipeline = create_mono_camera_pipeline()
-    mono_cameras_preview(pipeline=pipeline)
+    pipeline = graphPipeline
+    if pipeline is None:
+        pipeline = create_mono_camera_pipeline()
+    mono_cameras_preview(
+        pipeline=pipeline, source=demo_source(pipeline), depth=args.depth,
+        depthWorkers=args.depth_workers, **recordOptions)
 
 # if demo is object_detection then call create_detection_pipeline()
 # then pass the pipeline to object_detection_mobilenet to run object
 # detection on OAK
 elif args.demo == 'object_detection':
-    pipeline = create_detection_pipeline()
-    object_detection_mobilenet(pipeline=pipeline)
\ No newline at end of file
+    pipeline = graphPipeline
+    if pipeline is None:
+        pipeline = create_detection_pipeline(hostDecoding=args.host_decoding)
+    object_detection_mobilenet(
+        pipeline=pipeline, source=demo_source(pipeline),
+        **detectionOptions)
+
+if server is not None:
+    print('Streaming: ', server.stats())
+    server.close()
@@ -10,9 +10,11 @@ import cv2
 # Additional modules can be imported here:
 # ...
 from dai_tools.utils import print_neural_network_layer_names, displayFrame
-import time
 
 from dai_tools import config
+from dai_tools.frame_source import DeviceFrameSource
+from dai_tools.queue_consumer import QueueConsumer
+from dai_tools.fps import StreamMeters
 
 def setup_pipeline():
     # 1) Create a pipeline object which hosts the nodes and communications links between them:
@@ -92,108 +94,87 @@ def setup_pipeline():
 
     return pipeline
 
-def upload_pipeline(pipeline):
+def upload_pipeline(pipeline, source=None):
     # Once the pipeline is created, configured and linked
-    # we upload it to the device:
-    with dai.Device(pipeline=pipeline) as device:
+    # we upload it to the device. Alternatively, any other frame source
+    # (e.g. a ReplayFrameSource with a recording) can be passed in:
+    if source is None:
+        source = DeviceFrameSource(pipeline=pipeline)
+    with source as device:
         # Everything written here, will be performed in the device (i.e. firmware upload)
         # Just for educational purposes, write out some settings:
         print('MxID: ', device.getDeviceInfo().getMxId())
         print('USB Speed: ', device.getUsbSpeed())
         print('Connected Cameras: ', device.getConnectedCameras())
-        # To retrieve everything from the device we set up output 
-        # queues for each node. By reading the configuration parameters,
-        # we make it flexible for the host specs:
-        qLeftCam = device.getOutputQueue(
-            name='Left', # This is the name set through setStreamName
-            maxSize = config.COLOR_CAMERA_QUEUE_SIZE,
-            blocking = config.QUEUE_BLOCKING,
-        )
-        qRightCam = device.getOutputQueue(
-            name = 'Right',
-            maxSize = config.COLOR_CAMERA_QUEUE_SIZE,
-            blocking = config.QUEUE_BLOCKING,
-        )
-        qRGBCam = device.getOutputQueue(
-            name = 'RGB',
-            maxSize = config.COLOR_CAMERA_QUEUE_SIZE,
-            blocking = config.QUEUE_BLOCKING,
-        )
-        # output queues are also used to get the rgb frames
-        # and nn data from the outputs defined above
-        qDet = device.getOutputQueue(
-            name='nn',
-            maxSize=config.COLOR_CAMERA_QUEUE_SIZE,
-            blocking=config.QUEUE_BLOCKING,
-        )
-        qNN = device.getOutputQueue(
-            name='nnNet',
-            maxSize=config.COLOR_CAMERA_QUEUE_SIZE,
-            blocking=config.QUEUE_BLOCKING,
-        )
-
-        # initialize frame, detections list, and startTime for
-        # computing FPS
-        clrFrame = None
+        # initialize detections list, and one sliding-window FPS meter
+        # per stream
         detections = []
-        startTime = time.monotonic()
-        counter = 0
+        meters = StreamMeters(('Left', 'Right', 'RGB', 'nn'))
 
         # color pattern for displaying FPS
         color2 = config.TEXT_COLOR2  
         # boolean variable for printing NN layer names on console
         printOutputLayersOnce = config.PRINT_NEURAL_NETWORK_METADATA
 
-        # And finally the streaming block:
-        while True:
-            # We can use get (blocking the exec) or tryGet (non-blocking) 
-            # to retrieve each frame.:
-            LeftFrames = qLeftCam.tryGet()
-            RightFrames = qRightCam.tryGet()
-            RGBFrames = qRGBCam.tryGet()
-            inDet = qDet.tryGet()
-            inNN = qNN.tryGet()
-
-
-            # Additionally, tryGet returns None if no data available from the queue:
-            if LeftFrames is not None:
-                lFrame = LeftFrames.getCvFrame()
-                displayFrame('Left', lFrame, [])
-                # cv2.imshow('Left', LeftFrames.getCvFrame())
-            if RightFrames is not None:
-                rFrame = RightFrames.getCvFrame()
-                displayFrame('Right', rFrame, [])
-                # cv2.imshow('Right', RightFrames.getCvFrame())
-
-            if RGBFrames is not None:
-                clrFrame = RGBFrames.getCvFrame()
-                # cv2.imshow('RGB', clrFrame)
-                # annotate the frame with FPS information
-                cv2.putText(
-                    clrFrame, 'NN fps: {:.2f}'.
-                    format(counter / (time.monotonic() - startTime)),
-                    (2, clrFrame.shape[0] - 4),
-                    cv2.FONT_HERSHEY_TRIPLEX, 0.4, color2,
-                )
-
-            # check if detections are available
-            if inDet is not None:
-                # fetch detections & increment the counter for FPS computation
-                detections = inDet.detections
-                counter += 1
-            # check if the flag is set and NN metadata is available
-            if printOutputLayersOnce and inNN is not None:
-                # call the `neural network layer names method and pass
-                # inNN queue object which would help extract layer names
+        # Each stream gets a handler that is called with every message
+        # retrieved from its output queue:
+        def onLeft(LeftFrames):
+            meters.tickMessage('Left', LeftFrames)
+            lFrame = LeftFrames.getCvFrame()
+            displayFrame('Left', lFrame, [])
+
+        def onRight(RightFrames):
+            meters.tickMessage('Right', RightFrames)
+            rFrame = RightFrames.getCvFrame()
+            displayFrame('Right', rFrame, [])
+
+        def onRGB(RGBFrames):
+            meters.tickMessage('RGB', RGBFrames)
+            clrFrame = RGBFrames.getCvFrame()
+            # annotate the frame with FPS information
+            cv2.putText(
+                clrFrame, 'NN fps: {:.2f}'.format(meters['nn'].fps()),
+                (2, clrFrame.shape[0] - 4),
+                cv2.FONT_HERSHEY_TRIPLEX, 0.4, color2,
+            )
+            #  Display the frame from Colour camera with the latest detections:
+            displayFrame('RGB Detection', clrFrame, detections=detections)
+
+        def onDet(inDet):
+            # fetch detections & tick the meter for FPS computation
+            nonlocal detections
+            detections = inDet.detections
+            meters.tickMessage('nn', inDet)
+
+        def onNN(inNN):
+            # check if the flag is set: call the `neural network layer names
+            # method and pass inNN queue object which would help extract
+            # layer names
+            nonlocal printOutputLayersOnce
+            if printOutputLayersOnce:
                 print_neural_network_layer_names(inNN)
                 printOutputLayersOnce = False
-            
-            #  If the frame from Colour camera is available, display it:
-            if clrFrame is not None:
-                displayFrame('RGB Detection', clrFrame, detections=detections)
-            # break out from the while loop if `q` key is pressed
-            if cv2.waitKey(1) == ord('q'):
-                break
+
+        # To retrieve everything from the device we set up output 
+        # queues for each node (keyed by the name set through setStreamName).
+        # By reading the configuration parameters (queue size and blocking),
+        # we make it flexible for the host specs. Rather than polling every
+        # queue with tryGet, the consumer waits until any of them has data
+        # and calls the matching handler:
+        consumer = QueueConsumer(device, {
+            'Left': onLeft,
+            'Right': onRight,
+            'RGB': onRGB,
+            'nn': onDet,
+            'nnNet': onNN,
+        }, maxSize=config.COLOR_CAMERA_QUEUE_SIZE,
+            blocking=config.QUEUE_BLOCKING)
+
+        # And finally the streaming block,
+        # break out from it if `q` key is pressed:
+        consumer.run(stop=lambda: cv2.waitKey(1) == ord('q'))
+        # Report the throughput of every stream:
+        print('FPS: ', meters.report())
 
 pipeline = setup_pipeline()
 upload_pipeline(pipeline=pipeline)